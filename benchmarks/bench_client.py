@@ -0,0 +1,174 @@
+"""Measure the performance of searches against a stand-in Hound server.
+
+Usage::
+
+    python benchmarks/bench_client.py [--runs N] [--json] [--repos N] [--files N] ...
+
+A fake Hound server (see ``benchmarks/fake_hound.py``) is started with
+synthetic results. Then ``Client.run()`` searches it for each scenario
+(plain, colored output, lines of context), each run in a new Python
+process. We report:
+
+- the latency: the wall-clock time of ``Client.run()`` (the start-up
+  of Python and the import of pyhound are not included, see
+  ``benchmarks/startup.py``);
+- the throughput, in lines of output per second;
+- the peak resident set size (RSS) of the process, and its increase
+  during the search.
+
+The output goes to a sink that only counts lines. Use ``--json`` to
+get results in a format that can be compared between versions.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import fake_hound
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATTERN = 'frobulate'
+
+# Arguments of ``Client`` for each scenario.
+SCENARIOS = {
+    'plain': {},
+    'color': {'color': 'always', 'show_line_number': True},
+    'context': {'context': 5},
+}
+
+
+class _CountingSink:
+    """A binary stream that only counts lines."""
+
+    def __init__(self):
+        self.lines = 0
+
+    def write(self, data):
+        self.lines += data.count(b'\n')
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+class _CountingStdout:
+    """A replacement of ``sys.stdout``. pyhound writes to its binary
+    ``buffer``.
+    """
+
+    encoding = 'utf-8'
+
+    def __init__(self):
+        self.buffer = _CountingSink()
+
+    def write(self, text):
+        return self.buffer.write(text.encode(self.encoding))
+
+    def flush(self):
+        pass
+
+
+def get_max_rss():
+    """Return the peak RSS of this process, in bytes."""
+    import resource
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux gives kilobytes, macOS gives bytes.
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def run_child(endpoint, scenario):
+    """Run a search and print measurements as JSON. This is what each
+    child process does.
+    """
+    from pyhound.hound import Client
+    client = Client(endpoint, PATTERN, catalogue_ttl=0, **SCENARIOS[scenario])
+    stdout = _CountingStdout()
+    rss_before = get_max_rss()
+    sys.stdout = stdout
+    try:
+        start = time.perf_counter()
+        client.run()
+        elapsed = time.perf_counter() - start
+    finally:
+        sys.stdout = sys.__stdout__
+    max_rss = get_max_rss()
+    print(json.dumps({
+        'elapsed': elapsed,
+        'lines': stdout.buffer.lines,
+        'max_rss': max_rss,
+        'rss_increase': max_rss - rss_before,
+    }))
+
+
+def run_scenario(endpoint, scenario, runs):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    command = [sys.executable, os.path.abspath(__file__), '--child', scenario, '--endpoint', endpoint]
+    # The first run lets the server generate (and keep) its results.
+    subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+    measurements = []
+    for _ in range(runs):
+        completed = subprocess.run(command, env=env, check=True, stdout=subprocess.PIPE)
+        measurements.append(json.loads(completed.stdout.decode('utf-8')))
+    latency = statistics.median(m['elapsed'] for m in measurements)
+    lines = measurements[0]['lines']
+    return {
+        'scenario': scenario,
+        'latency_ms': round(latency * 1000, 1),
+        'min_latency_ms': round(min(m['elapsed'] for m in measurements) * 1000, 1),
+        'lines': lines,
+        'lines_per_second': int(lines / latency) if latency else None,
+        'max_rss_mb': round(max(m['max_rss'] for m in measurements) / 1024 / 1024, 1),
+        'rss_increase_mb': round(max(m['rss_increase'] for m in measurements) / 1024 / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the performance of pyhound searches.")
+    parser.add_argument('--runs', type=int, default=5, help="Number of runs of each scenario. Default: 5.")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), dest='scenarios',
+                        help="Scenario to run (may be repeated). Default: all of them.")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON.")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--endpoint', help=argparse.SUPPRESS)
+    fake_hound.add_corpus_arguments(parser)
+    options = parser.parse_args()
+
+    if options.child:
+        run_child(options.endpoint, options.child)
+        return
+
+    server = fake_hound.start_server(fake_hound.get_corpus(options))
+    results = [
+        run_scenario(server.url, scenario, options.runs)
+        for scenario in options.scenarios or sorted(SCENARIOS)
+    ]
+    server.shutdown()
+    if options.json:
+        print(json.dumps({'corpus': {
+            'repos': options.repos,
+            'files': options.files,
+            'matches': options.matches,
+            'context': options.context,
+            'line_length': options.line_length,
+            'limit': options.limit,
+        }, 'results': results}, indent=2))
+        return
+    print('%-8s %12s %10s %12s %10s %10s' % ('', 'latency', 'lines', 'lines/s', 'peak RSS', 'RSS +'))
+    for result in results:
+        print('%-8s %9.1f ms %10d %12d %7.1f MB %7.1f MB' % (
+            result['scenario'],
+            result['latency_ms'],
+            result['lines'],
+            result['lines_per_second'] or 0,
+            result['max_rss_mb'],
+            result['rss_increase_mb'],
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""A stand-in for a Hound server, with synthetic search results.
+
+Usage::
+
+    python benchmarks/fake_hound.py [--port PORT] [--repos N] [--files N] ...
+
+It serves ``/api/v1/repos`` and ``/api/v1/search`` like Hound does
+(including ranges of files with ``rng``, lines of context with ``ctx``,
+gzip compression and an error if there are too many results), whatever
+the pattern. Results are generated once for each set of parameters and
+then kept in memory, so that the server is as fast as possible and
+does not get in the way of measurements of the client.
+
+It may also be started in a thread with ``start_server()``.
+"""
+import argparse
+import functools
+import gzip
+import http.server
+import json
+import socketserver
+import threading
+import urllib.parse
+
+
+# See ``benchmarks/bench_client.py``.
+DEFAULT_REPOS = 10
+DEFAULT_FILES = 100  # per repository
+DEFAULT_MATCHES = 5  # per file
+DEFAULT_CONTEXT = 5  # lines before and after each match, at most
+DEFAULT_LINE_LENGTH = 80
+# Hound refuses to return more matches than this in a single response.
+DEFAULT_LIMIT = 5000
+
+# Hound does not return more lines of context than this.
+MAX_CONTEXT = 20
+
+
+class Corpus:
+    """Generate search results of synthetic repositories.
+
+    Each file has ``matches`` matches, separated by ``2 * context + 1``
+    lines so that lines of context of consecutive matches touch each
+    other but do not overlap.
+    """
+
+    def __init__(self, repos=DEFAULT_REPOS, files=DEFAULT_FILES, matches=DEFAULT_MATCHES,
+                 context=DEFAULT_CONTEXT, line_length=DEFAULT_LINE_LENGTH, limit=DEFAULT_LIMIT):
+        self.repos = ['repo%03d' % i for i in range(repos)]
+        self.files = files
+        self.matches = matches
+        self.context = context
+        self.line_length = line_length
+        self.limit = limit
+
+    def get_line(self, line_number, pattern=None):
+        if pattern is None:
+            text = 'line %d: ' % line_number
+        else:
+            text = 'line %d: x = %s(y) ' % (line_number, pattern)
+        return (text + 'abcdefghij' * (self.line_length // 10 + 1))[:max(self.line_length, len(text))]
+
+    def get_file_matches(self, pattern, ctx):
+        ctx = min(ctx, self.context)
+        matches = []
+        for i in range(self.matches):
+            line_number = 1 + self.context + i * (2 * self.context + 1)
+            matches.append({
+                'Line': self.get_line(line_number, pattern),
+                'LineNumber': line_number,
+                'Before': [self.get_line(n) for n in range(line_number - ctx, line_number)] or None,
+                'After': [self.get_line(n) for n in range(line_number + 1, line_number + ctx + 1)] or None,
+            })
+        return matches
+
+    @functools.lru_cache(maxsize=32)
+    def get_search_response(self, pattern, repos, rng, ctx):
+        """Return the (gzipped) body and the status of a response."""
+        if repos in ('', '*'):
+            repos = self.repos
+        else:
+            repos = [repo for repo in repos.split(',') if repo in self.repos]
+        offset, limit = 0, None
+        if rng:
+            start, _, end = rng.partition(':')
+            offset = int(start or 0)
+            limit = int(end) if end else None
+        file_matches = self.get_file_matches(pattern, ctx)
+        results = {}
+        n_matches = 0
+        for repo in sorted(repos):
+            filenames = ['src/module%04d.py' % i for i in range(self.files)]
+            selected = filenames[offset:None if limit is None else offset + limit]
+            if not selected:
+                continue
+            n_matches += len(selected) * self.matches
+            results[repo] = {
+                'Matches': [{'Filename': filename, 'Matches': file_matches} for filename in selected],
+                'FilesWithMatch': len(filenames),
+                'Revision': 'rev-%s' % repo,
+            }
+        if n_matches > self.limit:
+            body = {'Error': 'too many results'}
+            status = 500
+        else:
+            body = {'Results': results, 'Stats': {'FilesOpened': n_matches, 'Duration': 1}}
+            status = 200
+        return gzip.compress(json.dumps(body).encode('utf-8'), compresslevel=1), status
+
+    def get_repos_response(self):
+        body = {repo: {'url': 'https://example.com/%s.git' % repo} for repo in self.repos}
+        return gzip.compress(json.dumps(body).encode('utf-8')), 200
+
+
+class HoundHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query, keep_blank_values=True))
+        corpus = self.server.corpus
+        if url.path == '/api/v1/repos':
+            body, status = corpus.get_repos_response()
+        elif url.path == '/api/v1/search':
+            ctx = params.get('ctx', '')
+            body, status = corpus.get_search_response(
+                params.get('q', ''),
+                params.get('repos', '*'),
+                params.get('rng', ''),
+                min(int(ctx), MAX_CONTEXT) if ctx else 2,
+            )
+        else:
+            body, status = b'', 404
+        # Send headers and body at once, to avoid delays due to
+        # Nagle's algorithm.
+        headers = (
+            'HTTP/1.1 %d %s\r\n'
+            'Content-Type: application/json;charset=utf-8\r\n'
+            'Content-Encoding: gzip\r\n'
+            'Content-Length: %d\r\n'
+            '\r\n' % (status, self.responses[status][0], len(body))
+        )
+        self.wfile.write(headers.encode('ascii') + body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class HoundServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, corpus):
+        super().__init__(address, HoundHandler)
+        self.corpus = corpus
+
+
+def start_server(corpus=None, port=0):
+    """Start a server in a thread and return it. Its URL is available
+    as ``server.url``.
+    """
+    server = HoundServer(('127.0.0.1', port), corpus or Corpus())
+    server.url = 'http://127.0.0.1:%d' % server.server_address[1]
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def add_corpus_arguments(parser):
+    parser.add_argument('--repos', type=int, default=DEFAULT_REPOS,
+                        help="Number of repositories. Default: %d." % DEFAULT_REPOS)
+    parser.add_argument('--files', type=int, default=DEFAULT_FILES,
+                        help="Number of matching files per repository. Default: %d." % DEFAULT_FILES)
+    parser.add_argument('--matches', type=int, default=DEFAULT_MATCHES,
+                        help="Number of matches per file. Default: %d." % DEFAULT_MATCHES)
+    parser.add_argument('--context', type=int, default=DEFAULT_CONTEXT,
+                        help="Maximum number of lines of context that the server returns before and "
+                             "after each match. Default: %d." % DEFAULT_CONTEXT)
+    parser.add_argument('--line-length', type=int, default=DEFAULT_LINE_LENGTH,
+                        help="Length of lines. Default: %d." % DEFAULT_LINE_LENGTH)
+    parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT,
+                        help="Maximum number of matches in a response. Default: %d." % DEFAULT_LIMIT)
+
+
+def get_corpus(options):
+    return Corpus(
+        repos=options.repos,
+        files=options.files,
+        matches=options.matches,
+        context=options.context,
+        line_length=options.line_length,
+        limit=options.limit,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="A stand-in for a Hound server, with synthetic results.")
+    parser.add_argument('--port', type=int, default=6080, help="Port to listen to. Default: 6080.")
+    add_corpus_arguments(parser)
+    options = parser.parse_args()
+    server = HoundServer(('127.0.0.1', options.port), get_corpus(options))
+    print("Listening on http://127.0.0.1:%d" % options.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
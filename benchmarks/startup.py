@@ -0,0 +1,113 @@
+"""Measure the start-up time of the command-line client.
+
+Usage::
+
+    python benchmarks/startup.py [--runs N]
+
+We measure the wall-clock time of ``pyhound --help`` and of a simple
+search (against a stand-in Hound server that returns a single match,
+see ``benchmarks/fake_hound.py``), each in a new Python process:
+
+- "cold" runs use a fresh copy of the package, without any compiled
+  bytecode;
+
+- "warm" runs reuse the compiled bytecode of previous runs.
+
+Import times (as reported by ``python -X importtime``) of the slowest
+modules are also shown, to help find what makes start-up slow.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import fake_hound
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def copy_package(directory):
+    shutil.copytree(
+        os.path.join(ROOT, 'pyhound'),
+        os.path.join(directory, 'pyhound'),
+        ignore=shutil.ignore_patterns('__pycache__'),
+    )
+
+
+def run(directory, args, write_bytecode=True, extra_options=()):
+    env = dict(os.environ, PYTHONPATH=directory)
+    if write_bytecode:
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+    else:
+        env['PYTHONDONTWRITEBYTECODE'] = '1'
+    command = [sys.executable] + list(extra_options) + ['-m', 'pyhound.cli'] + list(args)
+    start = time.perf_counter()
+    completed = subprocess.run(
+        command, env=env, cwd=directory, check=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    return time.perf_counter() - start, completed.stderr.decode('utf-8')
+
+
+def measure(args, runs):
+    cold = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as directory:
+            copy_package(directory)
+            cold.append(run(directory, args, write_bytecode=False)[0])
+    warm = []
+    with tempfile.TemporaryDirectory() as directory:
+        copy_package(directory)
+        run(directory, args)  # Compile bytecode.
+        for _ in range(runs):
+            warm.append(run(directory, args)[0])
+    return cold, warm
+
+
+def get_import_times(args, limit=10):
+    with tempfile.TemporaryDirectory() as directory:
+        copy_package(directory)
+        run(directory, args)
+        _, stderr = run(directory, args, extra_options=('-X', 'importtime'))
+    times = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        times.append((int(cumulative), module.rstrip()))
+    return sorted(times, reverse=True)[:limit]
+
+
+def format_times(times):
+    return 'min %6.1f ms, median %6.1f ms' % (min(times) * 1000, statistics.median(times) * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the start-up time of pyhound.")
+    parser.add_argument('--runs', type=int, default=10, help="Number of runs of each benchmark. Default: 10.")
+    options = parser.parse_args()
+
+    server = fake_hound.start_server(fake_hound.Corpus(repos=1, files=1, matches=1, context=0))
+    endpoint = server.url
+    benchmarks = (
+        ('--help', ['--help']),
+        ('search', ['--endpoint', endpoint, '--catalogue-ttl', '0', 'frobulate']),
+    )
+    for name, args in benchmarks:
+        cold, warm = measure(args, options.runs)
+        print('%-8s cold: %s' % (name, format_times(cold)))
+        print('%-8s warm: %s' % (name, format_times(warm)))
+    print()
+    print('Slowest imports of a search (cumulative, in ms):')
+    for cumulative, module in get_import_times(benchmarks[1][1]):
+        print('%8.1f %s' % (cumulative / 1000, module))
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
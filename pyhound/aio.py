@@ -0,0 +1,417 @@
+"""An asyncio client of Hound.
+
+``AsyncClient`` searches Hound without blocking the event loop, so
+that many searches may run concurrently in a single thread. It uses
+the same options as ``Client`` and shares its logic (repositories,
+payloads, lines of context), but it does not print anything: results
+are given as ``ResultLine`` objects by an asynchronous iterator::
+
+    client = AsyncClient('http://hound:6080', 'frobulate', context=3)
+    async for line in client.search():
+        print(line.repo, line.filename, line.line_number, line.line)
+
+Errors are raised as ``HoundError`` (or ``HoundServerError``).
+
+Requests are sent by a minimal HTTP/1.1 client that keeps connections
+alive. It does not support proxies.
+"""
+import asyncio
+import collections
+import json
+import socket
+import urllib.parse
+import zlib
+
+from pyhound.hound import Client
+from pyhound.hound import DEFAULT_PAGE_SIZE
+from pyhound.hound import DEFAULT_TIMEOUT
+from pyhound.hound import HoundError
+from pyhound.hound import HoundServerError
+from pyhound.hound import _merge_pages
+from pyhound.hound import is_repo_pattern
+from pyhound.hound import iter_result_files
+from pyhound.hound import split_repo_list
+from pyhound.results import ResultLine
+from pyhound.transport import ACCEPT_ENCODING
+from pyhound.transport import CHUNK_SIZE
+from pyhound.transport import DEFAULT_MAX_IDLE_CONNECTIONS
+
+
+# Errors that we get when the server has closed a connection that we
+# kept in the pool.
+STALE_CONNECTION_ERRORS = (
+    asyncio.IncompleteReadError,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+class AsyncTransport:
+    """Send GET requests over persistent HTTP(S) connections, with
+    asyncio.
+
+    Like ``pyhound.transport.Transport``, the timeout applies to the
+    connection and to each read, not to the whole request: a large
+    response may take longer than that to download.
+
+    A transport may be shared by all clients that run on the same
+    event loop.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_idle_connections=DEFAULT_MAX_IDLE_CONNECTIONS):
+        self.timeout = timeout
+        self.max_idle_connections = max_idle_connections
+        # (scheme, host, port) -> list of (reader, writer).
+        self._idle = {}
+
+    async def get(self, url):
+        """Send a GET request and return a ``(status, reason, body)``
+        tuple. The body is decompressed.
+
+        Raise ``OSError`` if the request could not be sent or if the
+        response is invalid, and ``asyncio.TimeoutError`` if we cannot
+        connect or read from the server within the timeout.
+        """
+        parts = urllib.parse.urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port)
+        target = urllib.parse.urlunsplit(('', '', parts.path or '/', parts.query, ''))
+        request = (
+            'GET %s HTTP/1.1\r\n'
+            'Host: %s\r\n'
+            'Accept-Encoding: %s\r\n'
+            'Connection: keep-alive\r\n'
+            '\r\n' % (target, parts.netloc, ACCEPT_ENCODING)
+        ).encode('ascii')
+        while True:
+            idle = self._idle.get(key)
+            reused = bool(idle)
+            connection = idle.pop() if idle else await self._connect(key)
+            try:
+                return await self._send(key, connection, request)
+            except STALE_CONNECTION_ERRORS:
+                connection[1].close()
+                if not reused:
+                    raise
+                # The server closed the connection while it was idle.
+                # Try again with another connection.
+            except BaseException:
+                connection[1].close()
+                raise
+
+    def _wait(self, awaitable):
+        return asyncio.wait_for(awaitable, self.timeout)
+
+    async def _connect(self, key):
+        scheme, host, port = key
+        ssl_context = None
+        if scheme == 'https':
+            import ssl
+            ssl_context = ssl.create_default_context()
+        return await self._wait(asyncio.open_connection(host, port, ssl=ssl_context))
+
+    async def _send(self, key, connection, request):
+        reader, writer = connection
+        writer.write(request)
+        await self._wait(writer.drain())
+        status_line = await self._wait(reader.readline())
+        if not status_line:
+            raise ConnectionResetError("Connection closed by the server.")
+        try:
+            _, status, reason = status_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+            status = int(status)
+        except ValueError:
+            raise OSError("Invalid HTTP response: %r" % status_line)
+        headers = {}
+        while True:
+            line = await self._wait(reader.readline())
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        body = await self._read_body(reader, headers)
+        if headers.get('connection', '').lower() == 'close' or reader.at_eof():
+            writer.close()
+        else:
+            self._release(key, connection)
+
+        if headers.get('content-encoding', '').lower() in ('gzip', 'x-gzip', 'deflate'):
+            try:
+                # Accept both gzip and zlib headers.
+                body = zlib.decompress(body, zlib.MAX_WBITS | 32)
+            except zlib.error as exc:
+                raise OSError("Could not decompress response: %s" % exc)
+        return status, reason, body
+
+    async def _read_body(self, reader, headers):
+        chunks = []
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            while True:
+                size_line = await self._wait(reader.readline())
+                try:
+                    size = int(size_line.split(b';')[0], 16)
+                except ValueError:
+                    raise OSError("Invalid chunk size: %r" % size_line)
+                if not size:
+                    break
+                await self._read_exactly(reader, size, chunks)
+                await self._wait(reader.readexactly(2))  # CRLF
+            # Skip trailers, if any.
+            while (await self._wait(reader.readline())) not in (b'\r\n', b'\n', b''):
+                pass
+        elif 'content-length' in headers:
+            await self._read_exactly(reader, int(headers['content-length']), chunks)
+        else:
+            while True:
+                chunk = await self._wait(reader.read(CHUNK_SIZE))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        return b''.join(chunks)
+
+    async def _read_exactly(self, reader, size, chunks):
+        """Read ``size`` bytes and append them to ``chunks``."""
+        while size:
+            chunk = await self._wait(reader.read(min(size, CHUNK_SIZE)))
+            if not chunk:
+                raise asyncio.IncompleteReadError(b''.join(chunks), size)
+            chunks.append(chunk)
+            size -= len(chunk)
+
+    def _release(self, key, connection):
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.max_idle_connections:
+            idle.append(connection)
+        else:
+            connection[1].close()
+
+    def close(self):
+        """Close all idle connections."""
+        idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for _, writer in connections:
+                writer.close()
+
+
+class AsyncClient:
+    """Search Hound from an asyncio event loop.
+
+    ``options`` are those of ``Client``. Options that are about
+    printing results (``color``, ``prefix``, etc.), the local cache
+    and ``fan_out`` are ignored. The local catalogue of repositories
+    is not used either: the list of repositories is asked to Hound
+    when patterns of repositories must be resolved. ``transport`` may
+    be an ``AsyncTransport`` shared with other clients.
+    """
+
+    def __init__(self, endpoint, pattern, transport=None, **options):
+        options.update(cache=False, catalogue_ttl=0)
+        # The blocking client is only used for its logic: it never
+        # sends any request, so it does not create any transport.
+        self.client = Client(endpoint, pattern, **options)
+        self.transport = transport or AsyncTransport(timeout=options.get('timeout', DEFAULT_TIMEOUT))
+
+    async def get_all_repos(self):
+        """Return the sorted list of all repositories known by Hound."""
+        response = await self._request(self.client.endpoint_list_repos)
+        return sorted(response.keys())
+
+    async def get_repos(self):
+        """Return the comma-separated list of repositories to search
+        in, or ``*`` for all repositories (see ``Client.repos``).
+        """
+        client = self.client
+        if client._repos is None:
+            repos, exclude_repos = client._repo_selection
+            selected = split_repo_list(repos)
+            all_repos = None
+            if (selected != ['*'] or exclude_repos) and any(is_repo_pattern(repo) for repo in selected):
+                all_repos = await self.get_all_repos()
+            client._repos = client.get_repo_list(repos, exclude_repos, all_repos)
+        return client._repos
+
+    def search(self):
+        """Return an asynchronous iterator of ``ResultLine`` objects.
+
+        Lines are given as soon as the results of a single search, or
+        of each repository if the search has to be split, have been
+        received.
+        """
+        return _SearchIterator(self)
+
+    async def fetch_search_results(self):
+        """Search and return results by repository, like
+        ``Client.fetch_search_results()``.
+
+        Raise ``HoundError`` if any error occurs.
+        """
+        results = collections.OrderedDict()
+        parts = await self._start_search()
+        try:
+            for part in parts:
+                results.update(await part)
+        finally:
+            _cancel(parts)
+        return results
+
+    async def _start_search(self, rng=''):
+        """Start the search and return a list of futures of results.
+
+        The list holds a single future if Hound returns all results at
+        once. Otherwise, the search is split in one future per
+        repository (see ``_search_shards()``).
+        """
+        repos = await self.get_repos()
+        if self.client.page_size is None:
+            try:
+                results = await self._search(self.client._get_search_payload(repos=repos, rng=rng))
+            except HoundServerError as exc:
+                if not exc.is_too_many_results:
+                    raise
+            else:
+                future = asyncio.Future()
+                future.set_result(results)
+                return [future]
+        if repos == '*':
+            repo_names = await self.get_all_repos()
+        else:
+            repo_names = sorted(split_repo_list(repos))
+        return self._search_shards(repo_names)
+
+    async def _search(self, payload):
+        results = (await self._request(self.client.endpoint_search, payload))['Results'] or {}
+        # Hound sorts results by repository name.
+        return collections.OrderedDict(sorted(results.items()))
+
+    def _search_shards(self, repos):
+        """Search each of the given repositories separately, by pages
+        of files, and return a list of futures of results (one for
+        each repository). At most ``jobs`` requests are sent
+        concurrently.
+        """
+        semaphore = asyncio.Semaphore(self.client.jobs)
+        return [asyncio.ensure_future(self._search_repo(repo, semaphore)) for repo in repos]
+
+    async def _search_repo(self, repo, semaphore):
+        """Search a single repository and return its results (which
+        are empty if there is no match).
+        """
+        result, page_size = await self._search_page(repo, 0, self.client.page_size, semaphore)
+        if result is not None and page_size is not None:
+            pages = await asyncio.gather(*[
+                self._search_page(repo, offset, page_size, semaphore)
+                for offset in range(page_size, result['FilesWithMatch'], page_size)
+            ])
+            result = _merge_pages(result, (page for page, _ in pages))
+        return collections.OrderedDict([] if result is None else [(repo, result)])
+
+    async def _search_page(self, repo, offset, limit, semaphore):
+        """See ``Client._search_page()``."""
+        rng = '' if limit is None else '%d:%d' % (offset, limit)
+        try:
+            async with semaphore:
+                results = await self._search(self.client._get_search_payload(repos=repo, rng=rng))
+        except HoundServerError as exc:
+            if not exc.is_too_many_results or limit == 1:
+                raise
+            if limit is None:
+                return await self._search_page(repo, offset, DEFAULT_PAGE_SIZE, semaphore)
+            half = limit // 2
+            first, _ = await self._search_page(repo, offset, half, semaphore)
+            second, _ = await self._search_page(repo, offset + half, limit - half, semaphore)
+            if first is None:
+                return second, limit
+            return _merge_pages(first, [second]), limit
+        return results.get(repo), limit
+
+    async def _request(self, endpoint, params=None):
+        """Call API on Hound server and decode JSON response.
+
+        Raise ``HoundError`` if any error occurs.
+        """
+        if params:
+            endpoint += '?%s' % urllib.parse.urlencode({
+                key: value
+                for key, value in params.items()
+                if value is not None
+            })
+        try:
+            status, reason, body = await self.transport.get(endpoint)
+        except (asyncio.TimeoutError, socket.timeout):
+            raise HoundError("Could not connect to Hound server: timeout.")
+        except (OSError, asyncio.IncompleteReadError) as exc:
+            raise HoundError("Could not connect to Hound server: %s" % exc)
+        # We know that Hound uses utf-8.
+        data = body.decode('utf-8', 'replace')
+        try:
+            result = json.loads(data)
+        except ValueError:
+            if status >= 400:
+                raise HoundError("Could not connect to Hound server: HTTP Error %d: %s" % (status, reason))
+            raise HoundError(
+                "Server did not return a valid JSON response. "
+                "Got this instead:\n%s" % data
+            )
+        if 'Error' in result:
+            raise HoundServerError(result['Error'])
+        if status >= 400:
+            raise HoundError("Could not connect to Hound server: HTTP Error %d: %s" % (status, reason))
+        return result
+
+
+def _cancel(futures):
+    for future in futures:
+        if future.done():
+            # Do not let asyncio complain about unretrieved exceptions.
+            if not future.cancelled():
+                future.exception()
+        else:
+            future.cancel()
+
+
+class _SearchIterator:
+    """The asynchronous iterator returned by ``AsyncClient.search()``.
+
+    Lines of each part of the results (see
+    ``AsyncClient._start_search()``) are given as soon as this part
+    has been received. Searches that are still in progress are
+    cancelled when the iterator stops early (see ``aclose()``).
+    """
+
+    def __init__(self, async_client):
+        self.async_client = async_client
+        self.parts = None
+        self.lines = iter(())
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        client = self.async_client.client
+        while True:
+            for line in self.lines:
+                return ResultLine._make(line)
+            if self.parts is None:
+                # Each file has at least one match: we do not need
+                # more files than matches.
+                rng = '' if client._remaining_matches is None else '0:%d' % client._remaining_matches
+                self.parts = collections.deque(await self.async_client._start_search(rng))
+            if not self.parts or client._remaining_matches == 0:
+                await self.aclose()
+                raise StopAsyncIteration
+            try:
+                results = await self.parts.popleft()
+            except BaseException:
+                await self.aclose()
+                raise
+            files = iter_result_files(results)
+            if client.max_count is not None:
+                files = client._limit_matches(files)
+            self.lines = client.get_file_lines(files)
+
+    async def aclose(self):
+        """Cancel searches that are still in progress."""
+        if self.parts:
+            _cancel(self.parts)
+            self.parts.clear()
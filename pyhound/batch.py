@@ -0,0 +1,100 @@
+"""Run many searches in a single invocation.
+
+Queries are read from a file, one per line. Each line is either a
+bare pattern or a JSON object such as::
+
+    {"id": "old-client", "pattern": "import old_client", "repos": "billing-*", "path": "^src/"}
+
+Searches are sent concurrently, over shared connections. Results are
+printed in the order of the queries, each line being prefixed by the
+id of its query (or its pattern, if the query has no id) and a tab.
+"""
+import concurrent.futures
+import json
+import sys
+
+from pyhound.hound import Client
+from pyhound.hound import HoundError
+from pyhound.hound import iter_result_files
+
+
+# Keys of a JSON query and the corresponding arguments of ``Client``.
+QUERY_OPTIONS = {
+    'repos': 'repos',
+    'exclude_repos': 'exclude_repos',
+    'path': 'path_pattern',
+    'ignore_case': 'ignore_case',
+}
+
+
+def read_queries(fp):
+    """Return the list of queries read from the given file.
+
+    Each query is a dictionary with an ``id``, a ``pattern`` and
+    arguments of ``Client`` that are specific to this query. Empty
+    lines and lines that start with ``#`` are ignored.
+
+    Raise ``ValueError`` if a line is not a valid query.
+    """
+    queries = []
+    for line_number, line in enumerate(fp, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if not line.startswith('{'):
+            queries.append({'id': line, 'pattern': line, 'options': {}})
+            continue
+        try:
+            query = json.loads(line)
+            pattern = query['pattern']
+        except (ValueError, KeyError):
+            raise ValueError("Invalid query on line %d: %s" % (line_number, line))
+        unknown = set(query) - set(QUERY_OPTIONS) - {'id', 'pattern'}
+        if unknown:
+            raise ValueError("Unknown keys on line %d: %s" % (line_number, ', '.join(sorted(unknown))))
+        queries.append({
+            'id': str(query.get('id', pattern)),
+            'pattern': pattern,
+            'options': {
+                QUERY_OPTIONS[key]: value
+                for key, value in query.items()
+                if key in QUERY_OPTIONS
+            },
+        })
+    return queries
+
+
+def run_batch(queries, jobs, **options):
+    """Search all queries and print their results.
+
+    ``options`` are the arguments of ``Client`` that are common to all
+    queries. Return 1 if any search failed, 0 otherwise.
+    """
+    options = dict(options, jobs=jobs)
+    clients = []
+    for query in queries:
+        client_options = dict(options, pattern=query['pattern'], prefix='%s\t' % query['id'])
+        client_options.update(query['options'])
+        client = Client(**client_options)
+        if clients:
+            # Share the catalogue of repositories, so that it is
+            # refreshed only once.
+            client.catalogue = clients[0].catalogue
+        # Share connections (and their options) between clients.
+        options.setdefault('transport', client.transport)
+        clients.append(client)
+
+    status = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(client.fetch_search_results) for client in clients]
+        for query, client, future in zip(queries, clients, futures):
+            try:
+                results = future.result()
+            except HoundError as exc:
+                sys.stderr.write("%s\t%s\n" % (query['id'], exc))
+                status = 1
+                client.report_stats()
+                continue
+            client.print_files(iter_result_files(results))
+            client.report_stats()
+    return status
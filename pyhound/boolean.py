@@ -0,0 +1,213 @@
+"""Boolean queries: files that match several patterns, and not others.
+
+Hound searches a single regular expression. A boolean query such as::
+
+    pyhound -e 'import old_client' --and -e 'old_client.connect' --not -e 'legacy_ok'
+
+is run as a search of each pattern, and results are joined by file
+(repository and file name). Patterns given with consecutive ``-e``
+options (without ``--and`` or ``--not``) are alternatives, like in
+``grep``: they are searched as a single pattern.
+
+The most selective pattern (the one with the longest literal string)
+is searched first. The other patterns are then searched concurrently,
+only in the repositories (and, if there are few of them, the files)
+that matched the first one. Lines of context are only asked for
+patterns that are not negated, and only lines of files that match the
+whole query are shown.
+"""
+import collections
+import re
+import sys
+
+from pyhound.hound import Client
+from pyhound.hound import DEFAULT_JOBS
+from pyhound.hound import HoundError
+from pyhound.hound import iter_result_files
+from pyhound.hound import quote_meta
+
+
+OPERATOR_OR = 'or'
+OPERATOR_AND = 'and'
+OPERATOR_NOT = 'not'
+
+# When later patterns are searched, we restrict them to the files
+# that matched the first pattern if there are at most this many files
+# (otherwise the regular expression of file names would be huge).
+MAX_FILE_FILTER = 100
+
+# Character classes of a regular expression.
+CLASS_RE = re.compile(r'\[\^?\]?(?:\\.|[^\]])*\]')
+# Parts of a regular expression that are not literal characters:
+# escapes of classes (``\w``, ``\d``...), repetitions, groups and
+# other metacharacters.
+NON_LITERAL_RE = re.compile(r'\\[A-Za-z0-9]|\{\d*,?\d*\}|[.+*?()|\[\]{}^$]')
+ESCAPE_RE = re.compile(r'\\(.)')
+GROUP_RE = re.compile(r'\((?:\\.|[^()\\])*\)')
+ALTERNATIVE_RE = re.compile(r'(?<!\\)\|')
+
+
+def get_terms(expressions):
+    """Return ``(pattern, negated)`` tuples of the given list of
+    ``(operator, pattern)`` tuples (see ``OPERATOR_*``). Patterns that
+    are linked by ``OPERATOR_OR`` are merged in a single pattern.
+
+    Raise ``ValueError`` if the query has no pattern that is not
+    negated.
+    """
+    groups = []
+    for operator, pattern in expressions:
+        if operator == OPERATOR_OR and groups:
+            groups[-1][0].append(pattern)
+        else:
+            groups.append(([pattern], operator == OPERATOR_NOT))
+    terms = [(get_alternation(patterns), negated) for patterns, negated in groups]
+    if all(negated for _, negated in terms):
+        raise ValueError("at least one pattern must not be negated")
+    return terms
+
+
+def get_alternation(patterns):
+    """Return a regular expression that matches any of the given
+    patterns.
+    """
+    if len(patterns) == 1:
+        return patterns[0]
+    return '|'.join('(?:%s)' % pattern for pattern in patterns)
+
+
+def get_selectivity(pattern):
+    """Return an estimate of how selective the given pattern is: the
+    length of the longest literal string that every match contains.
+    The longer, the fewer files are likely to match.
+    """
+    pattern = CLASS_RE.sub('.', pattern)
+    # Groups may be optional or hold alternatives: their literals are
+    # not counted.
+    count = 1
+    while count:
+        pattern, count = GROUP_RE.subn('.', pattern)
+    selectivity = None
+    for alternative in ALTERNATIVE_RE.split(pattern):
+        literals = []
+        pos = 0
+        for match in NON_LITERAL_RE.finditer(alternative):
+            literal = alternative[pos:match.start()]
+            if match.group()[0] in '*?{':
+                # The last character may not be there.
+                literal = literal[:-1]
+            literals.append(literal)
+            pos = match.end()
+        literals.append(alternative[pos:])
+        longest = max(len(ESCAPE_RE.sub(r'\1', literal)) for literal in literals)
+        selectivity = longest if selectivity is None else min(selectivity, longest)
+    return selectivity
+
+
+def _merge_matches(matches, other_matches):
+    """Return matches of both lists, once each, sorted by line
+    number.
+    """
+    by_line = {match['LineNumber']: match for match in other_matches}
+    by_line.update((match['LineNumber'], match) for match in matches)
+    return [by_line[line_number] for line_number in sorted(by_line)]
+
+
+class BooleanClient:
+    """Search files that match a boolean query and print their lines.
+
+    ``terms`` is a list of ``(pattern, negated)`` tuples (see
+    ``get_terms()``). ``options`` are the arguments of ``Client``.
+    """
+
+    def __init__(self, terms, **options):
+        self.terms = terms
+        self.options = options
+        self._first_client = None
+
+    def _get_client(self, pattern, **options):
+        client = Client(pattern=pattern, **dict(self.options, **options))
+        # Share connections and the catalogue of repositories between
+        # all searches.
+        if self._first_client is None:
+            self._first_client = client
+            self.options['transport'] = client.transport
+        else:
+            client.catalogue = self._first_client.catalogue
+            # Statistics of all searches are reported together.
+            client.stats = self._first_client.stats
+        return client
+
+    def run(self):
+        positive = [pattern for pattern, negated in self.terms if not negated]
+        # Matches of all patterns are highlighted.
+        client = self._get_client(get_alternation(positive))
+        try:
+            files = self.fetch_matching_files()
+            client.print_files(files)
+        except HoundError as exc:
+            sys.exit(str(exc))
+        finally:
+            client.report_stats()
+
+    def fetch_matching_files(self):
+        """Return a list of ``(repo, filename, matches)`` tuples for
+        files that match the query. Matches of all patterns that are
+        not negated are merged.
+
+        Raise ``HoundError`` if any error occurs.
+        """
+        positive = [pattern for pattern, negated in self.terms if not negated]
+        negative = [pattern for pattern, negated in self.terms if negated]
+        # ``sorted()`` is stable: patterns that are as selective as
+        # each other are searched in the order of the query.
+        positive = sorted(positive, key=get_selectivity, reverse=True)
+
+        # A hash index of matching files, in the order of the results
+        # of the first search.
+        index = collections.OrderedDict(
+            ((repo, filename), matches)
+            for repo, filename, matches in self._search(positive[0])
+        )
+        others = [(pattern, False) for pattern in positive[1:]] + [(pattern, True) for pattern in negative]
+        if not index or not others:
+            return [key + (matches,) for key, matches in index.items()]
+
+        import concurrent.futures
+        repos = ','.join(sorted({repo for repo, _ in index}))
+        filenames = {filename for _, filename in index}
+        if len(filenames) <= MAX_FILE_FILTER:
+            files = '^(?:%s)$' % '|'.join(sorted(quote_meta(filename) for filename in filenames))
+        else:
+            files = None
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.options.get('jobs', DEFAULT_JOBS)) as executor:
+            futures = [
+                executor.submit(self._search, pattern, negated, repos, files)
+                for pattern, negated in others
+            ]
+            for (_, negated), future in zip(others, futures):
+                found = {(repo, filename): matches for repo, filename, matches in future.result()}
+                for key in list(index):
+                    if negated and key in found:
+                        del index[key]
+                    elif not negated and key not in found:
+                        del index[key]
+                    elif not negated:
+                        index[key] = _merge_matches(index[key], found[key])
+        return [key + (matches,) for key, matches in index.items()]
+
+    def _search(self, pattern, negated=False, repos=None, files=None):
+        """Search the given pattern and return ``(repo, filename,
+        matches)`` tuples. ``repos`` and ``files`` restrict the search
+        to the given repositories and files.
+        """
+        options = {'max_count': None, 'stats_hook': None}
+        if repos is not None:
+            options.update(repos=repos, exclude_repos=None)
+        if files is not None:
+            options['path_pattern'] = files
+        if negated:
+            # We only need to know which files match.
+            options['files_with_matches'] = True
+        client = self._get_client(pattern, **options)
+        return list(iter_result_files(client.fetch_search_results()))
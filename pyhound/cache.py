@@ -0,0 +1,179 @@
+"""A local cache of search results and of lists of repositories.
+
+Each entry holds the results of a search (for a given Hound server,
+pattern, path pattern, etc.) for each repository that has matches,
+along with the revision of the repository that Hound searched. It is
+up to the client to decide whether cached results are still valid.
+
+Entries are stored as files in a directory. When the total size of
+the entries exceeds the given limit, the least recently used entries
+are removed.
+
+The same directory holds the list of repositories of each Hound
+server, so that we do not have to ask for it on each search.
+"""
+# ``hashlib``, ``json``, ``tempfile`` and ``threading`` are only
+# imported when they are needed, to keep the start-up of the
+# command-line client fast.
+import os
+import time
+
+
+DEFAULT_CACHE_SIZE = 100  # in MB
+
+DEFAULT_CATALOGUE_TTL = 3600  # in seconds
+
+ENTRY_SUFFIX = '.json'
+
+
+def get_default_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pyhound')
+
+
+def _write_json(directory, path, data):
+    """Atomically write ``data`` as JSON in the given file."""
+    import json
+    import tempfile
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with open(fd, 'w', encoding='utf-8') as fp:
+            json.dump(data, fp)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class ResultCache:
+
+    def __init__(self, directory, max_size=DEFAULT_CACHE_SIZE):
+        self.directory = os.path.join(directory, 'results')
+        self.max_size = max_size * 1024 * 1024
+
+    @staticmethod
+    def get_key(endpoint, payload):
+        """Return the key of the entry for the given search.
+
+        Repositories and ranges are not part of the key: an entry
+        holds results of all repositories that have been searched.
+        """
+        import hashlib
+        import json
+        normalized = {
+            key: value or ''
+            for key, value in payload.items()
+            if key not in ('repos', 'rng')
+        }
+        normalized['endpoint'] = endpoint
+        serialized = json.dumps(normalized, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(serialized).hexdigest()
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+    def get(self, key):
+        """Return results (by repository) stored for the given key,
+        or an empty dictionary.
+        """
+        import json
+        path = self._get_path(key)
+        try:
+            with open(path, encoding='utf-8') as fp:
+                results = json.load(fp)
+            # Remember that this entry has been used recently.
+            os.utime(path)
+        except (OSError, ValueError):
+            return {}
+        return results
+
+    def set(self, key, results):
+        """Store results (by repository) for the given key."""
+        _write_json(self.directory, self._get_path(key), results)
+        self._evict()
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits in
+        its maximum size.
+        """
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(ENTRY_SUFFIX):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total_size -= size
+
+
+class RepoCatalogue:
+    """A local copy of the list of repositories of Hound servers.
+
+    The list is fetched again in the background when it is older than
+    the given time-to-live (in seconds). Meanwhile, the outdated list
+    is used.
+    """
+
+    def __init__(self, directory, ttl=DEFAULT_CATALOGUE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self._refresh_thread = None
+
+    def _get_path(self, endpoint):
+        import hashlib
+        key = hashlib.sha256(endpoint.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, 'repos-%s%s' % (key[:16], ENTRY_SUFFIX))
+
+    def get(self, endpoint, fetch):
+        """Return the list of repositories of the given endpoint.
+
+        ``fetch`` is a function that returns the list from Hound. It
+        is called if the list is not in the catalogue yet (and then
+        any exception is propagated) or if it is outdated (and then it
+        is called in a background thread and exceptions are ignored).
+        """
+        import json
+        path = self._get_path(endpoint)
+        try:
+            age = time.time() - os.stat(path).st_mtime
+            with open(path, encoding='utf-8') as fp:
+                repos = json.load(fp)['repos']
+        except (OSError, ValueError, KeyError):
+            repos = fetch()
+            self._store(path, endpoint, repos)
+            return repos
+        if age > self.ttl and self._refresh_thread is None:
+            import threading
+            self._refresh_thread = threading.Thread(target=self._refresh, args=(path, endpoint, fetch))
+            self._refresh_thread.start()
+        return repos
+
+    def _refresh(self, path, endpoint, fetch):
+        try:
+            repos = fetch()
+        except Exception:  # pylint: disable=broad-except
+            return
+        self._store(path, endpoint, repos)
+
+    def _store(self, path, endpoint, repos):
+        try:
+            _write_json(self.directory, path, {'endpoint': endpoint, 'repos': repos})
+        except OSError:
+            pass
+
+    def wait(self):
+        """Wait for the background refresh, if any, to finish."""
+        if self._refresh_thread is not None:
+            self._refresh_thread.join()
@@ -1,34 +1,112 @@
 import argparse
 import os
-import pkg_resources
+import sys
 
+from pyhound.cache import DEFAULT_CACHE_SIZE
+from pyhound.boolean import OPERATOR_AND
+from pyhound.boolean import OPERATOR_NOT
+from pyhound.boolean import OPERATOR_OR
+from pyhound.boolean import get_terms
+from pyhound.cache import DEFAULT_CATALOGUE_TTL
 from pyhound.hound import Client
+from pyhound.hound import DEFAULT_CONNECT_TIMEOUT
+from pyhound.hound import DEFAULT_JOBS
+from pyhound.hound import DEFAULT_RETRIES
+from pyhound.hound import DEFAULT_TIMEOUT
+from pyhound.hound import OUTPUT_ORDER_COMPLETION
+from pyhound.hound import OUTPUT_ORDER_REPOSITORY
 
 DEFAULT_ENDPOINT = 'http://localhost:6080/'
 
-VERSION = pkg_resources.get_distribution('pyhound').version
+
+def split_endpoint_list(endpoints):
+    """Return endpoints of the given list, separated by commas or
+    white space (e.g. the ``HOUND_ENDPOINT`` environment variable).
+    """
+    return endpoints.replace(',', ' ').split()
+
+
+def get_version():
+    try:
+        from importlib import metadata  # Python >= 3.8
+    except ImportError:
+        # This is slow since it scans all installed distributions.
+        import pkg_resources
+        return pkg_resources.get_distribution('pyhound').version
+    return metadata.version('pyhound')
+
+
+class ExpressionAction(argparse.Action):
+    """Add a pattern of a boolean query (``-e``). It is linked to the
+    previous pattern by the last ``--and`` or ``--not`` option, or is an
+    alternative of the previous pattern.
+    """
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        expressions = list(namespace.expressions or [])
+        operator = namespace.operator or (OPERATOR_OR if expressions else OPERATOR_AND)
+        expressions.append((operator, values))
+        namespace.expressions = expressions
+        namespace.operator = None
+
+
+class OperatorAction(argparse.Action):
+    """Link the next ``-e`` pattern to the previous ones with the given
+    operator (``--and`` or ``--not``).
+    """
+
+    def __init__(self, option_strings, dest, const, help=None):  # pylint: disable=redefined-builtin
+        super().__init__(option_strings, dest=dest, const=const, nargs=0, help=help)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        if namespace.operator is not None:
+            parser.error("argument %s: must be followed by -e" % namespace.operator_option)
+        namespace.operator = self.const
+        namespace.operator_option = option_string
+
+
+class VersionAction(argparse.Action):
+    """Like the 'version' action of ``argparse``, except that the
+    version is looked up only if the option is used.
+    """
+
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, default=argparse.SUPPRESS,
+                 help=None):  # pylint: disable=redefined-builtin
+        super().__init__(option_strings, dest=dest, default=default, nargs=0, help=help)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        parser.exit(message='%s %s\n' % (parser.prog, get_version()))
 
 
 def parse_args():
     parser = argparse.ArgumentParser(
         prog="pyhound",
         description="A command-line client for Hound.")
-    parser.add_argument('--version', action='version', version='%%(prog)s %s' % VERSION)
+    parser.add_argument(
+        '--version', action=VersionAction, help="show program's version number and exit")
 
     # Hound-specific options
-    default_endpoint = os.environ.get('HOUND_ENDPOINT', DEFAULT_ENDPOINT)
+    default_endpoints = split_endpoint_list(os.environ.get('HOUND_ENDPOINT', DEFAULT_ENDPOINT))
+    parser.add_argument(
+        '--endpoint', metavar='URL', action='append', dest='endpoints',
+        help="Host and port of the Hound server. Repeat this option to search several servers "
+             "concurrently: each line of output is then prefixed by the name of its server. You may "
+             "also set a HOUND_ENDPOINT environment variable (with URLs separated by commas). "
+             "Default: %s" % ','.join(default_endpoints))
     parser.add_argument(
-        '--endpoint', metavar='URL', action='store', default=default_endpoint,
-        help="Host and port of the Hound server. You may also set a HOUND_ENDPOINT "
-             "environment variable. Default: %s" % default_endpoint)
+        '--shard-timeout', metavar='SECONDS', type=float,
+        help="With several endpoints, give up on servers that have not returned their results "
+             "after SECONDS, with a warning. Results of other servers are still shown.")
 
     parser.add_argument(
         '--repos', metavar='REPOSITORY_LIST', action='store', default='*',
-        help="A comma-separated list of repositories to search in. Default: all.")
+        help="A comma-separated list of repositories to search in. Glob patterns (e.g. 'billing-*') "
+             "and regular expressions prefixed by 're:' (e.g. 're:^billing-') are allowed. Default: all.")
 
     parser.add_argument(
         '--exclude-repos', metavar='REPOSITORY_LIST', action='store', default=None,
-        help="A comma-separated list of repositories to exclude.")
+        help="A comma-separated list of repositories to exclude. Glob patterns and regular "
+             "expressions are allowed, as for --repos.")
 
     parser.add_argument(
         '--path', metavar='FILE_PATH_PATTERN', action='store', dest='path_pattern', default=None,
@@ -37,6 +115,19 @@ def parse_args():
     # Help text of grep-like options have been adapted from the grep
     # manual.
 
+    # Grep-like options: patterns (-e), with boolean operators
+    parser.add_argument(
+        '-e', '--regexp', metavar='PATTERN', action=ExpressionAction, dest='expressions',
+        help="Search PATTERN. Consecutive -e patterns are alternatives, unless they are linked by "
+             "--and or --not: only files that match each pattern given after --and (and none given "
+             "after --not) are shown.")
+    parser.add_argument(
+        '--and', action=OperatorAction, dest='operator', const=OPERATOR_AND,
+        help="Only show files that also match the next -e pattern.")
+    parser.add_argument(
+        '--not', action=OperatorAction, dest='operator', const=OPERATOR_NOT,
+        help="Only show files that do not match the next -e pattern.")
+
     # Grep-like options: context (-A, -B, -C)
     parser.add_argument(
         '-A', '--after-context', metavar='NUM', action='store', type=int,
@@ -69,27 +160,266 @@ def parse_args():
         '-n', '--line-number', action='store_true', dest='show_line_number',
         help="Prefix each line of output with the 1-based line number within its input file.")
 
+    # Grep-like options: output modes (-l, -c, -m)
+    parser.add_argument(
+        '-l', '--files-with-matches', action='store_true',
+        help="Suppress normal output; instead print the name of each file that matches.")
+    parser.add_argument(
+        '-c', '--count', action='store_true',
+        help="Suppress normal output; instead print a count of matching lines for each file that "
+             "matches.")
+    parser.add_argument(
+        '-m', '--max-count', metavar='NUM', type=int,
+        help="Stop after NUM matching lines (in all files). Trailing context of the last matching "
+             "line is still printed.")
+
     # Misc options: --max-line-length
     parser.add_argument(
         '--line-max-length', type=int,
         help="If given, don't show matching lines if they are longer than requested.")
 
+    # Misc options: sharding of large searches
+    parser.add_argument(
+        '--page-size', metavar='NUM', type=int,
+        help="Split the search in requests of NUM files per repository. By default, the search is "
+             "split only if Hound says that there are too many results.")
+    parser.add_argument(
+        '-j', '--jobs', metavar='NUM', type=int, default=DEFAULT_JOBS,
+        help="Number of concurrent requests when the search is split. Default: %d." % DEFAULT_JOBS)
+    parser.add_argument(
+        '--fan-out', action='store_true',
+        help="Search each repository separately and concurrently, and show results of each "
+             "repository as soon as they are available.")
+    parser.add_argument(
+        '--output-order', metavar='ORDER', action='store',
+        choices=(OUTPUT_ORDER_REPOSITORY, OUTPUT_ORDER_COMPLETION), default=OUTPUT_ORDER_REPOSITORY,
+        help='With --fan-out, show results in the order of repositories ("%s") or as soon as '
+             'each repository has been searched ("%s"). Default: %s.' % (
+                 OUTPUT_ORDER_REPOSITORY, OUTPUT_ORDER_COMPLETION, OUTPUT_ORDER_REPOSITORY))
+
+    # Misc options: timeouts and retries
+    parser.add_argument(
+        '--timeout', metavar='SECONDS', type=float, default=DEFAULT_TIMEOUT,
+        help="Maximum time to wait for each read from the Hound server (not for the whole "
+             "response). Default: %s." % DEFAULT_TIMEOUT)
+    parser.add_argument(
+        '--connect-timeout', metavar='SECONDS', type=float, default=DEFAULT_CONNECT_TIMEOUT,
+        help="Maximum time to connect to the Hound server. Default: %s." % DEFAULT_CONNECT_TIMEOUT)
+    parser.add_argument(
+        '--retries', metavar='NUM', type=int, default=DEFAULT_RETRIES,
+        help="Send requests again, up to NUM times, when they fail to connect or get a 502, 503 or "
+             "504 error, after a random delay that doubles after each attempt. Default: %d."
+             % DEFAULT_RETRIES)
+    parser.add_argument(
+        '--hedge-after', metavar='SECONDS', type=float,
+        help="If Hound has not answered a request after SECONDS, send it again (possibly to another "
+             "replica behind a load balancer) and use the first response.")
+
+    # Misc options: local cache
+    parser.add_argument(
+        '--cache', action='store_true',
+        help="Cache search results locally. Repositories that have not changed since their "
+             "results have been cached are not searched again.")
+    parser.add_argument(
+        '--cache-dir', metavar='DIR', action='store',
+        help="Directory of the local cache. Default: $XDG_CACHE_HOME/pyhound or ~/.cache/pyhound.")
+    parser.add_argument(
+        '--cache-size', metavar='MB', type=int, default=DEFAULT_CACHE_SIZE,
+        help="Maximum size of cached search results, in megabytes. Least recently used results "
+             "are removed first. Default: %d." % DEFAULT_CACHE_SIZE)
+    parser.add_argument(
+        '--catalogue-ttl', metavar='SECONDS', type=int, default=DEFAULT_CATALOGUE_TTL,
+        help="The list of repositories of the Hound server (used to resolve patterns of --repos and "
+             "--exclude-repos) is kept in the cache directory, and refreshed in the background when "
+             "it is older than SECONDS. Use 0 to always get the list from the server. Default: %d."
+             % DEFAULT_CATALOGUE_TTL)
+
+    # Misc options: local store of results
+    parser.add_argument(
+        '--save', metavar='FILE', dest='save_path',
+        help="Also save results of the search (with 20 lines of context) in FILE, a SQLite "
+             "database, so that they can be refined with --from-store. An existing FILE is "
+             "replaced only if it is such a database.")
+    parser.add_argument(
+        '--from-store', metavar='FILE', dest='store_path',
+        help="Search results saved in FILE with --save instead of asking Hound. PATTERN is "
+             "matched against saved matching lines (all of them if PATTERN is not given). "
+             "--repos, --exclude-repos, --path, -A, -B, -C, --line-max-length and output options "
+             "apply as usual.")
+
+    # Misc options: watch mode
+    parser.add_argument(
+        '--watch', metavar='SECONDS', type=float,
+        help="Keep running and search again every SECONDS, printing only lines that have been added "
+             "(prefixed by '+') or removed (prefixed by '-') since the previous search. Only "
+             "repositories whose revision has changed are searched again.")
+
+    # Misc options: statistics
+    parser.add_argument(
+        '--stats', metavar='FORMAT', nargs='?', choices=('human', 'json'), const='human',
+        help="Print statistics of the search on the standard error: where the time went (connection, "
+             "search on the Hound server, download, decoding, context, formatting and output) and "
+             "what Hound reported. FORMAT may be \"human\" (the default) or \"json\".")
+
+    # Misc options: batch mode
+    parser.add_argument(
+        '--batch', metavar='FILE', type=argparse.FileType('r'),
+        help="Search all queries listed in FILE (or standard input if FILE is '-'), one per line, "
+             "concurrently. Each line is either a pattern or a JSON object with a \"pattern\" and "
+             "optional \"id\", \"repos\", \"exclude_repos\", \"path\" and \"ignore_case\" keys. "
+             "Each line of output is prefixed by the id (or the pattern) of its query and a tab.")
+
+    # Misc options: server mode
+    parser.add_argument(
+        '--serve', action='store_true',
+        help="Keep running and answer search requests, read as JSON objects (one per line) from "
+             "the standard input or from connections to the Unix socket given by --socket. See "
+             "the documentation of pyhound.server for the protocol.")
+    parser.add_argument(
+        '--socket', metavar='PATH', action='store', dest='socket_path',
+        help="With --serve, listen on a Unix socket at PATH instead of reading the standard input.")
+
     # Positional argument: the pattern to search.
     parser.add_argument(
-        'pattern', metavar="PATTERN", action='store',
+        'pattern', metavar="PATTERN", action='store', nargs='?',
         help="The regular expression to search.")
 
-    return parser.parse_args()
+    options = parser.parse_args()
+    if options.operator is not None:
+        parser.error("argument %s: must be followed by -e" % options.operator_option)
+    del options.operator
+    options.__dict__.pop('operator_option', None)
+    options.terms = None
+    if options.expressions:
+        if options.pattern is not None:
+            parser.error("PATTERN cannot be used with -e")
+        if options.batch is not None or options.serve:
+            parser.error("-e cannot be used with --batch or --serve")
+        try:
+            options.terms = get_terms(options.expressions)
+        except ValueError as exc:
+            parser.error("argument -e/--regexp: %s" % exc)
+    del options.expressions
+    if options.save_path is not None or options.store_path is not None:
+        if options.save_path is not None and options.store_path is not None:
+            parser.error("--save cannot be used with --from-store")
+        if options.batch is not None or options.serve or options.terms or len(options.endpoints or ()) > 1:
+            parser.error("--save and --from-store cannot be used with --batch, --serve, -e or several endpoints")
+    if options.watch is not None:
+        if options.watch <= 0:
+            parser.error("argument --watch: must be positive")
+        if (options.after_context or options.before_context or options.context or options.count
+                or options.max_count is not None or options.batch is not None or options.serve
+                or options.terms or len(options.endpoints or ()) > 1
+                or options.save_path is not None or options.store_path is not None):
+            parser.error("--watch cannot be used with -A, -B, -C, -c, -m, -e, --batch, --serve, --save, "
+                         "--from-store or several endpoints")
+    if (options.pattern is None and options.terms is None and options.batch is None and not options.serve
+            and options.store_path is None):
+        parser.error("the following arguments are required: PATTERN")
+    if options.max_count is not None and options.max_count < 0:
+        parser.error("argument -m/--max-count: must not be negative")
+    if options.retries < 0:
+        parser.error("argument --retries: must not be negative")
+    if not options.endpoints:
+        options.endpoints = default_endpoints
+    if len(options.endpoints) > 1 and (options.batch is not None or options.serve or options.terms):
+        parser.error("several endpoints cannot be used with --batch, --serve or -e")
+    return options
+
+
+def get_stats_hook(stats_format):
+    """Return a function that prints statistics of a search on the
+    standard error, in the given format.
+    """
+    def print_stats(stats):
+        if stats_format == 'json':
+            import json
+            sys.stderr.write(json.dumps(stats.as_dict()) + '\n')
+        else:
+            sys.stderr.write(stats.format())
+        sys.stderr.flush()
+    return print_stats
 
 
 def main():
+    try:
+        return _main()
+    except BrokenPipeError:
+        # The reader of our output has gone away (e.g. ``| head``).
+        # Python would complain again when flushing the standard
+        # output at exit, so we redirect it to /dev/null.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        # ``sys.exit()`` would wait for threads of pending searches
+        # (see ``concurrent.futures``), which nobody needs anymore.
+        sys.stderr.flush()
+        os._exit(1)
+
+
+def _main():
     options = parse_args()
     # If the user calls "--color" without any value, we get None.
     if options.color is None:
         options.color = 'auto'
+    batch = options.__dict__.pop('batch')
+    endpoints = options.__dict__.pop('endpoints')
+    shard_timeout = options.__dict__.pop('shard_timeout')
+    options.endpoint = endpoints[0]
+    terms = options.__dict__.pop('terms')
+    if terms is not None and len(terms) == 1:
+        # A single pattern, or alternatives of patterns.
+        options.pattern = terms[0][0]
+        terms = None
+    save_path = options.__dict__.pop('save_path')
+    store_path = options.__dict__.pop('store_path')
+    watch = options.__dict__.pop('watch')
+    # Modules of batch and server modes are only imported if needed,
+    # to keep the start-up fast.
+    if options.__dict__.pop('serve'):
+        from pyhound.server import serve
+        del options.pattern
+        del options.stats
+        return serve(**options.__dict__)
+    del options.socket_path
+    stats_format = options.__dict__.pop('stats')
+    if stats_format is not None:
+        options.stats_hook = get_stats_hook(stats_format)
+    if batch is not None:
+        from pyhound.batch import read_queries
+        from pyhound.batch import run_batch
+        del options.pattern
+        try:
+            queries = read_queries(batch)
+        except ValueError as exc:
+            sys.exit(str(exc))
+        return run_batch(queries, **options.__dict__)
+    if terms is not None:
+        from pyhound.boolean import BooleanClient
+        del options.pattern
+        return BooleanClient(terms, **options.__dict__).run()
+    if len(endpoints) > 1:
+        from pyhound.federation import FederatedClient
+        del options.endpoint
+        return FederatedClient(endpoints, shard_timeout=shard_timeout, **options.__dict__).run()
+    if save_path is not None:
+        from pyhound.store import SavingClient
+        return SavingClient(store_path=save_path, **options.__dict__).run()
+    if store_path is not None:
+        from pyhound.store import StoreClient
+        from pyhound.store import StoreError
+        del options.endpoint
+        try:
+            c = StoreClient(store_path, **options.__dict__)
+        except StoreError as exc:
+            sys.exit(str(exc))
+        return c.run()
     c = Client(**options.__dict__)
+    if watch is not None:
+        from pyhound.watch import Watcher
+        return Watcher(c, watch).run()
     return c.run()
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""Search several Hound servers at once.
+
+Some organizations split their code between several Hound servers. A
+``FederatedClient`` searches all of them concurrently, each with its
+own resolution of repositories (patterns of ``--repos`` are matched
+against the repositories of each server), and prints their results in
+the order of the servers. Each line of output is prefixed by the name
+of its server and a tab.
+
+A server that fails, or that does not answer within the given
+timeout, does not prevent results of other servers from being
+printed: a warning is printed on the standard error instead.
+"""
+import concurrent.futures
+import sys
+import threading
+import time
+import urllib.parse
+
+from pyhound.hound import Client
+from pyhound.hound import HoundError
+from pyhound.hound import NoRepositoryError
+from pyhound.hound import iter_result_files
+
+
+def get_server_names(endpoints):
+    """Return a short name for each of the given endpoints: its host
+    and port, or the whole URL if this is not enough to tell servers
+    apart.
+    """
+    names = [urllib.parse.urlsplit(endpoint).netloc or endpoint for endpoint in endpoints]
+    if len(set(names)) < len(names):
+        names = [endpoint.rstrip('/') for endpoint in endpoints]
+    return names
+
+
+def _run_in_thread(function):
+    """Call ``function`` in a daemon thread and return a future of its
+    result.
+
+    Threads of ``concurrent.futures`` executors are waited for when the
+    program exits, which we do not want for a server that does not
+    answer.
+    """
+    future = concurrent.futures.Future()
+
+    def run():
+        try:
+            result = function()
+        except BaseException as exc:  # pylint: disable=broad-except
+            future.set_exception(exc)
+        else:
+            future.set_result(result)
+
+    thread = threading.Thread(target=run)
+    thread.daemon = True
+    thread.start()
+    return future
+
+
+class FederatedClient:
+    """Search the given Hound servers and print their results.
+
+    ``options`` are the arguments of ``Client`` that are common to all
+    servers. ``shard_timeout`` is the maximum time (in seconds) that
+    we wait for the results of each server, or None to wait as long as
+    servers keep answering.
+    """
+
+    def __init__(self, endpoints, shard_timeout=None, **options):
+        assert endpoints
+        self.shard_timeout = shard_timeout
+        self.names = get_server_names(endpoints)
+        self.clients = []
+        for endpoint, name in zip(endpoints, self.names):
+            client = Client(endpoint, prefix='%s\t' % name, **options)
+            # Share connections (and their options) between clients.
+            options.setdefault('transport', client.transport)
+            self.clients.append(client)
+
+    def run(self):
+        """Search all servers and print their results. Return 1 if any
+        server failed, 0 otherwise.
+        """
+        if self.clients[0].max_count == 0:
+            return 0
+        deadline = None if self.shard_timeout is None else time.monotonic() + self.shard_timeout
+        futures = [_run_in_thread(self._fetch_search_results(client)) for client in self.clients]
+        status = 0
+        remaining_matches = self.clients[0].max_count
+        for name, client, future in zip(self.names, self.clients, futures):
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                results = future.result(timeout=timeout)
+            except concurrent.futures.TimeoutError:
+                self._warn(name, "no response after %s seconds" % self.shard_timeout)
+                status = 1
+                continue
+            except HoundError as exc:
+                self._warn(name, exc)
+                status = 1
+                client.report_stats()
+                continue
+            # The maximum count of matches applies to all servers.
+            client._remaining_matches = remaining_matches
+            client.print_files(iter_result_files(results))
+            remaining_matches = client._remaining_matches
+            client.report_stats()
+            if remaining_matches == 0:
+                break
+        return status
+
+    @staticmethod
+    def _fetch_search_results(client):
+        def fetch():
+            try:
+                client.repos  # pylint: disable=pointless-statement
+            except NoRepositoryError:
+                # Other servers may have the repositories that we look
+                # for.
+                return {}
+            return client.fetch_search_results()
+        return fetch
+
+    @staticmethod
+    def _warn(name, message):
+        sys.stderr.write("pyhound: warning: %s: %s\n" % (name, message))
+        sys.stderr.flush()
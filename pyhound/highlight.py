@@ -0,0 +1,255 @@
+"""Highlighting of matches in lines of results.
+
+Hound matches lines with Go regular expressions (RE2), which run in
+linear time. Python regular expressions have a slightly different
+syntax and may backtrack catastrophically on some patterns (e.g.
+``(a+)+b``, ``(a|aa)*c`` or ``.*.*=``). We look for matches with RE2
+if the ``re2`` module is installed. Otherwise, the pattern is
+translated to a Python regular expression, unless it may be too slow:
+matches are then simply not highlighted.
+"""
+import functools
+import re
+
+
+# Lines that are longer than this are not highlighted with Python
+# regular expressions, since some patterns take polynomial time.
+MAX_PYTHON_LINE_LENGTH = 2000
+
+GO_REGEXP_META_RE = re.compile(r'[\\.+*?()|\[\]{}^$]')
+UNBOUNDED_REPETITION_RE = re.compile(r'[*+]|\{\d*,\}')
+
+POSIX_CLASSES = {
+    'alnum': '0-9A-Za-z',
+    'alpha': 'A-Za-z',
+    'ascii': '\\x00-\\x7f',
+    'blank': '\\t ',
+    'cntrl': '\\x00-\\x1f\\x7f',
+    'digit': '0-9',
+    'graph': '!-~',
+    'lower': 'a-z',
+    'print': ' -~',
+    'punct': '!-/:-@\\[-`{-~',
+    'space': '\\t\\n\\v\\f\\r ',
+    'upper': 'A-Z',
+    'word': '0-9A-Za-z_',
+    'xdigit': '0-9A-Fa-f',
+}
+POSIX_CLASS_RE = re.compile(r'\[:(%s):\]' % '|'.join(POSIX_CLASSES))
+
+
+def _find_class_end(pattern, i):
+    """Return the position just after the end of the character class
+    that starts at ``i``.
+    """
+    j = i + 1
+    if pattern.startswith('^', j):
+        j += 1
+    if pattern.startswith(']', j):
+        j += 1  # A leading bracket is a literal.
+    while j < len(pattern):
+        if pattern[j] == '\\':
+            j += 2
+            continue
+        if pattern.startswith('[:', j):
+            end = pattern.find(':]', j + 2)
+            if end != -1:
+                j = end + 2
+                continue
+        if pattern[j] == ']':
+            return j + 1
+        j += 1
+    return len(pattern)
+
+
+def translate_go_regexp(pattern):
+    """Translate the syntax of Go regular expressions that Python does
+    not understand (``\\Q...\\E``, ``\\z`` and POSIX classes such as
+    ``[[:alpha:]]``).
+
+    Other unsupported constructs are kept as is: Python will refuse
+    to compile them.
+    """
+    parts = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            escaped = pattern[i + 1:i + 2]
+            if escaped == 'Q':
+                end = pattern.find('\\E', i + 2)
+                if end == -1:
+                    end = len(pattern)
+                parts.append(re.escape(pattern[i + 2:end]))
+                i = end + 2
+                continue
+            parts.append('\\Z' if escaped == 'z' else pattern[i:i + 2])
+            i += 2
+        elif char == '[':
+            end = _find_class_end(pattern, i)
+            parts.append(POSIX_CLASS_RE.sub(lambda m: POSIX_CLASSES[m.group(1)], pattern[i:end]))
+            i = end
+        else:
+            parts.append(char)
+            i += 1
+    return ''.join(parts)
+
+
+def has_nested_quantifiers(pattern):
+    """Return whether the given regular expression repeats a group
+    that itself holds a repetition or alternatives, like ``(a+)+`` or
+    ``(a|aa)+``. A backtracking engine may take exponential time on
+    such patterns.
+    """
+    # For each open group, whether it holds a repetition or
+    # alternatives.
+    groups = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '[':
+            i = _find_class_end(pattern, i)
+            continue
+        if char == '(':
+            groups.append(False)
+        elif char == ')' and groups:
+            ambiguous = groups.pop()
+            if ambiguous and pattern[i + 1:i + 2] in ('*', '+', '{'):
+                return True
+            if ambiguous and groups:
+                groups[-1] = True
+        elif char in '*+{|' and groups:
+            groups[-1] = True
+        i += 1
+    return False
+
+
+def count_unbounded_wildcards(pattern):
+    """Return how many times the given regular expression repeats,
+    without an upper bound, something that matches almost any
+    character (``.*``, ``\\S+``, ``[^,]{2,}``...). Each of them
+    multiplies the time that a backtracking engine may take by the
+    length of the line.
+    """
+    count = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            end = i + 2
+            wildcard = pattern[i + 1:end] in ('S', 'W', 'D')
+        elif char == '[':
+            end = _find_class_end(pattern, i)
+            wildcard = pattern.startswith('^', i + 1)
+        else:
+            end = i + 1
+            wildcard = char == '.'
+        if wildcard and UNBOUNDED_REPETITION_RE.match(pattern, end):
+            count += 1
+        i = end
+    return count
+
+
+def is_slow_for_python(pattern):
+    """Return whether Python may take too long to find matches of the
+    given (translated) regular expression in a line.
+    """
+    return has_nested_quantifiers(pattern) or count_unbounded_wildcards(pattern) > 1
+
+
+def _compile_re2(pattern, ignore_case):
+    """Return the ``finditer`` function of the given pattern compiled
+    with RE2, or None if RE2 is not available.
+    """
+    try:
+        import re2  # pylint: disable=import-error
+    except ImportError:
+        return None
+    try:
+        return re2.compile('(?i)' + pattern if ignore_case else pattern).finditer
+    except Exception:  # pylint: disable=broad-except
+        # Errors of the various bindings of RE2 have no common base.
+        return None
+
+
+class Highlighter:
+    """Find matches of the search pattern in lines of results.
+
+    Use ``get_highlighter()`` to share instances for the same pattern.
+    """
+
+    def __init__(self, pattern, ignore_case=False):
+        self.pattern = pattern
+        self.ignore_case = ignore_case
+        self.literal = None
+        self.finditer = None
+        self.max_line_length = None
+        if not GO_REGEXP_META_RE.search(pattern):
+            self.literal = pattern.lower() if ignore_case else pattern
+            if self.literal:
+                return
+        self.finditer = _compile_re2(pattern, ignore_case)
+        if self.finditer is not None:
+            return
+        translated = translate_go_regexp(pattern)
+        if is_slow_for_python(translated):
+            return
+        try:
+            compiled = re.compile(translated, flags=re.IGNORECASE if ignore_case else 0)
+        except (re.error, OverflowError):
+            return
+        self.finditer = compiled.finditer
+        self.max_line_length = MAX_PYTHON_LINE_LENGTH
+
+    def spans(self, line):
+        """Return the list of ``(start, end)`` positions of non-empty
+        matches in the given line.
+        """
+        if self.literal:
+            return self._literal_spans(line)
+        if self.finditer is None:
+            return []
+        if self.max_line_length is not None and len(line) > self.max_line_length:
+            return []
+        return [m.span() for m in self.finditer(line) if m.end() > m.start()]
+
+    def _literal_spans(self, line):
+        literal = self.literal
+        if self.ignore_case:
+            lowered = line.lower()
+            # Some characters change length when lowered, in which
+            # case positions would be wrong.
+            if len(lowered) != len(line):
+                return []
+            line = lowered
+        spans = []
+        start = line.find(literal)
+        while start != -1:
+            end = start + len(literal)
+            spans.append((start, end))
+            start = line.find(literal, end)
+        return spans
+
+    def highlight(self, line, template):
+        """Return the line where each match is formatted with the given
+        template (e.g. ``\\033[31m%s\\033[0m``).
+        """
+        spans = self.spans(line)
+        if not spans:
+            return line
+        parts = []
+        pos = 0
+        for start, end in spans:
+            parts.append(line[pos:start])
+            parts.append(template % line[start:end])
+            pos = end
+        parts.append(line[pos:])
+        return ''.join(parts)
+
+
+@functools.lru_cache(maxsize=64)
+def get_highlighter(pattern, ignore_case=False):
+    return Highlighter(pattern, ignore_case)
@@ -1,25 +1,133 @@
-import json
+# Some modules (``concurrent.futures``, ``json``, ``urllib`` and
+# ``http.client`` through ``pyhound.transport``) are only imported when
+# they are needed, to keep the start-up of the command-line client fast.
+import collections
+import fnmatch
+import itertools
 import math
 import re
 import socket
 import sys
-import urllib.error
-import urllib.parse
-import urllib.request
-
 
+from pyhound.cache import DEFAULT_CACHE_SIZE
+from pyhound.cache import DEFAULT_CATALOGUE_TTL
+from pyhound.cache import RepoCatalogue
+from pyhound.cache import ResultCache
+from pyhound.cache import get_default_cache_dir
+from pyhound.highlight import get_highlighter
+# Colors are also available from this module, as they used to be.
+from pyhound.output import COLOR_DELIMITER  # pylint: disable=unused-import
+from pyhound.output import COLOR_FILENAME  # pylint: disable=unused-import
+from pyhound.output import COLOR_LINE_NUMBER  # pylint: disable=unused-import
+from pyhound.output import COLOR_MATCH  # pylint: disable=unused-import
+from pyhound.output import COLOR_REPO  # pylint: disable=unused-import
+from pyhound.output import LINE_KIND_CONTEXT
+from pyhound.output import LINE_KIND_MATCH
+from pyhound.output import LineFormatter
+from pyhound.output import OutputWriter
+from pyhound.stats import NO_PHASE
+from pyhound.stats import PHASE_CONTEXT
+from pyhound.stats import PHASE_DECODE
+from pyhound.stats import PHASE_FORMAT
+from pyhound.stats import PHASE_IDLE
+from pyhound.stats import SearchStats
+
+
+# Maximum time (in seconds) to wait for each read from Hound, and to
+# connect to it.
 DEFAULT_TIMEOUT = 5
+DEFAULT_CONNECT_TIMEOUT = 5
+
+# Number of times that requests are sent again when they fail to
+# connect or when Hound (or a proxy in front of it) is unavailable.
+DEFAULT_RETRIES = 2
+
+# Number of concurrent requests when a search is split in shards.
+DEFAULT_JOBS = 4
+
+# Number of files per repository that we ask for in each request
+# when Hound refuses to return all results at once.
+DEFAULT_PAGE_SIZE = 100
+
+# Order of results when repositories are searched separately.
+OUTPUT_ORDER_REPOSITORY = 'repository'
+OUTPUT_ORDER_COMPLETION = 'completion'
+
+# Hound refuses to return more than 5000 results in a single
+# response. This is how we recognize that error.
+TOO_MANY_RESULTS_RE = re.compile('too many|exceed|limit', re.IGNORECASE)
+
+# Hound does not return more lines of context (before and after each
+# match) than this.
+MAX_CONTEXT = 20
+
+# Prefix of regular expressions in lists of repositories.
+REPO_REGEXP_PREFIX = 're:'
+
+GO_REGEXP_META_RE = re.compile(r'([\\.+*?()|\[\]{}^$])')
+
+class HoundError(Exception):
+    """Raised when we cannot get a proper response from Hound."""
+
+
+class HoundServerError(HoundError):
+    """Raised when Hound returns an error message."""
+
+    def __init__(self, message):
+        super().__init__("Hound server returned an error: %s" % message)
+        self.message = message
+
+    @property
+    def is_too_many_results(self):
+        return bool(TOO_MANY_RESULTS_RE.search(self.message))
+
+
+class NoRepositoryError(HoundError):
+    """Raised when no repository of the Hound server matches the
+    requested repositories.
+    """
+
+
+def quote_meta(text):
+    """Escape all regular expression metacharacters in the given text.
+
+    This is the equivalent of ``QuoteMeta()`` in Go, since Hound uses
+    Go regular expressions.
+    """
+    return GO_REGEXP_META_RE.sub(r'\\\1', text)
 
-# Warning: MATCH must have a lower value than CONTEXT
-LINE_KIND_MATCH = 1
-LINE_KIND_CONTEXT = 2
 
-# See GREP_COLORS at http://www.gnu.org/software/grep/manual/html_node/Environment-Variables.html
-COLOR_REPO = "\033[1m%s\033[0m"           # repo name: bold
-COLOR_DELIMITER = "\033[36m%s\033[0m"     # se: cyan
-COLOR_FILENAME = "\033[35m%s\033[0m"      # fn: magenta
-COLOR_MATCH = "\033[1m\033[31m%s\033[0m"  # ms/mc/mt: bold red
-COLOR_LINE_NUMBER = "\033[32m%s\033[0m"   # ln: green
+def split_repo_list(repos):
+    """Return repositories of the given comma-separated list."""
+    if not repos:
+        return []
+    return [repo.strip() for repo in repos.split(',') if repo.strip()]
+
+
+def is_repo_pattern(repo):
+    """Return whether the given repository is a glob pattern or a
+    regular expression, i.e. must be resolved against the list of
+    repositories known by Hound.
+    """
+    return repo.startswith(REPO_REGEXP_PREFIX) or any(char in repo for char in '*?[')
+
+
+def match_repos(names, patterns):
+    """Return names of repositories that match any of the given
+    names, glob patterns or regular expressions.
+
+    Raise ``HoundError`` if a regular expression is not valid.
+    """
+    matchers = []
+    for pattern in patterns:
+        if pattern.startswith(REPO_REGEXP_PREFIX):
+            try:
+                matchers.append(re.compile(pattern[len(REPO_REGEXP_PREFIX):]).search)
+            except re.error as exc:
+                raise HoundError("Invalid repository pattern: %s (%s)" % (pattern, exc))
+        else:
+            matchers.append(re.compile(fnmatch.translate(pattern)).match)
+    return [name for name in names if any(matcher(name) for matcher in matchers)]
 
 
 def colorize_match(line, pattern, color):
@@ -41,7 +149,11 @@ def get_lines_with_context(
     line itself.
 
     This implements the "-A", "-B" and "-C" options of ``grep``.
+    ``lines_before`` and ``lines_after`` may hold any number of lines
+    (or be None), depending on the context that Hound has returned.
     """
+    lines_before = lines_before or ()
+    lines_after = lines_after or ()
     requested_before = requested_before or 0
     requested_after = requested_after or 0
     assert requested_before >= 0
@@ -72,21 +184,62 @@ def get_lines_with_context(
         yield line_number + i, LINE_KIND_CONTEXT, contextual_line
 
 
-def merge_lines(lines):
+def merge_lines(lines, max_before=None):
     """Merge lines when matching and contextual lines overlap.
 
     When matching and contextual lines overlap, some lines are
     duplicated. This function merges all lines so that they appear
     only once and have the right "line kind".
+
+    Lines must come as returned by ``get_lines_with_context()`` for
+    each match, in the order of matches. ``max_before`` is the maximum
+    number of contextual lines before a matching line: lines that are
+    further than that from the last match are yielded right away,
+    since no later match can overlap them. If it is None, lines are
+    only yielded at the end.
     """
-    # Sort by line number and line kind (match first).
-    sorted_lines = sorted(lines, key=lambda l: (l[2], l[3]))
-    seen = set()
-    for repo, filename, line_number, line_kind, line in sorted_lines:
-        if line_number in seen:
+    # Lines that may still be overlapped, sorted by line number.
+    pending = collections.deque()
+    last_line_number = None
+    for item in lines:
+        line_number, line_kind = item[2], item[3]
+        if last_line_number is not None and line_number <= last_line_number:
             continue
-        seen.add(line_number)
-        yield repo, filename, line_number, line_kind, line
+        i = len(pending)
+        while i and pending[i - 1][2] > line_number:
+            i -= 1
+        if i and pending[i - 1][2] == line_number:
+            if line_kind < pending[i - 1][3]:
+                pending[i - 1] = item
+        else:
+            pending.insert(i, item)
+        if line_kind == LINE_KIND_MATCH and max_before is not None:
+            while pending and pending[0][2] < line_number - max_before:
+                last_line_number = pending[0][2]
+                yield pending.popleft()
+    for item in pending:
+        yield item
+
+
+def iter_result_files(results):
+    """Yield a ``(repo, filename, matches)`` tuple for each file of
+    the given search results.
+    """
+    for repo, result in results.items():
+        for match in result['Matches']:
+            yield repo, match['Filename'], match['Matches']
+
+
+def _merge_pages(first_page, other_pages):
+    """Return the result of a repository built from pages of results.
+
+    Pages that have no match (None) are ignored.
+    """
+    result = dict(first_page, Matches=list(first_page['Matches']))
+    for page in other_pages:
+        if page is not None:
+            result['Matches'].extend(page['Matches'])
+    return result
 
 
 class Client:
@@ -101,8 +254,39 @@ class Client:
             color='never',
             ignore_case=False,
             show_line_number=False,
+            files_with_matches=False,
+            count=False,
+            max_count=None,
             line_max_length=None,
+            page_size=None,
+            jobs=DEFAULT_JOBS,
+            fan_out=False,
+            output_order=OUTPUT_ORDER_REPOSITORY,
+            transport=None,
+            timeout=DEFAULT_TIMEOUT,
+            connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+            retries=DEFAULT_RETRIES,
+            hedge_after=None,
+            cache=False,
+            cache_dir=None,
+            cache_size=DEFAULT_CACHE_SIZE,
+            catalogue_ttl=DEFAULT_CATALOGUE_TTL,
+            prefix='',
+            stats_hook=None,
     ):
+        # Connections to the Hound server may be shared with other
+        # clients. The default transport is created when it is first
+        # needed, see ``transport``.
+        self._transport = transport
+        self._transport_options = {
+            'timeout': timeout,
+            'connect_timeout': connect_timeout,
+            'retries': retries,
+            'hedge_after': hedge_after,
+        }
+        # Responses that are being read, see ``abort()``.
+        self._responses = set()
+
         # Endpoints
         endpoint = endpoint.rstrip('/')
         self.endpoint_list_repos = '%s/api/v1/repos' % endpoint
@@ -110,8 +294,10 @@ class Client:
 
         self.pattern = pattern
 
-        # Hound-related options.
-        self.repos = self.get_repo_list(repos, exclude_repos)
+        # Hound-related options. The list of repositories is resolved
+        # when we need it, see ``repos``.
+        self._repo_selection = (repos, exclude_repos)
+        self._repos = None
         self.path_pattern = path_pattern
 
         # Grep-like options.
@@ -129,88 +315,607 @@ class Client:
         self.color = color
         self.ignore_case = ignore_case
         self.show_line_number = show_line_number
+        self.files_with_matches = files_with_matches
+        self.count = count
+        # The number of matching lines that we may still show, if
+        # there is a limit.
+        assert max_count is None or max_count >= 0
+        self.max_count = max_count
+        self._remaining_matches = max_count
 
         # Custom options.
         self.line_max_length = line_max_length
+        # Prepended to each line of output (e.g. to tell the query).
+        self.prefix = prefix
+        self._formatter = None
+
+        # Statistics of the search, given to ``stats_hook`` at the end
+        # of ``run()``.
+        self.stats_hook = stats_hook
+        self.stats = SearchStats(pattern) if stats_hook is not None else None
+
+        # Sharding options.
+        assert page_size is None or page_size >= 1
+        assert jobs >= 1
+        self.page_size = page_size
+        self.jobs = jobs
+        assert output_order in (OUTPUT_ORDER_REPOSITORY, OUTPUT_ORDER_COMPLETION)
+        self.fan_out = fan_out
+        self.output_order = output_order
+
+        # Local cache of search results and list of repositories.
+        cache_dir = cache_dir or get_default_cache_dir()
+        if cache:
+            self.cache = ResultCache(cache_dir, cache_size)
+        else:
+            self.cache = None
+        if catalogue_ttl:
+            self.catalogue = RepoCatalogue(cache_dir, catalogue_ttl)
+        else:
+            self.catalogue = None
 
-    def get_repo_list(self, repos, exclude_repos):
+    @property
+    def transport(self):
+        """The ``pyhound.transport.Transport`` that sends requests to
+        Hound.
+        """
+        if self._transport is None:
+            from pyhound.transport import Transport
+            self._transport = Transport(**self._transport_options)
+        return self._transport
+
+    @property
+    def repos(self):
+        """The comma-separated list of repositories to search in, or
+        ``*`` for all repositories.
+
+        Raise ``HoundError`` if we cannot get the list of repositories
+        from Hound, or if no repository matches.
+        """
+        if self._repos is None:
+            self._repos = self.get_repo_list(*self._repo_selection)
+        return self._repos
+
+    def get_repo_list(self, repos, exclude_repos, all_repos=None):
         """Return a comma-separated list of repositories to look in.
 
+        Repositories may be given as names, glob patterns (e.g.
+        ``billing-*``) or regular expressions prefixed by ``re:``
+        (e.g. ``re:^billing-``). Patterns are resolved against
+        ``all_repos``, or against the list of repositories known by
+        Hound if it is not given.
+
         This method may call Hound API.
         """
-        if not exclude_repos:
+        selected = split_repo_list(repos)
+        excluded = split_repo_list(exclude_repos)
+        if not excluded and not any(is_repo_pattern(repo) for repo in selected):
             return repos
-        if repos == '*':
-            response = self._call_api(self.endpoint_list_repos)
-            repos = set(response.keys())
-        else:
-            repos = set(r.strip() for r in repos.split(','))
-        exclude_repos = set(r.strip() for r in exclude_repos.split(','))
-        repos = sorted(repos - exclude_repos)
-        return ','.join(repos)
+        if selected == ['*'] and not excluded:
+            return '*'
+        if any(is_repo_pattern(repo) for repo in selected):
+            if all_repos is None:
+                all_repos = self.get_all_repos()
+            selected = match_repos(all_repos, selected)
+        selected = sorted(set(selected) - set(match_repos(selected, excluded)))
+        if not selected:
+            raise NoRepositoryError("No repository to search in.")
+        return ','.join(selected)
+
+    def get_all_repos(self):
+        """Return the sorted list of all repositories known by Hound.
+
+        The list is taken from the local catalogue, if any.
+        """
+        if self.catalogue is None:
+            return self._fetch_all_repos()
+        return self.catalogue.get(self.endpoint_list_repos, self._fetch_all_repos)
+
+    def _fetch_all_repos(self):
+        response = self._request(self.endpoint_list_repos)
+        return sorted(response.keys())
 
     def run(self):
-        results = self.get_search_results()
-        lines = self.get_lines(results)
-        self.print_lines(lines)
+        if self.max_count == 0:
+            return
+        try:
+            if not self.fan_out:
+                self.print_files(self.iter_search_files())
+                return
+            for repo, result in self.iter_repo_results():
+                # Results of this repository are written (and flushed)
+                # without waiting for the next one.
+                self.print_files(iter_result_files({repo: result}))
+                if self._remaining_matches == 0:
+                    break
+        except HoundError as exc:
+            sys.exit(str(exc))
+        finally:
+            self.report_stats()
+
+    def report_stats(self):
+        """Give statistics of the search to ``stats_hook``, if any."""
+        if self.stats_hook is None:
+            return
+        self.stats.stop()
+        self.stats_hook(self.stats)
+
+    def _get_phase(self, name):
+        return NO_PHASE if self.stats is None else self.stats.phase(name)
+
+    def print_files(self, files):
+        """Print results of ``(repo, filename, matches)`` tuples,
+        depending on the output mode (lines, files with matches or
+        count of matches).
+        """
+        if self.max_count is not None:
+            files = self._limit_matches(files)
+        if self.files_with_matches or self.count:
+            self.print_file_names(files)
+        else:
+            self.print_lines(self.get_file_lines(files))
+
+    def _limit_matches(self, files):
+        """Yield ``(repo, filename, matches)`` tuples until
+        ``max_count`` matches have been yielded (over all calls), then
+        stop reading ``files``.
+        """
+        try:
+            if self._remaining_matches == 0:
+                return
+            for repo, filename, matches in files:
+                matches = matches[:self._remaining_matches]
+                self._remaining_matches -= len(matches)
+                yield repo, filename, matches
+                if self._remaining_matches == 0:
+                    break
+        finally:
+            # Stop reading the response of Hound, if any.
+            if hasattr(files, 'close'):
+                files.close()
+
+    def search(self):
+        """Search and yield a ``pyhound.results.FileResult`` for each
+        file that has lines to show, as soon as it has been received.
+
+        Unlike ``run()``, nothing is printed. Options of lines of
+        context, ``max_count`` and ``line_max_length`` apply.
+
+        Raise ``HoundError`` if any error occurs.
+        """
+        from pyhound.results import FileResult
+        if self.max_count == 0:
+            return
+        files = self.iter_search_files()
+        if self.max_count is not None:
+            files = self._limit_matches(files)
+        try:
+            for repo, filename, file_matches in files:
+                result = FileResult(repo, filename)
+                for _, _, line_number, line_kind, line in self._get_lines_of_file(repo, filename, file_matches):
+                    result.add_line(line_number, line_kind, line)
+                if result.lines:
+                    yield result
+        finally:
+            files.close()
 
     def get_search_results(self):
-        """Call Hound API to perform search."""
-        payload = {
-            'repos': self.repos,
-            'rng': '',  # Empty range, we want all results.
-            'files': self.path_pattern,
+        """Call Hound API to perform search.
+
+        If any error occurs, we exit the program with an error
+        message.
+        """
+        try:
+            return self.fetch_search_results()
+        except HoundError as exc:
+            sys.exit(str(exc))
+
+    def fetch_search_results(self):
+        """Call Hound API to perform search and return results.
+
+        If Hound says that there are too many results (or if we have
+        been told to use pages), the search is split in one shard per
+        repository and per range of files. Shards are fetched
+        concurrently and stitched back together.
+
+        If the local cache is enabled, repositories that have not
+        changed since their results have been cached are not searched
+        again.
+
+        Raise ``HoundError`` if any error occurs.
+        """
+        if self.cache is not None:
+            return self._fetch_cached_search_results()
+        return self._fetch_search_results()
+
+    def _fetch_search_results(self, repos=None):
+        if self.page_size is None:
+            try:
+                return self._search(self._get_search_payload(repos=repos))
+            except HoundServerError as exc:
+                if not exc.is_too_many_results:
+                    raise
+        return self._search_shards(self._get_repo_names(repos))
+
+    def _fetch_cached_search_results(self):
+        key = self.cache.get_key(self.endpoint_search, self._get_search_payload())
+        entry = self.cache.get(key)
+        requested = None
+        cached = entry
+        if self.repos != '*':
+            requested = split_repo_list(self.repos)
+            cached = {repo: result for repo, result in entry.items() if repo in requested}
+        valid = self._get_valid_cached_results(cached)
+
+        if not valid:
+            to_search = requested
+        else:
+            to_search = [repo for repo in requested or self.get_all_repos() if repo not in valid]
+        results = dict(valid)
+        if to_search is None or to_search:
+            fresh = self._fetch_search_results(','.join(to_search) if to_search else None)
+            results.update(fresh)
+            if to_search is None:
+                entry = {}
+            else:
+                for repo in to_search:
+                    entry.pop(repo, None)
+            entry.update(fresh)
+            self.cache.set(key, entry)
+        # Hound sorts results by repository name.
+        return collections.OrderedDict(sorted(results.items()))
+
+    def _get_valid_cached_results(self, cached):
+        """Return cached results of repositories that have not changed
+        since they have been cached.
+        """
+        probes = {
+            repo: result['Matches'][0]['Filename']
+            for repo, result in cached.items()
+            if result.get('Revision') and result['Matches']
+        }
+        if not probes:
+            return {}
+        revisions = self.get_repo_revisions(probes)
+        return {
+            repo: cached[repo]
+            for repo, revision in revisions.items()
+            if revision == cached.get(repo, {}).get('Revision')
+        }
+
+    def get_repo_revisions(self, probes):
+        """Return the revision currently indexed by Hound for each of
+        the given repositories.
+
+        Hound only tells the revision of repositories that have
+        matches. ``probes`` maps each repository to the name of a file
+        that matched the search pattern: only these files are
+        searched, which is cheap. Repositories where this file does
+        not match anymore are not in the returned dictionary.
+        """
+        files = '^(?:%s)$' % '|'.join(sorted(set(quote_meta(filename) for filename in probes.values())))
+        payload = self._get_search_payload(repos=','.join(sorted(probes)), files=files)
+        payload['ctx'] = '0'
+        results = self._search(payload)
+        return {
+            repo: result.get('Revision')
+            for repo, result in results.items()
+            if repo in probes
+        }
+
+    def get_context_size(self):
+        """Return the number of lines of context that we need from
+        Hound, before and after each match.
+        """
+        if self.files_with_matches or self.count:
+            return 0
+        if self.context:
+            # We may need up to ``context - 1`` lines on one side, see
+            # ``get_lines_with_context()``.
+            size = self.context - 1
+        else:
+            size = max(self.before_context or 0, self.after_context or 0)
+        return min(size, MAX_CONTEXT)
+
+    def _get_search_payload(self, repos=None, rng='', files=None):
+        return {
+            'repos': repos or self.repos,
+            'rng': rng,  # Empty range, we want all results.
+            'files': self.path_pattern if files is None else files,
             'i': 'true' if self.ignore_case else '',
             'q': self.pattern,
+            'ctx': str(self.get_context_size()),
         }
-        response = self._call_api(self.endpoint_search, payload)
-        return response['Results']
 
-    def _call_api(self, endpoint, params=None):
+    def _search(self, payload):
+        return self._request(self.endpoint_search, payload)['Results']
+
+    def iter_repo_results(self):
+        """Search each repository separately and yield ``(repo, result)``
+        tuples as soon as results are available.
+
+        Repositories are searched concurrently. Results are yielded
+        in the order of repositories or in the order in which searches
+        complete, depending on ``output_order``.
+
+        Raise ``HoundError`` if any error occurs.
+        """
+        import concurrent.futures
+        repos = self._get_repo_names()
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs)
+        futures = [executor.submit(self._search_repo, repo) for repo in repos]
+        try:
+            if self.output_order == OUTPUT_ORDER_COMPLETION:
+                done = concurrent.futures.as_completed(futures)
+            else:
+                done = futures
+            for future in done:
+                with self._get_phase(PHASE_IDLE):
+                    repo, result = future.result()
+                if result is not None:
+                    yield repo, result
+        finally:
+            # Do not wait for pending searches if we stop early.
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def _get_repo_names(self, repos=None):
+        """Return the sorted list of repositories to search in."""
+        repos = repos or self.repos
+        if repos == '*':
+            return self.get_all_repos()
+        # Hound (or rather Go) sorts results by repository name:
+        # searching repositories in this order keeps the order of a
+        # single search.
+        return sorted(split_repo_list(repos))
+
+    def _search_repo(self, repo):
+        """Search a single repository, page after page if needed."""
+        result, page_size = self._search_page(repo, 0, self.page_size)
+        if result is None or page_size is None:
+            return repo, result
+        pages = [
+            self._search_page(repo, offset, page_size)
+            for offset in range(page_size, result['FilesWithMatch'], page_size)
+        ]
+        return repo, _merge_pages(result, (page for page, _ in pages))
+
+    def _search_shards(self, repos):
+        """Search each of the given repositories separately, by pages
+        of files.
+
+        The first page of each repository tells us how many files
+        match, so that we can then ask for all other pages at once.
+        """
+        import concurrent.futures
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            first_pages = [
+                executor.submit(self._search_page, repo, 0, self.page_size)
+                for repo in repos
+            ]
+            pages = collections.OrderedDict()
+            for repo, future in zip(repos, first_pages):
+                with self._get_phase(PHASE_IDLE):
+                    result, page_size = future.result()
+                if result is None:
+                    continue
+                pages[repo] = [(result, page_size)]
+                if page_size is None:
+                    continue
+                pages[repo].extend(
+                    executor.submit(self._search_page, repo, offset, page_size)
+                    for offset in range(page_size, result['FilesWithMatch'], page_size)
+                )
+            # Repositories are sorted by name (see
+            # ``_get_repo_names()``), as in the response of a single
+            # search.
+            results = collections.OrderedDict()
+            with self._get_phase(PHASE_IDLE):
+                for repo, repo_pages in pages.items():
+                    first_page, _ = repo_pages[0]
+                    results[repo] = _merge_pages(
+                        first_page,
+                        (future.result()[0] for future in repo_pages[1:])
+                    )
+        return results
+
+    def _search_page(self, repo, offset, limit):
+        """Search a range of files of a single repository.
+
+        ``limit`` may be None if we want all files. Return a tuple of
+        the result (or None if there is no match) and the size of the
+        page that Hound accepted to return. If Hound says that there
+        are too many results, the page is split in two.
+        """
+        rng = '' if limit is None else '%d:%d' % (offset, limit)
+        try:
+            results = self._search(self._get_search_payload(repos=repo, rng=rng))
+        except HoundServerError as exc:
+            if not exc.is_too_many_results or limit == 1:
+                raise
+            if limit is None:
+                return self._search_page(repo, offset, DEFAULT_PAGE_SIZE)
+            half = limit // 2
+            first, _ = self._search_page(repo, offset, half)
+            second, _ = self._search_page(repo, offset + half, limit - half)
+            if first is None:
+                return second, limit
+            return _merge_pages(first, [second]), limit
+        return results.get(repo), limit
+
+    def _request(self, endpoint, params=None):
         """Call API on Hound server and decode JSON response.
 
-        If any error occurs, we exit the program with an error
-        message.
+        Raise ``HoundError`` if any error occurs.
         """
+        import json
+        response = self._open(endpoint, params)
         try:
-            if params:
-                endpoint += '?%s' % urllib.parse.urlencode({
-                    key: value
-                    for key, value in params.items()
-                    if value is not None
-                })
-            response = urllib.request.urlopen(endpoint, timeout=DEFAULT_TIMEOUT)
             # We should look at the `Content-type` header, but we
             # know that Hound uses utf-8.
             data = response.read().decode('utf-8')
-        except urllib.error.URLError as exc:
-            sys.exit("Could not connect to Hound server: %s" % exc)
         except socket.timeout:
-            sys.exit("Could not connect to Hound server: timeout.")
+            raise HoundError("Could not connect to Hound server: timeout.")
+        except OSError as exc:
+            raise HoundError("Could not read response from Hound server: %s" % exc)
+        finally:
+            self._close(response)
 
         try:
-            result = json.loads(data)
+            with self._get_phase(PHASE_DECODE):
+                result = json.loads(data)
         except ValueError:
-            sys.exit(
+            raise HoundError(
                 "Server did not return a valid JSON response. "
                 "Got this instead:\n%s" % data
             )
 
         if 'Error' in result:
-            sys.exit("Hound server returned an error: %s" % result['Error'])
+            raise HoundServerError(result['Error'])
+        if self.stats is not None:
+            self.stats.add_server_stats(result.get('Stats'))
         return result
 
+    def _open(self, endpoint, params=None):
+        """Call API on Hound server and return the response, without
+        reading it.
+
+        Raise ``HoundError`` if any error occurs.
+        """
+        import json
+        import urllib.parse
+        if params:
+            endpoint += '?%s' % urllib.parse.urlencode({
+                key: value
+                for key, value in params.items()
+                if value is not None
+            })
+        try:
+            response = self.transport.get(endpoint, stats=self.stats)
+        except socket.timeout:
+            raise HoundError("Could not connect to Hound server: timeout.")
+        except OSError as exc:
+            raise HoundError("Could not connect to Hound server: %s" % exc)
+        if response.status < 400:
+            self._responses.add(response)
+            return response
+        # Hound may report errors (e.g. too many results) with an
+        # HTTP error status and a JSON body.
+        try:
+            data = response.read().decode('utf-8', 'replace')
+        except OSError:
+            data = ''
+        finally:
+            response.close()
+        try:
+            result = json.loads(data)
+        except ValueError:
+            result = {}
+        if 'Error' in result:
+            raise HoundServerError(result['Error'])
+        raise HoundError(
+            "Could not connect to Hound server: HTTP Error %d: %s" % (response.status, response.reason))
+
+    def _close(self, response):
+        response.close()
+        self._responses.discard(response)
+
+    def abort(self):
+        """Stop reading the responses of Hound that are being read.
+        This may be called from another thread, e.g. to cancel a
+        search: reads in progress then raise ``HoundError``.
+        """
+        for response in list(self._responses):
+            response.abort()
+
+    def iter_search_files(self):
+        """Call Hound API to perform search and yield a
+        ``(repo, filename, matches)`` tuple for each file, as soon as it
+        has been decoded from the response.
+
+        Searches that Hound refuses to perform at once are split in
+        shards (see ``fetch_search_results()``). The results of shards
+        are yielded once all of them have been received.
+
+        Raise ``HoundError`` if any error occurs.
+        """
+        if self.page_size is None and self.cache is None:
+            yielded = False
+            # Each file has at least one match: we do not need more
+            # files than matches.
+            rng = '' if self._remaining_matches is None else '0:%d' % self._remaining_matches
+            try:
+                for item in self._iter_streamed_search(self._get_search_payload(rng=rng)):
+                    yielded = True
+                    yield item
+                return
+            except HoundServerError as exc:
+                if yielded or not exc.is_too_many_results:
+                    raise
+            # Hound has just refused to search everything at once: do
+            # not ask again.
+            results = self._search_shards(self._get_repo_names())
+        else:
+            results = self.fetch_search_results()
+        for item in iter_result_files(results):
+            yield item
+
+    def _iter_streamed_search(self, payload):
+        from pyhound import jsonstream
+        response = self._open(self.endpoint_search, payload)
+        meta = {}
+        items = jsonstream.iter_search_response(response, meta)
+        if self.stats is not None:
+            items = self.stats.iter_timed(PHASE_DECODE, items)
+        try:
+            for item in items:
+                yield item
+        except socket.timeout:
+            raise HoundError("Could not connect to Hound server: timeout.")
+        except ValueError:
+            raise HoundError(
+                "Server did not return a valid JSON response. "
+                "Got this instead:\n%s" % meta.get('Excerpt', '')
+            )
+        except OSError as exc:
+            raise HoundError("Could not read response from Hound server: %s" % exc)
+        finally:
+            self._close(response)
+        if 'Error' in meta:
+            raise HoundServerError(meta['Error'])
+        if self.stats is not None:
+            self.stats.add_server_stats(meta.get('Stats'))
+
     def get_lines(self, results):
-        for repo, result in results.items():
-            for match in result['Matches']:
-                lines = []
-                filename = match['Filename']
-                for file_match in match['Matches']:
-                    lines.extend(self.get_lines_for_repo(repo, filename, file_match))
-                if self.before_context or self.after_context or self.context:
-                    lines = merge_lines(lines)
-                for line in lines:
-                    yield line
+        return self.get_file_lines(iter_result_files(results))
+
+    def get_file_lines(self, files):
+        """Return lines to display from ``(repo, filename, matches)``
+        tuples.
+        """
+        lines = self._iter_file_lines(files)
+        if self.stats is not None:
+            lines = self.stats.iter_timed(PHASE_CONTEXT, lines)
+        return lines
+
+    def _iter_file_lines(self, files):
+        for repo, filename, file_matches in files:
+            for line in self._get_lines_of_file(repo, filename, file_matches):
+                yield line
+
+    def _get_lines_of_file(self, repo, filename, file_matches):
+        lines = itertools.chain.from_iterable(
+            self.get_lines_for_repo(repo, filename, file_match)
+            for file_match in file_matches
+        )
+        if self.before_context or self.after_context or self.context:
+            if self.before_context:
+                max_before = self.before_context
+            else:
+                max_before = self.context - 1 if self.context else 0
+            lines = merge_lines(lines, max_before)
+        return lines
 
     def get_lines_for_repo(self, repo, filename, match):
         for line_number, line_kind, line in get_lines_with_context(
@@ -226,24 +931,37 @@ class Client:
                 continue
             yield (repo, filename, line_number, line_kind, line)
 
+    def _get_formatter(self):
+        # The formatter is kept between calls, so that groups of
+        # lines are separated the same way (see ``run()``).
+        if self._formatter is None:
+            self._formatter = LineFormatter(
+                highlighter=get_highlighter(self.pattern, self.ignore_case),
+                color=self.color,
+                show_line_number=self.show_line_number,
+                prefix=self.prefix,
+                group_separator=bool(self.before_context or self.after_context or self.context),
+            )
+        return self._formatter
+
+    def print_file_names(self, files):
+        """Print the name of each file (or its count of matches, if
+        ``count`` is set) from ``(repo, filename, matches)`` tuples.
+        """
+        formatter = self._get_formatter()
+        self._write(
+            formatter.format_file(repo, filename, None if self.files_with_matches else len(matches))
+            for repo, filename, matches in files
+        )
+
     def print_lines(self, lines):
-        if self.show_line_number:
-            fmt = "{repo}:{filename}{delim}{line_number}{delim}{line}"
-        else:
-            fmt = "{repo}:{filename}{delim}{line}"
-        pattern_re = re.compile(self.pattern, flags=re.IGNORECASE if self.ignore_case else 0)
-        for repo, filename, line_number, line_kind, line in lines:
-            delim = ':' if line_kind == LINE_KIND_MATCH else '-'
-            if self.color:
-                repo = COLOR_REPO % repo
-                filename = COLOR_FILENAME % filename
-                line_number = COLOR_LINE_NUMBER % line_number
-                delim = COLOR_DELIMITER % delim
-                line = colorize_match(line, pattern_re, COLOR_MATCH)
-            out = fmt.format(
-                repo=repo,
-                filename=filename,
-                line_number=line_number,
-                delim=delim,
-                line=line)
-            print(out)
+        self._write(self._get_formatter().format_lines(lines))
+
+    def _write(self, texts):
+        if self.stats is not None:
+            texts = self.stats.iter_timed(PHASE_FORMAT, texts)
+        writer = OutputWriter(stats=self.stats)
+        try:
+            writer.writelines(texts)
+        finally:
+            writer.flush()
@@ -0,0 +1,226 @@
+"""Incremental decoding of Hound search responses.
+
+Hound returns all search results in a single JSON document. Instead of
+reading the whole response before decoding it, we decode it as it
+comes from the socket and yield results file by file. Only the
+matches of a single file are held in memory at any given time.
+"""
+import codecs
+import json
+import re
+
+
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE = ' \t\n\r'
+
+# Characters that we look for when looking for the end of a value.
+CONTAINER_SPECIAL_RE = re.compile(r'[\[\]{}"]')
+STRING_SPECIAL_RE = re.compile(r'["\\]')
+SCALAR_END_RE = re.compile(r'[,\]}\s]')
+
+
+class _Reader:
+    """A buffered reader of a JSON stream.
+
+    It does not decode the document by itself: it only knows how to
+    walk through objects and arrays, and delegates the decoding of
+    each value to ``json.loads()``.
+    """
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE):
+        # ``read1()`` returns what is available instead of waiting
+        # for a full chunk.
+        self.read = getattr(fp, 'read1', fp.read)
+        self.chunk_size = chunk_size
+        # We know that Hound uses utf-8.
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _read_text(self):
+        """Read and return more text (possibly empty).
+
+        Raise ``ValueError`` if there is nothing more to read.
+        """
+        if self.eof:
+            raise ValueError("Unexpected end of JSON document.")
+        chunk = self.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+        return self.decoder.decode(chunk, final=self.eof)
+
+    def _fill(self):
+        """Read more data and return the number of characters that
+        have been dropped from the head of the buffer.
+
+        Raise ``ValueError`` if there is nothing more to read.
+        """
+        text = self._read_text()
+        dropped = self.pos
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return dropped
+
+    def peek(self):
+        """Return the next non-whitespace character, without consuming it."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            self._fill()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError("Expected %r, got %r." % (char, self.buffer[self.pos]))
+        self.pos += 1
+
+    def value(self):
+        """Decode and return the next value."""
+        char = self.peek()
+        if char in '[{':
+            end = self._find_end(self.pos + 1, depth=1, in_string=False)
+        elif char == '"':
+            end = self._find_end(self.pos + 1, depth=0, in_string=True)
+        else:
+            end = self._find_scalar_end()
+        value = json.loads(self.buffer[self.pos:end])
+        self.pos = end
+        return value
+
+    def _find_end(self, i, depth, in_string):
+        """Return the position just after the end of the current
+        string, object or array.
+
+        Text that is read meanwhile is only added to the buffer once
+        the end has been found, so that finding the end of a large
+        value takes linear time.
+        """
+        parts = []
+        text = self.buffer
+        while True:
+            regexp = STRING_SPECIAL_RE if in_string else CONTAINER_SPECIAL_RE
+            m = regexp.search(text, i)
+            if m is None:
+                parts.append(text)
+                # ``i`` may be after the end of the text if it ends
+                # with a backslash.
+                i -= len(text)
+                text = self._read_text()
+                continue
+            char = m.group()
+            i = m.end()
+            if char == '\\':
+                i += 1  # Skip the escaped character.
+                continue
+            if char == '"':
+                in_string = not in_string
+                if in_string or depth:
+                    continue
+            elif char in '[{':
+                depth += 1
+                continue
+            else:
+                depth -= 1
+                if depth:
+                    continue
+            if not parts:
+                return i
+            parts[0] = parts[0][self.pos:]
+            i += sum(len(part) for part in parts)
+            parts.append(text)
+            self.buffer = ''.join(parts)
+            self.pos = 0
+            return i
+
+    def _find_scalar_end(self):
+        while True:
+            m = SCALAR_END_RE.search(self.buffer, self.pos)
+            if m is not None:
+                return m.start()
+            if self.eof:
+                return len(self.buffer)
+            self._fill()
+
+    def iter_object(self):
+        """Yield each key of the next object.
+
+        The caller must consume the value of the key before asking
+        for the next one. A ``null`` value is handled like an empty
+        object.
+        """
+        if self.peek() == 'n':
+            self.value()
+            return
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.peek() == '}':
+                self.pos += 1
+                return
+            self.expect(',')
+
+    def iter_array(self):
+        """Yield None for each item of the next array.
+
+        The caller must consume each item before asking for the next
+        one. A ``null`` value is handled like an empty array.
+        """
+        if self.peek() == 'n':
+            self.value()
+            return
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.peek() == ']':
+                self.pos += 1
+                return
+            self.expect(',')
+
+    def get_excerpt(self, length=200):
+        return self.buffer[self.pos:self.pos + length]
+
+
+def iter_search_response(fp, meta):
+    """Decode a search response of Hound from the given file-like
+    object and yield a ``(repo, filename, matches)`` tuple for each
+    file.
+
+    Everything else is stored in the ``meta`` dictionary: the
+    ``Error`` or ``Stats`` of the response, if any, and other
+    information about each repository (``FilesWithMatch``,
+    ``Revision``, etc.) in ``meta['Results'][repo]``.
+
+    Raise ``ValueError`` if the response is not valid JSON. The
+    beginning of the unexpected content is then available in
+    ``meta['Excerpt']``.
+    """
+    reader = _Reader(fp)
+    repos_meta = meta.setdefault('Results', {})
+    try:
+        for key in reader.iter_object():
+            if key != 'Results':
+                meta[key] = reader.value()
+                continue
+            for repo in reader.iter_object():
+                repo_meta = repos_meta.setdefault(repo, {})
+                for repo_key in reader.iter_object():
+                    if repo_key != 'Matches':
+                        repo_meta[repo_key] = reader.value()
+                        continue
+                    for _ in reader.iter_array():
+                        match = reader.value()
+                        yield repo, match['Filename'], match['Matches']
+    except ValueError:
+        meta['Excerpt'] = reader.get_excerpt()
+        raise
@@ -0,0 +1,173 @@
+"""Formatting and writing of lines of results.
+
+Results may have tens of thousands of lines, so the layout of a line
+is prepared once per file instead of once per line, and lines are
+written as encoded bytes, in large chunks.
+"""
+import sys
+
+from pyhound.stats import NO_PHASE
+from pyhound.stats import PHASE_WRITE
+
+
+# Warning: MATCH must have a lower value than CONTEXT
+LINE_KIND_MATCH = 1
+LINE_KIND_CONTEXT = 2
+
+# See GREP_COLORS at http://www.gnu.org/software/grep/manual/html_node/Environment-Variables.html
+COLOR_REPO = "\033[1m%s\033[0m"           # repo name: bold
+COLOR_DELIMITER = "\033[36m%s\033[0m"     # se: cyan
+COLOR_FILENAME = "\033[35m%s\033[0m"      # fn: magenta
+COLOR_MATCH = "\033[1m\033[31m%s\033[0m"  # ms/mc/mt: bold red
+COLOR_LINE_NUMBER = "\033[32m%s\033[0m"   # ln: green
+
+# Size of the chunks that we write to the output, in bytes.
+BUFFER_SIZE = 64 * 1024
+
+GROUP_SEPARATOR = '--'
+
+DELIMITERS = {
+    LINE_KIND_MATCH: ':',
+    LINE_KIND_CONTEXT: '-',
+}
+
+
+class LineFormatter:
+    """Format ``(repo, filename, line_number, line_kind, line)``
+    tuples like ``grep`` does.
+
+    ``highlighter`` (see ``pyhound.highlight``) is used to highlight
+    matches if ``color`` is true. If ``group_separator`` is true,
+    groups of lines that are not contiguous are separated by a ``--``
+    line.
+    """
+
+    def __init__(self, highlighter=None, color=False, show_line_number=False, prefix='',
+                 group_separator=False):
+        self.highlighter = highlighter
+        self.color = color
+        self.show_line_number = show_line_number
+        self.prefix = prefix
+        if group_separator:
+            separator = COLOR_DELIMITER % GROUP_SEPARATOR if color else GROUP_SEPARATOR
+            self.separator = prefix + separator + '\n'
+        else:
+            self.separator = None
+        # The position of the last line, to tell whether the next one
+        # starts a new group.
+        self._last_line = None
+        # The layout of a line for each line kind, without the repo
+        # and the filename, e.g. ``:%s:%s\n``.
+        self.layouts = {}
+        for line_kind, delim in DELIMITERS.items():
+            if color:
+                delim = COLOR_DELIMITER % delim
+            if show_line_number:
+                line_number = COLOR_LINE_NUMBER if color else '%s'
+                self.layouts[line_kind] = delim + line_number + delim + '%s\n'
+            else:
+                self.layouts[line_kind] = delim + '%s\n'
+        # Layouts of the current file, with its repo and filename.
+        self._current_file = None
+        self._file_layouts = None
+
+    def _get_head(self, repo, filename):
+        if self.color:
+            return self.prefix + COLOR_REPO % repo + ':' + COLOR_FILENAME % filename
+        return self.prefix + repo + ':' + filename
+
+    def _get_file_layouts(self, repo, filename):
+        if (repo, filename) != self._current_file:
+            head = self._get_head(repo, filename).replace('%', '%%')
+            self._current_file = (repo, filename)
+            self._file_layouts = {
+                line_kind: head + layout
+                for line_kind, layout in self.layouts.items()
+            }
+        return self._file_layouts
+
+    def format_file(self, repo, filename, count=None):
+        """Return the name of a file, followed by the given count (if
+        any), like ``grep -l`` or ``grep -c`` do.
+        """
+        if count is None:
+            return self._get_head(repo, filename) + '\n'
+        delim = COLOR_DELIMITER % ':' if self.color else ':'
+        return self._get_head(repo, filename) + delim + str(count) + '\n'
+
+    def format_lines(self, lines):
+        """Yield a string (that ends with a new line) for each line."""
+        highlight = self.highlighter.highlight if self.color and self.highlighter is not None else None
+        show_line_number = self.show_line_number
+        separator = self.separator
+        for repo, filename, line_number, line_kind, line in lines:
+            if separator is not None:
+                last_line = self._last_line
+                if last_line is not None and last_line != (repo, filename, line_number - 1):
+                    yield separator
+                self._last_line = (repo, filename, line_number)
+            layout = self._get_file_layouts(repo, filename)[line_kind]
+            if highlight is not None:
+                line = highlight(line, COLOR_MATCH)
+            if show_line_number:
+                yield layout % (line_number, line)
+            else:
+                yield layout % line
+
+
+class OutputWriter:
+    """Write text to the given stream (the standard output by
+    default) in large chunks.
+
+    Text is encoded and written to the underlying binary buffer of the
+    stream, if any. Call ``flush()`` to write what remains.
+
+    If ``stats`` (a ``pyhound.stats.SearchStats``) is given, the time
+    spent writing is recorded there.
+    """
+
+    def __init__(self, stream=None, buffer_size=BUFFER_SIZE, stats=None):
+        if stream is None:
+            stream = sys.stdout
+        # Whatever has already been written to the stream must come
+        # first.
+        stream.flush()
+        self.stream = stream
+        self.binary = getattr(stream, 'buffer', None)
+        self.encoding = getattr(stream, 'encoding', None) or 'utf-8'
+        self.buffer_size = buffer_size
+        self.stats = stats
+        self._chunks = []
+        self._size = 0
+
+    def write(self, text):
+        self._chunks.append(text)
+        self._size += len(text)
+        if self._size >= self.buffer_size:
+            self._write_chunks()
+
+    def writelines(self, texts):
+        for text in texts:
+            self.write(text)
+
+    def _get_phase(self):
+        return NO_PHASE if self.stats is None else self.stats.phase(PHASE_WRITE)
+
+    def _write_chunks(self):
+        text = ''.join(self._chunks)
+        self._chunks = []
+        self._size = 0
+        with self._get_phase():
+            if self.binary is None:
+                self.stream.write(text)
+            else:
+                self.binary.write(text.encode(self.encoding, 'replace'))
+
+    def flush(self):
+        if self._chunks:
+            self._write_chunks()
+        with self._get_phase():
+            if self.binary is None:
+                self.stream.flush()
+            else:
+                self.binary.flush()
@@ -0,0 +1,65 @@
+"""Structured results of searches, for programs that use pyhound as a
+library.
+
+``Client.search()`` gives a ``FileResult`` for each file that matches.
+Lines are kept in compact arrays and the names of repositories and
+files are interned, so that large sets of results may be kept in
+memory. ``ResultLine`` objects are only built when lines are iterated.
+"""
+import array
+import collections
+import sys
+
+from pyhound.output import LINE_KIND_MATCH
+
+
+class ResultLine(collections.namedtuple('ResultLine', 'repo filename line_number line_kind line')):
+    """A line of search results: a matching line or a line of context.
+
+    ``line_kind`` is ``LINE_KIND_MATCH`` or ``LINE_KIND_CONTEXT``. Use
+    ``pyhound.highlight.get_highlighter()`` to find the positions of
+    matches in the line.
+    """
+    __slots__ = ()
+
+    @property
+    def is_match(self):
+        return self.line_kind == LINE_KIND_MATCH
+
+
+class FileResult:
+    """Lines of search results of a single file, sorted by line number.
+
+    Iterating a ``FileResult`` gives its lines as ``ResultLine``
+    objects.
+    """
+
+    __slots__ = ('repo', 'filename', 'line_numbers', 'line_kinds', 'lines')
+
+    def __init__(self, repo, filename):
+        # The same names appear in many results (and many searches).
+        self.repo = sys.intern(repo)
+        self.filename = sys.intern(filename)
+        self.line_numbers = array.array('I')
+        self.line_kinds = array.array('B')
+        self.lines = []
+
+    def add_line(self, line_number, line_kind, line):
+        self.line_numbers.append(line_number)
+        self.line_kinds.append(line_kind)
+        self.lines.append(line)
+
+    @property
+    def match_count(self):
+        """The number of matching lines."""
+        return self.line_kinds.count(LINE_KIND_MATCH)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __iter__(self):
+        for line_number, line_kind, line in zip(self.line_numbers, self.line_kinds, self.lines):
+            yield ResultLine(self.repo, self.filename, line_number, line_kind, line)
+
+    def __repr__(self):
+        return '<FileResult %s:%s (%d lines)>' % (self.repo, self.filename, len(self))
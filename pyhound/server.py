@@ -0,0 +1,270 @@
+"""A long-lived process that answers search requests.
+
+Editors and other tools may keep a single ``pyhound --serve`` process
+running instead of starting a new one for each search. Connections to
+Hound and the catalogue of repositories are kept between searches.
+
+Requests and responses are JSON objects, one per line, read from the
+standard input (and written to the standard output) or from each
+connection to a Unix socket. A search request looks like::
+
+    {"id": 1, "pattern": "frobulate", "repos": "billing-*", "context": 3}
+
+and is answered by one object per line of result::
+
+    {"id": 1, "repo": "billing-api", "filename": "api.py", "line_number": 12,
+     "match": true, "line": "    frobulate(x)", "spans": [[4, 13]]}
+
+followed by ``{"id": 1, "done": true}``, or by ``{"id": 1, "error":
+"..."}`` if the search failed. A new search request cancels the search
+that is in progress on the same connection, if any: it is then
+answered by ``{"id": 1, "cancelled": true}``. A search may also be
+cancelled explicitly with ``{"cancel": 1}``.
+"""
+import json
+import os
+import socketserver
+import stat
+import sys
+import threading
+
+from pyhound.batch import QUERY_OPTIONS
+from pyhound.highlight import get_highlighter
+from pyhound.hound import Client
+from pyhound.hound import HoundError
+from pyhound.hound import LINE_KIND_MATCH
+
+
+# Keys of a search request and the corresponding arguments of
+# ``Client``, in addition to those of batch queries.
+REQUEST_OPTIONS = dict(
+    QUERY_OPTIONS,
+    after_context='after_context',
+    before_context='before_context',
+    context='context',
+    line_max_length='line_max_length',
+)
+
+
+class SearchServer:
+    """Build clients for search requests, with shared state."""
+
+    def __init__(self, **options):
+        self.options = dict(options, color='never')
+        self.catalogue = None
+
+    def get_client(self, request):
+        options = dict(self.options, pattern=request['pattern'])
+        for key, value in request.items():
+            if key in REQUEST_OPTIONS:
+                options[REQUEST_OPTIONS[key]] = value
+        client = Client(**options)
+        # Share connections (and their options) between all searches.
+        self.options.setdefault('transport', client.transport)
+        # Share the catalogue of repositories between all searches.
+        if self.catalogue is None:
+            self.catalogue = client.catalogue
+        else:
+            client.catalogue = self.catalogue
+        return client
+
+
+class _Search:
+    """A search in progress, which may be cancelled from another
+    thread.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        # The client of the search, once it has been built.
+        self.client = None
+
+    def is_cancelled(self):
+        return self.event.is_set()
+
+    def set_client(self, client):
+        self.client = client
+        # The search may have been cancelled in the meantime.
+        if self.is_cancelled():
+            client.abort()
+
+    def cancel(self):
+        self.event.set()
+        client = self.client
+        if client is not None:
+            # Do not wait for the rest of the response of Hound.
+            client.abort()
+
+
+class Session:
+    """Handle requests of a single connection (or of the standard
+    input).
+    """
+
+    def __init__(self, server, output):
+        self.server = server
+        self.output = output
+        self.lock = threading.Lock()
+        # Search id -> ``_Search``.
+        self.in_progress = {}
+        self.threads = []
+
+    def send(self, response):
+        data = json.dumps(response) + '\n'
+        with self.lock:
+            try:
+                self.output.write(data)
+                self.output.flush()
+            except (OSError, ValueError):
+                # The other end has gone away. Searches in progress
+                # will stop by themselves.
+                pass
+
+    def handle(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            request = None
+        if not isinstance(request, dict) or not ('cancel' in request or 'pattern' in request):
+            self.send({'error': "Invalid request: %s" % line.strip()})
+            return
+        if 'cancel' in request:
+            self.cancel(request['cancel'])
+            return
+        self.cancel()
+        request_id = request.get('id')
+        search = _Search()
+        with self.lock:
+            self.in_progress[request_id] = search
+        thread = threading.Thread(target=self.search, args=(request_id, request, search))
+        thread.daemon = True
+        thread.start()
+        self.threads = [t for t in self.threads if t.is_alive()] + [thread]
+
+    def wait(self):
+        """Wait for searches in progress to finish."""
+        for thread in self.threads:
+            thread.join()
+
+    def cancel(self, request_id=None):
+        """Cancel the given search, or all searches if ``request_id`` is
+        None.
+        """
+        with self.lock:
+            if request_id is None:
+                searches = list(self.in_progress.values())
+            else:
+                searches = [self.in_progress[request_id]] if request_id in self.in_progress else []
+        for search in searches:
+            search.cancel()
+
+    def search(self, request_id, request, search):
+        try:
+            self._search(request_id, request, search)
+        except HoundError as exc:
+            if search.is_cancelled():
+                # Reading the response of Hound has been aborted.
+                self.send({'id': request_id, 'cancelled': True})
+            else:
+                self.send({'id': request_id, 'error': str(exc)})
+        except Exception as exc:  # pylint: disable=broad-except
+            self.send({'id': request_id, 'error': "Unexpected error: %r" % exc})
+        finally:
+            with self.lock:
+                if self.in_progress.get(request_id) is search:
+                    del self.in_progress[request_id]
+
+    def _search(self, request_id, request, search):
+        client = self.server.get_client(request)
+        search.set_client(client)
+        highlighter = get_highlighter(client.pattern, client.ignore_case)
+        files = client.iter_search_files()
+        try:
+            for file_ in files:
+                if search.is_cancelled():
+                    break
+                for repo, filename, line_number, line_kind, line in client.get_file_lines([file_]):
+                    if search.is_cancelled():
+                        break
+                    self.send({
+                        'id': request_id,
+                        'repo': repo,
+                        'filename': filename,
+                        'line_number': line_number,
+                        'match': line_kind == LINE_KIND_MATCH,
+                        'line': line,
+                        'spans': highlighter.spans(line),
+                    })
+        finally:
+            # Stop reading the response of Hound, if any.
+            files.close()
+        if search.is_cancelled():
+            self.send({'id': request_id, 'cancelled': True})
+        else:
+            self.send({'id': request_id, 'done': True})
+
+
+class _UnixStreamHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        output = _SocketOutput(self.wfile)
+        session = Session(self.server.search_server, output)
+        try:
+            for line in self.rfile:
+                session.handle(line.decode('utf-8'))
+        finally:
+            session.cancel()
+
+
+class _SocketOutput:
+    """A text wrapper around the binary output of a socket."""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, data):
+        self.wfile.write(data.encode('utf-8'))
+
+    def flush(self):
+        self.wfile.flush()
+
+
+class _UnixStreamServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path=None, **options):
+    """Answer search requests read from the standard input, or from
+    connections to the given Unix socket, until the end of the input
+    (or until interrupted).
+
+    ``options`` are default arguments of ``Client`` for all requests.
+    """
+    search_server = SearchServer(**options)
+    try:
+        if socket_path is None:
+            session = Session(search_server, sys.stdout)
+            for line in sys.stdin:
+                session.handle(line)
+            # Let searches in progress finish before we exit.
+            session.wait()
+            return
+        try:
+            mode = os.stat(socket_path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            # Only remove the socket of a previous server, not any
+            # file given by mistake.
+            if not stat.S_ISSOCK(mode):
+                sys.exit("%s exists and is not a socket." % socket_path)
+            os.unlink(socket_path)
+        server = _UnixStreamServer(socket_path, _UnixStreamHandler)
+        server.search_server = search_server
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            os.unlink(socket_path)
+    except KeyboardInterrupt:
+        pass
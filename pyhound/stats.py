@@ -0,0 +1,224 @@
+"""Statistics of searches: where the time goes.
+
+The time of a search is split in phases:
+
+- ``connect``: name resolution and connection to Hound (including TLS);
+- ``wait``: from the request to the headers of the response, i.e.
+  mostly the search on the Hound server;
+- ``download``: reading (and decompressing) the body of responses;
+- ``decode``: decoding JSON responses;
+- ``context``: building lines of context and merging them;
+- ``format``: formatting lines of output (and highlighting matches);
+- ``write``: writing to the standard output.
+
+Durations are exclusive: the time spent downloading a response while
+decoding it is only counted in ``download``. When requests are sent
+concurrently, durations of all threads are added up, so that they may
+exceed the total (wall-clock) duration. The time spent waiting for
+these requests is not counted.
+"""
+import time
+
+
+PHASE_CONNECT = 'connect'
+PHASE_WAIT = 'wait'
+PHASE_DOWNLOAD = 'download'
+PHASE_DECODE = 'decode'
+PHASE_CONTEXT = 'context'
+PHASE_FORMAT = 'format'
+PHASE_WRITE = 'write'
+# Waiting for concurrent requests, which are measured in their own
+# threads. This phase is not reported.
+PHASE_IDLE = 'idle'
+
+PHASES = (
+    PHASE_CONNECT,
+    PHASE_WAIT,
+    PHASE_DOWNLOAD,
+    PHASE_DECODE,
+    PHASE_CONTEXT,
+    PHASE_FORMAT,
+    PHASE_WRITE,
+)
+
+
+class _Phase:
+    """A context manager that measures the time spent in a phase,
+    minus the time spent in nested phases.
+    """
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+        self.started = None
+        self.nested = 0.0
+
+    def __enter__(self):
+        self.stats._get_stack().append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        stack = self.stats._get_stack()
+        stack.pop()
+        if stack:
+            stack[-1].nested += elapsed
+        self.stats.add(self.name, elapsed - self.nested)
+
+
+class _NoPhase:
+    """A context manager that does nothing, when statistics are not
+    needed.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NO_PHASE = _NoPhase()
+
+
+class SearchStats:
+    """Durations of each phase of a search, and statistics that Hound
+    returns with search results.
+    """
+
+    def __init__(self, pattern=None):
+        self.pattern = pattern
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.requests = 0
+        # Requests sent again after a failure, and second requests
+        # sent because the first one was slow (see
+        # ``pyhound.transport.Transport``).
+        self.retries = 0
+        self.hedges = 0
+        self.bytes_received = 0
+        # Number of items yielded by ``iter_timed()``, by phase.
+        self.counts = dict.fromkeys(PHASES, 0)
+        # Added up over all responses of Hound.
+        self.files_opened = 0
+        self.server_duration = 0.0  # in seconds
+        self.started = time.perf_counter()
+        self.total_duration = None
+        # Only imported when statistics are asked for, to keep the
+        # start-up of the command-line client fast.
+        import threading
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _get_stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def phase(self, name):
+        """Return a context manager that measures the time spent in
+        the given phase.
+        """
+        return _Phase(self, name)
+
+    def iter_timed(self, name, iterable):
+        """Yield items of the given iterable. The time spent to get
+        each item is counted in the given phase.
+        """
+        iterator = iter(iterable)
+        while True:
+            with _Phase(self, name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            self.counts[name] += 1
+            yield item
+
+    def add(self, name, duration):
+        if name == PHASE_IDLE:
+            return
+        with self._lock:
+            self.durations[name] += duration
+
+    def add_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def add_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def add_hedge(self):
+        with self._lock:
+            self.hedges += 1
+
+    def add_bytes(self, size):
+        with self._lock:
+            self.bytes_received += size
+
+    def add_server_stats(self, server_stats):
+        """Add the ``Stats`` of a search response of Hound."""
+        if not server_stats:
+            return
+        with self._lock:
+            self.files_opened += server_stats.get('FilesOpened') or 0
+            # Hound gives the duration in milliseconds.
+            self.server_duration += (server_stats.get('Duration') or 0) / 1000
+
+    def stop(self):
+        """Record the total duration of the search."""
+        self.total_duration = time.perf_counter() - self.started
+
+    def as_dict(self):
+        """Return statistics as a dictionary, with durations in
+        milliseconds.
+        """
+        return {
+            'pattern': self.pattern,
+            'requests': self.requests,
+            'retries': self.retries,
+            'hedges': self.hedges,
+            'bytes_received': self.bytes_received,
+            'lines': self.counts[PHASE_FORMAT],
+            'server': {
+                'files_opened': self.files_opened,
+                'duration': round(self.server_duration * 1000, 3),
+            },
+            'phases': {
+                name: round(duration * 1000, 3)
+                for name, duration in self.durations.items()
+            },
+            'total': None if self.total_duration is None else round(self.total_duration * 1000, 3),
+        }
+
+    def format(self):
+        """Return statistics as human-readable text."""
+        stats = self.as_dict()
+        details = ['%s received' % _format_size(stats['bytes_received'])]
+        if stats['retries']:
+            details.append('%d retried' % stats['retries'])
+        if stats['hedges']:
+            details.append('%d hedged' % stats['hedges'])
+        lines = [
+            "Search statistics for %r:" % self.pattern,
+            "  requests:        %d (%s)" % (stats['requests'], ', '.join(details)),
+            "  lines of output: %d" % stats['lines'],
+            "  Hound:           %d files opened in %.1f ms" % (
+                stats['server']['files_opened'], stats['server']['duration']),
+        ]
+        for name in PHASES:
+            lines.append("  %-16s %.1f ms" % (name + ':', stats['phases'][name]))
+        if stats['total'] is not None:
+            lines.append("  %-16s %.1f ms" % ('total:', stats['total']))
+        return '\n'.join(lines) + '\n'
+
+
+def _format_size(size):
+    if size < 1024:
+        return '%d bytes' % size
+    if size < 1024 * 1024:
+        return '%.1f KB' % (size / 1024)
+    return '%.1f MB' % (size / 1024 / 1024)
@@ -0,0 +1,257 @@
+"""A local store of search results, to refine a search without asking
+Hound again.
+
+``--save FILE`` writes the results of a search in a SQLite database,
+with as many lines of context as Hound returns (20). ``--from-store
+FILE`` then searches these results instead of Hound: the pattern is
+matched against saved matching lines, and options such as ``--repos``,
+``--path``, ``-A``/``-B``/``-C`` or ``--line-max-length`` apply
+locally, without any request.
+
+The database has a table of files (with indexes on repositories and
+file names) and a table of matches (indexed by file and line number).
+Lines of context are stored with each match.
+"""
+import collections
+import functools
+import itertools
+import os
+import re
+import sqlite3
+import time
+
+from pyhound.highlight import translate_go_regexp
+from pyhound.hound import Client
+from pyhound.hound import HoundError
+from pyhound.hound import MAX_CONTEXT
+
+
+# Version of the schema, stored as the ``user_version`` of the
+# database.
+SCHEMA_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE search (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE files (id INTEGER PRIMARY KEY, repo TEXT NOT NULL, filename TEXT NOT NULL);
+CREATE INDEX files_repo ON files (repo);
+CREATE INDEX files_filename ON files (filename);
+CREATE TABLE matches (
+    file_id INTEGER NOT NULL REFERENCES files (id),
+    line_number INTEGER NOT NULL,
+    line TEXT NOT NULL,
+    before TEXT,
+    after TEXT,
+    PRIMARY KEY (file_id, line_number)
+) WITHOUT ROWID;
+'''
+
+
+class StoreError(HoundError):
+    """Raised when a store cannot be read or written."""
+
+
+def _join_lines(lines):
+    return '\n'.join(lines) if lines else None
+
+
+def _split_lines(text):
+    return text.split('\n') if text is not None else None
+
+
+@functools.lru_cache(maxsize=16)
+def _compile(pattern, ignore_case):
+    return re.compile(translate_go_regexp(pattern), flags=re.IGNORECASE if ignore_case else 0)
+
+
+def _search(pattern, text, ignore_case):
+    return _compile(pattern, ignore_case).search(text) is not None
+
+
+def _connect(path):
+    """Open the store at the given path and check its schema."""
+    try:
+        connection = sqlite3.connect(path)
+        version = connection.execute('PRAGMA user_version').fetchone()[0]
+    except sqlite3.Error as exc:
+        raise StoreError("Could not open store %s: %s" % (path, exc))
+    if version != SCHEMA_VERSION:
+        connection.close()
+        raise StoreError("%s is not a store of search results." % path)
+    return connection
+
+
+class StoreWriter:
+    """Write search results in a new store.
+
+    The store is written in a temporary file which replaces ``path``
+    when ``close()`` is called, so that an existing store is kept if
+    the search fails. Existing files that are not stores are never
+    replaced.
+    """
+
+    def __init__(self, path, search):
+        if os.path.exists(path):
+            _connect(path).close()
+        self.path = path
+        self.tmp_path = '%s.tmp-%d' % (path, os.getpid())
+        try:
+            self.connection = sqlite3.connect(self.tmp_path)
+            self.connection.executescript(SCHEMA)
+            self.connection.execute('PRAGMA user_version = %d' % SCHEMA_VERSION)
+            self.connection.executemany(
+                'INSERT INTO search (key, value) VALUES (?, ?)',
+                sorted(dict(search, saved=time.strftime('%Y-%m-%dT%H:%M:%S')).items()),
+            )
+        except (OSError, sqlite3.Error) as exc:
+            raise StoreError("Could not write store %s: %s" % (path, exc))
+
+    def add_file(self, repo, filename, matches):
+        cursor = self.connection.execute('INSERT INTO files (repo, filename) VALUES (?, ?)', (repo, filename))
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO matches (file_id, line_number, line, before, after) VALUES (?, ?, ?, ?, ?)',
+            (
+                (cursor.lastrowid, match['LineNumber'], match['Line'],
+                 _join_lines(match['Before']), _join_lines(match['After']))
+                for match in matches
+            )
+        )
+
+    def iter_files(self, files):
+        """Save and yield the given ``(repo, filename, matches)``
+        tuples.
+        """
+        try:
+            for repo, filename, matches in files:
+                self.add_file(repo, filename, matches)
+                yield repo, filename, matches
+        finally:
+            # Stop reading the response of Hound, if we are stopped.
+            if hasattr(files, 'close'):
+                files.close()
+
+    def close(self):
+        """Commit results and replace the store at ``path``."""
+        try:
+            self.connection.commit()
+            self.connection.close()
+            os.replace(self.tmp_path, self.path)
+        except (OSError, sqlite3.Error) as exc:
+            raise StoreError("Could not write store %s: %s" % (self.path, exc))
+
+    def abort(self):
+        self.connection.close()
+        os.unlink(self.tmp_path)
+
+
+class SavingClient(Client):
+    """A ``Client`` that also saves results of its search (with all
+    lines of context that Hound returns) in a store.
+    """
+
+    def __init__(self, endpoint, pattern, store_path, **options):
+        super().__init__(endpoint, pattern, **options)
+        self.store_path = store_path
+        self._writer = None
+
+    def get_context_size(self):
+        return MAX_CONTEXT
+
+    def run(self):
+        try:
+            self._writer = StoreWriter(self.store_path, {
+                'endpoint': self.endpoint_search,
+                'pattern': self.pattern,
+                'ignore_case': 'true' if self.ignore_case else '',
+                'path': self.path_pattern or '',
+            })
+        except StoreError as exc:
+            raise SystemExit(str(exc))
+        try:
+            super().run()
+        except BaseException:
+            self._writer.abort()
+            raise
+        try:
+            self._writer.close()
+        except StoreError as exc:
+            raise SystemExit(str(exc))
+
+    def print_files(self, files):
+        super().print_files(self._writer.iter_files(files))
+
+
+class StoreClient(Client):
+    """A ``Client`` that searches results saved in a store instead of
+    asking Hound.
+
+    ``pattern`` is matched against the saved matching lines. If it is
+    empty, all saved matches are kept (and highlighted with the
+    pattern of the saved search).
+    """
+
+    def __init__(self, store_path, pattern=None, **options):
+        options.update(cache=False, catalogue_ttl=0, fan_out=False)
+        self.store_path = store_path
+        self.connection = _connect(store_path)
+        # ``X REGEXP Y`` calls ``regexp(Y, X)``.
+        self.connection.create_function('regexp', 2, functools.partial(_search, ignore_case=False))
+        self.connection.create_function('iregexp', 2, functools.partial(_search, ignore_case=True))
+        search = dict(self.connection.execute('SELECT key, value FROM search'))
+        self.sub_pattern = pattern or None
+        if self.sub_pattern is None:
+            pattern = search.get('pattern', '')
+            options['ignore_case'] = bool(search.get('ignore_case'))
+        super().__init__(search.get('endpoint', ''), pattern, **options)
+
+    def get_all_repos(self):
+        return [repo for repo, in self.connection.execute('SELECT DISTINCT repo FROM files ORDER BY repo')]
+
+    def fetch_search_results(self):
+        """Return saved results that match the options of the search,
+        in the format of Hound.
+        """
+        results = collections.OrderedDict()
+        for repo, filename, matches in self.iter_search_files():
+            results.setdefault(repo, {'Matches': []})['Matches'].append({'Filename': filename, 'Matches': matches})
+        return results
+
+    def iter_search_files(self):
+        """Yield a ``(repo, filename, matches)`` tuple for each saved
+        file that matches the options of the search.
+        """
+        try:
+            _compile(self.path_pattern or '', False)
+            _compile(self.sub_pattern or '', self.ignore_case)
+        except re.error as exc:
+            raise StoreError("Invalid regular expression: %s" % exc)
+        conditions = []
+        params = []
+        if self.repos != '*':
+            repos = self.repos.split(',')
+            conditions.append('f.repo IN (%s)' % ','.join('?' * len(repos)))
+            params.extend(repos)
+        if self.path_pattern:
+            conditions.append('f.filename REGEXP ?')
+            params.append(self.path_pattern)
+        if self.sub_pattern:
+            conditions.append('%s(?, m.line)' % ('iregexp' if self.ignore_case else 'regexp'))
+            params.append(self.sub_pattern)
+        query = (
+            'SELECT f.repo, f.filename, m.line_number, m.line, m.before, m.after '
+            'FROM matches m JOIN files f ON f.id = m.file_id '
+            '%s ORDER BY f.id, m.line_number' % ('WHERE ' + ' AND '.join(conditions) if conditions else '')
+        )
+        try:
+            rows = self.connection.execute(query, params)
+            for (repo, filename), file_rows in itertools.groupby(rows, key=lambda row: row[:2]):
+                yield repo, filename, [
+                    {
+                        'LineNumber': line_number,
+                        'Line': line,
+                        'Before': _split_lines(before),
+                        'After': _split_lines(after),
+                    }
+                    for _, _, line_number, line, before, after in file_rows
+                ]
+        except sqlite3.Error as exc:
+            raise StoreError("Could not read store %s: %s" % (self.store_path, exc))
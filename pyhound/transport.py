@@ -0,0 +1,406 @@
+"""A small HTTP client that keeps connections alive and asks for
+compressed responses.
+
+``urllib.request.urlopen()`` opens a new connection for each request.
+A ``Transport`` keeps idle connections in a pool so that they can be
+reused by subsequent requests, including requests sent concurrently
+from other threads.
+
+A ``Transport`` may also retry requests that fail to connect or that
+get an error from an overloaded server (or from a load balancer in
+front of it), and send a second ("hedged") request when the server is
+slow to answer the first one.
+"""
+import http.client
+import random
+import socket
+import threading
+import time
+import urllib.parse
+import urllib.request
+import zlib
+
+from pyhound.stats import NO_PHASE
+from pyhound.stats import PHASE_CONNECT
+from pyhound.stats import PHASE_DOWNLOAD
+from pyhound.stats import PHASE_WAIT
+
+
+# Maximum number of idle connections that we keep for each host.
+DEFAULT_MAX_IDLE_CONNECTIONS = 16
+
+CHUNK_SIZE = 64 * 1024
+
+ACCEPT_ENCODING = 'gzip, deflate'
+
+# Statuses of responses that are retried: the server (or a proxy in
+# front of it) is overloaded or unavailable.
+RETRY_STATUSES = (502, 503, 504)
+
+# Delays between retries are random, up to this delay (in seconds)
+# doubled after each attempt, and never more than ``MAX_BACKOFF``.
+DEFAULT_BACKOFF = 0.2
+MAX_BACKOFF = 5.0
+
+# Errors that we get when the server has closed a connection that we
+# kept in the pool.
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+def _get_phase(stats, name):
+    return NO_PHASE if stats is None else stats.phase(name)
+
+
+def _discard(response):
+    """Read (so that its connection may be reused) and close a
+    response that we do not need.
+    """
+    try:
+        response.read()
+    except OSError:
+        pass
+    response.close()
+
+
+class Response:
+    """The response of a request sent by a ``Transport``.
+
+    The body is decompressed on the fly. Once it has been entirely
+    read, the connection goes back to the pool of its transport.
+    """
+
+    def __init__(self, transport, key, connection, response, stats=None):
+        self.transport = transport
+        self.stats = stats
+        self.key = key
+        self.connection = connection
+        self.response = response
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        self.aborted = False
+        encoding = response.getheader('Content-Encoding', '').strip().lower()
+        if encoding in ('gzip', 'x-gzip', 'deflate'):
+            # Accept both gzip and zlib headers.
+            self.decompressor = zlib.decompressobj(zlib.MAX_WBITS | 32)
+        else:
+            self.decompressor = None
+
+    def read(self, size=-1):
+        """Read and return up to ``size`` bytes, or everything if
+        ``size`` is negative.
+        """
+        if size >= 0:
+            return self.read1(size)
+        return b''.join(iter(lambda: self.read1(CHUNK_SIZE), b''))
+
+    def read1(self, size=CHUNK_SIZE):
+        """Read and return what is available, up to about ``size``
+        bytes. Return an empty string at the end of the body.
+        """
+        if self.response is None:
+            return b''
+        if self.stats is None:
+            return self._read1(size)
+        with self.stats.phase(PHASE_DOWNLOAD):
+            return self._read1(size)
+
+    def _read1(self, size):
+        while True:
+            try:
+                chunk = self.response.read1(size)
+            except http.client.HTTPException as exc:
+                self.close()
+                if self.aborted:
+                    raise OSError("The transfer has been aborted.")
+                raise OSError("Invalid HTTP response: %r" % exc)
+            if self.stats is not None:
+                self.stats.add_bytes(len(chunk))
+            if not chunk and self.aborted:
+                self.close()
+                raise OSError("The transfer has been aborted.")
+            if not chunk:
+                data = self.decompressor.flush() if self.decompressor else b''
+                self._release()
+                return data
+            if self.decompressor is None:
+                return chunk
+            try:
+                data = self.decompressor.decompress(chunk)
+            except zlib.error as exc:
+                self.close()
+                raise OSError("Could not decompress response: %s" % exc)
+            if data:
+                return data
+
+    def _release(self):
+        """Give the connection back to the transport, if possible."""
+        if self.response is None:
+            return
+        # The connection can only send a new request once the
+        # response has been closed. It does not close the socket.
+        self.response.close()
+        if self.response.will_close:
+            self.connection.close()
+        else:
+            self.transport._release(self.key, self.connection)
+        self.response = None
+
+    def abort(self):
+        """Stop the transfer of the body. This may be called from
+        another thread: a read in progress (and any later read) then
+        fails with ``OSError``. The response must still be closed.
+        """
+        self.aborted = True
+        sock = self.connection.sock
+        if sock is not None:
+            try:
+                # Unlike closing, shutting down the socket wakes up a
+                # thread that is waiting for data.
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def close(self):
+        """Close the response. If the body has not been entirely read,
+        the connection cannot be reused and is closed.
+        """
+        if self.response is None:
+            return
+        self.response.close()
+        self.connection.close()
+        self.response = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def get_backoff_delay(attempt, backoff=DEFAULT_BACKOFF):
+    """Return the time to wait before the given attempt (1 for the
+    first retry), with "full jitter" so that clients that failed at the
+    same time do not retry at the same time.
+    """
+    return random.uniform(0, min(MAX_BACKOFF, backoff * 2 ** (attempt - 1)))
+
+
+class Transport:
+    """Send GET requests over persistent HTTP(S) connections.
+
+    ``timeout`` applies to each read from the server. Failed requests
+    are retried up to ``retries`` times (see ``get()``). If
+    ``hedge_after`` is given, a second request is sent when the server
+    has not answered the first one after this time (in seconds).
+
+    A transport is thread-safe and is meant to be shared by all
+    requests to the same servers.
+    """
+
+    def __init__(self, timeout, max_idle_connections=DEFAULT_MAX_IDLE_CONNECTIONS,
+                 connect_timeout=None, retries=0, backoff=DEFAULT_BACKOFF, hedge_after=None):
+        self.timeout = timeout
+        self.connect_timeout = timeout if connect_timeout is None else connect_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge_after = hedge_after
+        self.max_idle_connections = max_idle_connections
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout=None, stats=None):
+        """Send a GET request and return a ``Response``.
+
+        Requests that fail before we get a response (e.g. connection
+        refused or timeout) or that get a response with one of
+        ``RETRY_STATUSES`` are sent again, after a random and
+        increasing delay, up to ``retries`` times. Once we have a
+        response, it is up to the caller to read it.
+
+        If ``stats`` (a ``pyhound.stats.SearchStats``) is given, the
+        time spent to connect, wait for and download the response is
+        recorded there.
+
+        Raise ``OSError`` (including ``socket.timeout``) if the
+        request could not be sent or if the response is invalid.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        send = self._send_once if self.hedge_after is None else self._send_hedged
+        attempt = 0
+        while True:
+            try:
+                response = send(url, timeout, stats)
+            except OSError:
+                if attempt >= self.retries:
+                    raise
+            else:
+                if response.status not in RETRY_STATUSES or attempt >= self.retries:
+                    return response
+                _discard(response)
+            attempt += 1
+            if stats is not None:
+                stats.add_retry()
+            time.sleep(get_backoff_delay(attempt, self.backoff))
+
+    def _send_hedged(self, url, timeout, stats):
+        """Send the request and, if we get no response after
+        ``hedge_after`` seconds, send it again. Return the first
+        response that we get. The other one, if any, is closed.
+
+        Requests are sent in daemon threads, so that we do not wait
+        for the slowest one.
+        """
+        import queue
+        responses = queue.Queue()
+        lock = threading.Lock()
+        done = []
+
+        def send():
+            try:
+                response = self._send_once(url, timeout, stats)
+            except OSError as exc:
+                responses.put((None, exc))
+                return
+            with lock:
+                if not done:
+                    responses.put((response, None))
+                    return
+            _discard(response)
+
+        def start():
+            thread = threading.Thread(target=send)
+            thread.daemon = True
+            thread.start()
+
+        start()
+        pending = 1
+        hedged = False
+        error = None
+        while True:
+            try:
+                response, exc = responses.get(timeout=None if hedged else self.hedge_after)
+            except queue.Empty:
+                # The first request is slow: send another one.
+                hedged = True
+                if stats is not None:
+                    stats.add_hedge()
+                start()
+                pending += 1
+                continue
+            pending -= 1
+            if exc is None:
+                break
+            error = error or exc
+            if not pending:
+                raise error
+        with lock:
+            done.append(True)
+        # Another response may have come in the meantime.
+        while not responses.empty():
+            other, _ = responses.get()
+            if other is not None:
+                _discard(other)
+        return response
+
+    def _send_once(self, url, timeout, stats):
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        connection, target = self._acquire(key, url, timeout)
+        headers = {
+            'Accept-Encoding': ACCEPT_ENCODING,
+            'Connection': 'keep-alive',
+        }
+        while True:
+            reused = connection.sock is not None
+            try:
+                if stats is not None:
+                    stats.add_request()
+                if not reused:
+                    with _get_phase(stats, PHASE_CONNECT):
+                        self._connect(connection, timeout)
+                with _get_phase(stats, PHASE_WAIT):
+                    response = self._send(connection, target, headers)
+            except STALE_CONNECTION_ERRORS:
+                connection.close()
+                if not reused:
+                    raise
+                # The server closed the connection while it was idle.
+                # Try again with a new connection.
+                connection, target = self._new_connection(key, url)
+                continue
+            except http.client.HTTPException as exc:
+                connection.close()
+                raise OSError("Invalid HTTP response: %r" % exc)
+            except OSError:
+                connection.close()
+                raise
+            return Response(self, key, connection, response, stats)
+
+    def _connect(self, connection, timeout):
+        """Connect with the connection timeout, then use the given
+        timeout for reads.
+        """
+        connection.timeout = self.connect_timeout
+        connection.connect()
+        connection.timeout = timeout
+        connection.sock.settimeout(timeout)
+
+    @staticmethod
+    def _send(connection, target, headers):
+        connection.request('GET', target, headers=headers)
+        return connection.getresponse()
+
+    def _acquire(self, key, url, timeout):
+        with self._lock:
+            idle = self._idle.get(key)
+            connection = idle.pop() if idle else None
+        if connection is None:
+            return self._new_connection(key, url)
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection, self._get_target(connection, url)
+
+    def _new_connection(self, key, url):
+        scheme, host, port = key
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        proxy = urllib.request.getproxies().get(scheme)
+        if proxy and not urllib.request.proxy_bypass(host):
+            proxy_parts = urllib.parse.urlsplit(proxy if '://' in proxy else 'http://%s' % proxy)
+            connection = connection_class(proxy_parts.hostname, proxy_parts.port, timeout=self.connect_timeout)
+            if scheme == 'https':
+                connection.set_tunnel(host, port)
+            else:
+                connection.is_proxied = True
+        else:
+            connection = connection_class(host, port, timeout=self.connect_timeout)
+        return connection, self._get_target(connection, url)
+
+    @staticmethod
+    def _get_target(connection, url):
+        if getattr(connection, 'is_proxied', False):
+            return url
+        parts = urllib.parse.urlsplit(url)
+        return urllib.parse.urlunsplit(('', '', parts.path or '/', parts.query, ''))
+
+    def _release(self, key, connection):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_connections:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        """Close all idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
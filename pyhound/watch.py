@@ -0,0 +1,229 @@
+"""Watch the results of a search.
+
+``--watch INTERVAL`` runs the same search every INTERVAL seconds and
+only prints lines that have been added (prefixed by ``+``) or removed
+(prefixed by ``-``) since the previous cycle. The first cycle prints
+all lines, as added ones.
+
+Hound tells the revision that it has indexed for each repository that
+has results. To know which repositories have changed without searching
+all of them, we keep a probe for each repository: a file and one of
+its lines. A single request searches probe lines in probe files only,
+which is cheap, and returns the current revision of each repository.
+Only repositories whose revision has changed (or whose probe has
+disappeared) are searched again.
+
+Results of each repository are kept in memory as a fingerprint: the
+list of ``(filename, line)`` of its matches (or only file names, with
+``-l``). Lines that have only moved within their file are not reported.
+"""
+import collections
+import sys
+import time
+
+from pyhound.highlight import get_highlighter
+from pyhound.hound import HoundError
+from pyhound.hound import quote_meta
+from pyhound.output import LINE_KIND_MATCH
+from pyhound.output import LineFormatter
+from pyhound.output import OutputWriter
+
+
+def _choose_probe_line(matches):
+    """Return the shortest line of the given matches that appears only
+    once in its file, or the shortest line if there is none.
+    """
+    counts = collections.Counter(match['Line'] for match in matches)
+    lines = [line for line in counts if line.strip()] or list(counts)
+    return min(lines, key=lambda line: (counts[line] > 1, len(line)))
+
+
+def _diff(old, new):
+    """Return lines of ``old`` that are not in ``new`` and lines of
+    ``new`` that are not in ``old``, as two lists. Lines are
+    ``(filename, line_number, line)`` tuples, compared without their
+    line number.
+    """
+    def without_number(lines):
+        return collections.Counter((filename, line) for filename, _, line in lines)
+
+    def subtract(lines, counts):
+        kept = []
+        for filename, line_number, line in lines:
+            if counts[filename, line] > 0:
+                counts[filename, line] -= 1
+            else:
+                kept.append((filename, line_number, line))
+        return kept
+
+    return subtract(old, without_number(new)), subtract(new, without_number(old))
+
+
+class Watcher:
+    """Run the search of ``client`` (a ``pyhound.hound.Client``) every
+    ``interval`` seconds and print added and removed lines.
+    """
+
+    def __init__(self, client, interval):
+        self.client = client
+        self.interval = interval
+        # Current revision, probe and fingerprint of each repository.
+        self.revisions = {}
+        self.probes = {}
+        self.fingerprints = {}
+        highlighter = get_highlighter(client.pattern, client.ignore_case)
+        self.formatters = {
+            sign: LineFormatter(
+                highlighter=highlighter,
+                color=client.color,
+                show_line_number=client.show_line_number,
+                prefix=sign + client.prefix,
+            )
+            for sign in '-+'
+        }
+
+    def run(self, cycles=None):
+        """Watch results until we are interrupted (or after the given
+        number of cycles). Failed cycles are reported on the standard
+        error, and the search is tried again at the next cycle.
+        """
+        try:
+            cycle = 0
+            while True:
+                try:
+                    self.run_cycle()
+                except HoundError as exc:
+                    sys.stderr.write("pyhound: warning: %s\n" % exc)
+                    sys.stderr.flush()
+                cycle += 1
+                if cycles is not None and cycle >= cycles:
+                    break
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    def run_cycle(self):
+        """Search repositories that have changed since the previous
+        cycle and print the differences of their results.
+
+        Raise ``HoundError`` if any error occurs.
+        """
+        repos = self.client._get_repo_names()
+        revisions = self.get_changed_repos(repos)
+        results = {}
+        if revisions and len(revisions) == len(repos):
+            # All repositories (e.g. at the first cycle): we do not
+            # need to list them.
+            results = self.client._fetch_search_results()
+        elif revisions:
+            results = self.client._fetch_search_results(','.join(sorted(revisions)))
+        # Revisions are only kept once the search has succeeded, so
+        # that a failed cycle is done again.
+        self.revisions.update(revisions)
+        removed_repos = set(self.fingerprints) - set(repos)
+        writer = OutputWriter()
+        try:
+            for repo in sorted(set(revisions) | removed_repos):
+                fingerprint = self.get_fingerprint(results.get(repo))
+                removed, added = _diff(self.fingerprints.pop(repo, []), fingerprint)
+                if fingerprint:
+                    self.fingerprints[repo] = fingerprint
+                writer.writelines(self._format(repo, '-', removed))
+                writer.writelines(self._format(repo, '+', added))
+        finally:
+            writer.flush()
+        for repo in removed_repos:
+            self.revisions.pop(repo, None)
+            self.probes.pop(repo, None)
+
+    def get_changed_repos(self, repos):
+        """Return a dictionary of the current revision of repositories
+        (of the given list) that may have changed since the previous
+        cycle.
+        """
+        revisions = self.get_revisions(repos)
+        # New repositories and repositories whose probe is gone need
+        # a new probe.
+        lost = [repo for repo in repos if repo not in revisions]
+        if lost:
+            revisions.update(self.find_probes(lost))
+        return {
+            repo: revisions.get(repo)
+            for repo in repos
+            # Without a revision, we cannot tell whether the
+            # repository has changed.
+            if revisions.get(repo) is None or revisions[repo] != self.revisions.get(repo)
+        }
+
+    def get_revisions(self, repos):
+        """Return the revision of repositories that still have their
+        probe, with a single search of probe lines in probe files.
+        """
+        probes = {repo: self.probes[repo] for repo in repos if repo in self.probes}
+        if not probes:
+            return {}
+        payload = {
+            'repos': ','.join(sorted(probes)),
+            # A single file per repository is enough.
+            'rng': '0:1',
+            'files': '^(?:%s)$' % '|'.join(sorted({quote_meta(filename) for filename, _ in probes.values()})),
+            'i': '',
+            'q': '^(?:%s)$' % '|'.join(sorted({quote_meta(line) for _, line in probes.values()})),
+            'ctx': '0',
+        }
+        results = self.client._search(payload)
+        return {
+            repo: result.get('Revision')
+            for repo, result in results.items()
+            if repo in probes and result['Matches']
+            and result['Matches'][0]['Filename'] == probes[repo][0]
+        }
+
+    def find_probes(self, repos):
+        """Find a probe for each of the given repositories (that has
+        any file) and return their revisions.
+        """
+        payload = {
+            'repos': ','.join(repos),
+            'rng': '0:1',
+            'files': '',
+            'i': '',
+            'q': '.',
+            'ctx': '0',
+        }
+        revisions = {}
+        for repo, result in self.client._search(payload).items():
+            if not result['Matches']:
+                continue
+            file_match = result['Matches'][0]
+            self.probes[repo] = (file_match['Filename'], _choose_probe_line(file_match['Matches']))
+            revisions[repo] = result.get('Revision')
+        return revisions
+
+    def get_fingerprint(self, result):
+        """Return the sorted list of ``(filename, line_number, line)``
+        of the given result of a repository (line numbers and lines are
+        None with ``-l``).
+        """
+        if result is None:
+            return []
+        if self.client.files_with_matches:
+            return sorted((file_match['Filename'], None, None) for file_match in result['Matches'])
+        fingerprint = [
+            (file_match['Filename'], match['LineNumber'], match['Line'])
+            for file_match in result['Matches']
+            for match in file_match['Matches']
+            if not (self.client.line_max_length and len(match['Line']) > self.client.line_max_length)
+        ]
+        fingerprint.sort()
+        return fingerprint
+
+    def _format(self, repo, sign, lines):
+        formatter = self.formatters[sign]
+        if self.client.files_with_matches:
+            return (formatter.format_file(repo, filename) for filename, _, _ in lines)
+        return formatter.format_lines(
+            (repo, filename, line_number, LINE_KIND_MATCH, line)
+            for filename, line_number, line in lines
+        )
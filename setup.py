@@ -19,6 +19,10 @@ setup(
             'pyhound = pyhound.cli:main',
         ],
     },
+    extras_require={
+        # Highlight matches exactly like Hound does.
+        're2': ['google-re2'],
+    },
     include_package_data=True,
     long_description=read('README.rst'),
     long_description_content_type='text/x-rst',
@@ -0,0 +1,162 @@
+import asyncio
+import http.server
+import json
+import socketserver
+import threading
+import time
+import urllib.parse
+from unittest import TestCase
+
+from pyhound import aio
+from pyhound import hound
+
+
+FILES = {
+    'repo1': ['a.py', 'b.py', 'c.py'],
+    'repo2': [],
+    'repo3': ['d.py'],
+}
+
+
+def get_match(line_number, ctx):
+    return {
+        'Line': 'frobulate(%d)' % line_number,
+        'LineNumber': line_number,
+        'Before': ['before'] * ctx or None,
+        'After': ['after'] * ctx or None,
+    }
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """A Hound server that returns an error if more than 2 files
+    match. Search responses are chunked, and sent slowly if the
+    pattern is "slow". Paths of requests are kept in ``server.paths``.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        self.server.paths.append(self.path)
+        if url.path == '/api/v1/repos':
+            self._send_json({repo: {} for repo in FILES})
+            return
+        repos = sorted(FILES) if params['repos'] == '*' else params['repos'].split(',')
+        if not set(repos) <= set(FILES):
+            self._send_json({'Error': 'unknown repository'}, status=500)
+            return
+        ctx = int(params['ctx'])
+        results = {}
+        n_files = 0
+        for repo in repos:
+            filenames = FILES[repo]
+            if params.get('rng'):
+                offset, limit = (int(value) for value in params['rng'].split(':'))
+                filenames = filenames[offset:offset + limit]
+            n_files += len(filenames)
+            if filenames:
+                results[repo] = {
+                    'Matches': [
+                        {'Filename': filename, 'Matches': [get_match(1 + 5 * i, ctx) for i in range(2)]}
+                        for filename in filenames
+                    ],
+                    'FilesWithMatch': len(FILES[repo]),
+                }
+        if n_files > 2:
+            self._send_json({'Error': 'too many results'}, status=500)
+        else:
+            self._send_json({'Results': results}, chunked=True, delay=0.05 if params['q'] == 'slow' else 0)
+
+    def _send_json(self, data, status=200, chunked=False, delay=0):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        if chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for i in range(0, len(body), 50):
+                chunk = body[i:i + 50]
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                self.wfile.flush()
+                time.sleep(delay)
+            self.wfile.write(b'0\r\n\r\n')
+        else:
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.paths = []
+
+
+class TestAsyncClient(TestCase):
+    """Test ``AsyncClient``."""
+
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.loop = asyncio.new_event_loop()
+        self.transport = aio.AsyncTransport()
+
+    def tearDown(self):
+        self.transport.close()
+        self.loop.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def _search(self, pattern='frobulate', **kwargs):
+        async def search():
+            client = aio.AsyncClient(self.url, pattern, transport=self.transport, **kwargs)
+            lines = []
+            async for line in client.search():
+                lines.append(line)
+            return lines
+        return self.loop.run_until_complete(search())
+
+    def test_search(self):
+        lines = self._search(repos='repo1,repo3', after_context=1)
+        self.assertEqual(
+            [(line.repo, line.filename, line.line_number, line.is_match) for line in lines[:4]],
+            [('repo1', 'a.py', 1, True), ('repo1', 'a.py', 2, False),
+             ('repo1', 'a.py', 6, True), ('repo1', 'a.py', 7, False)]
+        )
+        self.assertEqual(len(lines), 4 * 4)
+        self.assertEqual(lines[-1].filename, 'd.py')
+
+    def test_repo_patterns(self):
+        lines = self._search(repos='repo*', exclude_repos='repo1')
+        self.assertEqual([(line.repo, line.filename) for line in lines], [('repo3', 'd.py')] * 2)
+
+    def test_all_repos(self):
+        # There are too many results: repositories are searched
+        # separately, in the order of their names.
+        lines = self._search()
+        self.assertEqual([line.filename for line in lines[::2]], ['a.py', 'b.py', 'c.py', 'd.py'])
+        self.assertTrue(self.server.paths[0].startswith('/api/v1/search?'))
+        self.assertIn('/api/v1/repos', self.server.paths)
+
+    def test_max_count(self):
+        lines = self._search(max_count=1)
+        self.assertEqual(len(lines), 1)
+        # We only need a single file of each repository.
+        self.assertEqual(len(self.server.paths), 1)
+        self.assertIn('rng=0%3A1', self.server.paths[0])
+
+    def test_timeout_applies_to_each_read(self):
+        self.transport.timeout = 0.2
+        lines = self._search('slow', repos='repo1', context=3, page_size=2)
+        self.assertEqual(len(lines), 3 * 2 * 3)
+
+    def test_error(self):
+        with self.assertRaises(hound.HoundServerError):
+            self._search(repos='unknown')
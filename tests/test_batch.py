@@ -0,0 +1,30 @@
+import io
+from unittest import TestCase
+
+from pyhound import batch
+
+
+class TestReadQueries(TestCase):
+    """Test ``read_queries()``."""
+
+    def test_basics(self):
+        fp = io.StringIO(
+            'old_client\n'
+            '\n'
+            '# A comment\n'
+            '{"id": "banned", "pattern": "import (foo|bar)", "repos": "billing-*", '
+            '"path": "^src/", "ignore_case": true}\n'
+            '{"pattern": "deprecated"}\n'
+        )
+        self.assertEqual(
+            batch.read_queries(fp),
+            [{'id': 'old_client', 'pattern': 'old_client', 'options': {}},
+             {'id': 'banned', 'pattern': 'import (foo|bar)',
+              'options': {'repos': 'billing-*', 'path_pattern': '^src/', 'ignore_case': True}},
+             {'id': 'deprecated', 'pattern': 'deprecated', 'options': {}}]
+        )
+
+    def test_invalid_query(self):
+        for line in ('{"id": "no pattern"}', '{"pattern": "foo"', '{"pattern": "foo", "color": "always"}'):
+            with self.assertRaises(ValueError):
+                batch.read_queries(io.StringIO(line))
@@ -0,0 +1,90 @@
+from unittest import TestCase
+
+from pyhound import boolean
+
+
+def match(line_number):
+    return {'Line': 'line %d' % line_number, 'LineNumber': line_number, 'Before': None, 'After': None}
+
+
+class FakeBooleanClient(boolean.BooleanClient):
+    """A client that searches files of a fake index: each pattern is
+    mapped to ``(repo, filename, line_numbers)`` tuples.
+    """
+
+    def __init__(self, index, terms, **options):
+        super().__init__(terms, **options)
+        self.index = index
+        self.searches = []
+
+    def _search(self, pattern, negated=False, repos=None, files=None):
+        self.searches.append((pattern, negated, repos, files))
+        return [
+            (repo, filename, [match(line_number) for line_number in line_numbers])
+            for repo, filename, line_numbers in self.index[pattern]
+        ]
+
+
+class TestGetTerms(TestCase):
+    """Test ``get_terms()``."""
+
+    def test_operators(self):
+        self.assertEqual(
+            boolean.get_terms([('and', 'a'), ('or', 'b'), ('and', 'c'), ('not', 'd'), ('or', 'e')]),
+            [('(?:a)|(?:b)', False), ('c', False), ('(?:d)|(?:e)', True)]
+        )
+
+    def test_only_negated_patterns(self):
+        with self.assertRaises(ValueError):
+            boolean.get_terms([('not', 'a')])
+
+
+class TestGetSelectivity(TestCase):
+    """Test ``get_selectivity()``."""
+
+    def test_selectivity(self):
+        self.assertEqual(boolean.get_selectivity('import old_client'), 17)
+        self.assertEqual(boolean.get_selectivity(r'old_client\.connect'), 11)
+        self.assertEqual(boolean.get_selectivity(r'\w+_client'), 7)
+        self.assertEqual(boolean.get_selectivity('[a-z]+ab'), 2)
+        self.assertEqual(boolean.get_selectivity('abc*def'), 3)
+        self.assertEqual(boolean.get_selectivity('a{2,3}bcd'), 3)
+        # Each alternative must be selective.
+        self.assertEqual(boolean.get_selectivity('frobulate|x'), 1)
+        self.assertEqual(boolean.get_selectivity('(frobulate|x)yz'), 2)
+
+
+class TestBooleanClient(TestCase):
+    """Test ``BooleanClient``."""
+
+    index = {
+        'import old_client': [('repo1', 'a.py', [1]), ('repo1', 'b.py', [1]), ('repo2', 'c.py', [2])],
+        'connect': [('repo1', 'a.py', [5]), ('repo1', 'b.py', [1, 3]), ('repo2', 'c.py', [3])],
+        'legacy': [('repo2', 'c.py', [9])],
+    }
+
+    def test_join(self):
+        client = FakeBooleanClient(
+            self.index,
+            [('connect', False), ('import old_client', False), ('legacy', True)],
+        )
+        files = client.fetch_matching_files()
+        self.assertEqual(
+            [(repo, filename, [m['LineNumber'] for m in matches]) for repo, filename, matches in files],
+            [('repo1', 'a.py', [1, 5]), ('repo1', 'b.py', [1, 3])]
+        )
+        # The most selective pattern is searched first, then the other
+        # ones only in its repositories and files.
+        self.assertEqual(client.searches[0], ('import old_client', False, None, None))
+        self.assertEqual(
+            sorted(client.searches[1:]),
+            [('connect', False, 'repo1,repo2', r'^(?:a\.py|b\.py|c\.py)$'),
+             ('legacy', True, 'repo1,repo2', r'^(?:a\.py|b\.py|c\.py)$')]
+        )
+
+    def test_no_match(self):
+        index = dict(self.index, **{'nothing at all': []})
+        client = FakeBooleanClient(index, [('connect', False), ('nothing at all', False)])
+        self.assertEqual(client.fetch_matching_files(), [])
+        # Other patterns are not searched.
+        self.assertEqual(len(client.searches), 1)
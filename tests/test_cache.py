@@ -0,0 +1,97 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import TestCase
+
+from pyhound import cache
+
+
+class TestResultCache(TestCase):
+    """Test ``ResultCache``."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_get_key(self):
+        payload = {'repos': '*', 'rng': '', 'files': None, 'i': '', 'q': 'foo'}
+        key = cache.ResultCache.get_key('http://hound/api/v1/search', payload)
+        # Repositories and ranges are not part of the key.
+        other = dict(payload, repos='repo1', rng='0:10', files='')
+        self.assertEqual(key, cache.ResultCache.get_key('http://hound/api/v1/search', other))
+        other = dict(payload, i='true')
+        self.assertNotEqual(key, cache.ResultCache.get_key('http://hound/api/v1/search', other))
+        self.assertNotEqual(key, cache.ResultCache.get_key('http://other/api/v1/search', payload))
+
+    def test_get_and_set(self):
+        result_cache = cache.ResultCache(self.directory)
+        self.assertEqual(result_cache.get('key'), {})
+        result_cache.set('key', {'repo': {'Revision': 'abc', 'Matches': []}})
+        self.assertEqual(result_cache.get('key'), {'repo': {'Revision': 'abc', 'Matches': []}})
+
+    def test_least_recently_used_entries_are_evicted(self):
+        result_cache = cache.ResultCache(self.directory)
+        results = {'repo': {'Matches': ['x' * 1000]}}
+        result_cache.set('first', results)
+        result_cache.set('second', results)
+        # Make sure that "first" is older than "second", and use it.
+        path = os.path.join(result_cache.directory, 'first.json')
+        old = time.time() - 60
+        os.utime(path, (old, old))
+        result_cache.get('first')
+        os.utime(os.path.join(result_cache.directory, 'second.json'), (old - 60, old - 60))
+        result_cache.max_size = os.path.getsize(path) * 2.5
+        result_cache.set('third', results)
+        self.assertEqual(sorted(os.listdir(result_cache.directory)), ['first.json', 'third.json'])
+
+
+class TestRepoCatalogue(TestCase):
+    """Test ``RepoCatalogue``."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.fetched = []
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _fetch(self):
+        self.fetched.append(True)
+        return ['repo%d' % len(self.fetched)]
+
+    def test_list_is_fetched_once(self):
+        catalogue = cache.RepoCatalogue(self.directory, ttl=60)
+        self.assertEqual(catalogue.get('http://hound', self._fetch), ['repo1'])
+        catalogue = cache.RepoCatalogue(self.directory, ttl=60)
+        self.assertEqual(catalogue.get('http://hound', self._fetch), ['repo1'])
+        self.assertEqual(len(self.fetched), 1)
+        self.assertEqual(catalogue.get('http://other', self._fetch), ['repo2'])
+
+    def test_outdated_list_is_refreshed_in_background(self):
+        catalogue = cache.RepoCatalogue(self.directory, ttl=60)
+        catalogue.get('http://hound', self._fetch)
+        path = os.path.join(self.directory, os.listdir(self.directory)[0])
+        old = time.time() - 120
+        os.utime(path, (old, old))
+        # The outdated list is returned...
+        self.assertEqual(catalogue.get('http://hound', self._fetch), ['repo1'])
+        catalogue.wait()
+        # ... and replaced by a new one.
+        self.assertEqual(catalogue.get('http://hound', self._fetch), ['repo2'])
+
+
+class TestImports(TestCase):
+    """Modules of the cache are only imported when they are needed."""
+
+    def test_lazy_imports(self):
+        code = (
+            "import sys; import pyhound.cli; "
+            "print(' '.join(m for m in ('hashlib', 'json', 'tempfile', 'threading') if m in sys.modules))"
+        )
+        output = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True)
+        self.assertEqual(output.strip(), '')
@@ -0,0 +1,94 @@
+import io
+import time
+from unittest import TestCase
+from unittest import mock
+
+from pyhound import federation
+from pyhound import hound
+
+
+def get_results(repo, *filenames):
+    return {repo: {'Matches': [
+        {'Filename': filename, 'Matches': [{'Line': 'match', 'LineNumber': 1, 'Before': None, 'After': None}]}
+        for filename in filenames
+    ]}}
+
+
+class TestGetServerNames(TestCase):
+    """Test ``get_server_names()``."""
+
+    def test_names(self):
+        self.assertEqual(
+            federation.get_server_names(['http://hound-a:6080/', 'https://hound-b']),
+            ['hound-a:6080', 'hound-b']
+        )
+        self.assertEqual(
+            federation.get_server_names(['http://hound/a/', 'http://hound/b']),
+            ['http://hound/a', 'http://hound/b']
+        )
+
+
+class TestFederatedClient(TestCase):
+    """Test ``FederatedClient``."""
+
+    def _run(self, fetches, **kwargs):
+        endpoints = ['http://hound-%d' % i for i in range(len(fetches))]
+        client = federation.FederatedClient(endpoints, pattern='match', catalogue_ttl=0, **kwargs)
+        for sub_client, fetch in zip(client.clients, fetches):
+            sub_client.fetch_search_results = fetch
+            sub_client._repos = '*'
+        stdout = io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+        with mock.patch('sys.stdout', stdout), mock.patch('sys.stderr', io.StringIO()) as stderr:
+            status = client.run()
+        return status, stdout.buffer.getvalue().decode('utf-8'), stderr.getvalue()
+
+    def test_results_in_order_of_servers(self):
+        def slow():
+            time.sleep(0.05)
+            return get_results('repo1', 'a.py')
+
+        status, output, errors = self._run(
+            [slow, lambda: get_results('repo2', 'b.py', 'c.py')],
+            files_with_matches=True,
+        )
+        self.assertEqual(status, 0)
+        self.assertEqual(errors, '')
+        self.assertEqual(output, 'hound-0\trepo1:a.py\nhound-1\trepo2:b.py\nhound-1\trepo2:c.py\n')
+
+    def test_failures_are_isolated(self):
+        def fail():
+            raise hound.HoundError("Could not connect to Hound server: timeout.")
+
+        def slow():
+            time.sleep(2)
+            return get_results('repo3', 'd.py')
+
+        start = time.monotonic()
+        status, output, errors = self._run(
+            [fail, slow, lambda: get_results('repo2', 'b.py')],
+            files_with_matches=True, shard_timeout=0.2,
+        )
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(status, 1)
+        self.assertEqual(output, 'hound-2\trepo2:b.py\n')
+        self.assertEqual(errors, (
+            "pyhound: warning: hound-0: Could not connect to Hound server: timeout.\n"
+            "pyhound: warning: hound-1: no response after 0.2 seconds\n"
+        ))
+
+    def test_no_repository_on_a_server(self):
+        client = federation.FederatedClient(['http://hound-0', 'http://hound-1'], pattern='match', repos='billing-*')
+        client.clients[0].get_all_repos = lambda: ['billing-api']
+        client.clients[0].fetch_search_results = lambda: get_results('billing-api', 'a.py')
+        client.clients[1].get_all_repos = lambda: ['crm']
+        stdout = io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+        with mock.patch('sys.stdout', stdout):
+            self.assertEqual(client.run(), 0)
+        self.assertEqual(stdout.buffer.getvalue(), b'hound-0\tbilling-api:a.py:match\n')
+
+    def test_max_count_applies_to_all_servers(self):
+        _, output, _ = self._run(
+            [lambda: get_results('repo1', 'a.py'), lambda: get_results('repo2', 'b.py', 'c.py')],
+            max_count=2,
+        )
+        self.assertEqual(output, 'hound-0\trepo1:a.py:match\nhound-1\trepo2:b.py:match\n')
@@ -0,0 +1,86 @@
+import time
+from unittest import TestCase
+from unittest import mock
+
+from pyhound import highlight
+
+
+def get_python_highlighter(pattern, ignore_case=False):
+    """Return a highlighter that does not use RE2, even if it is
+    installed.
+    """
+    with mock.patch.object(highlight, '_compile_re2', return_value=None):
+        return highlight.Highlighter(pattern, ignore_case)
+
+
+class TestTranslateGoRegexp(TestCase):
+
+    def test_translate(self):
+        translate = highlight.translate_go_regexp
+        self.assertEqual(translate(r'foo\z'), r'foo\Z')
+        self.assertEqual(translate(r'\Qa.b\E+'), r'a\.b+')
+        self.assertEqual(translate(r'[[:digit:]_]+'), r'[0-9_]+')
+        self.assertEqual(translate(r'[^[:space:]\]]'), r'[^\t\n\v\f\r \]]')
+        self.assertEqual(translate(r'\[[:x:]'), r'\[[:x:]')
+
+    def test_has_nested_quantifiers(self):
+        self.assertTrue(highlight.has_nested_quantifiers('(a+)+b'))
+        self.assertTrue(highlight.has_nested_quantifiers('(?:x(a*)?)*$'))
+        self.assertTrue(highlight.has_nested_quantifiers('(a{2,})*'))
+        self.assertFalse(highlight.has_nested_quantifiers('(ab)+c*'))
+        self.assertFalse(highlight.has_nested_quantifiers('(a+)?'))
+        self.assertFalse(highlight.has_nested_quantifiers(r'([+*])+\(x*\)+'))
+        self.assertTrue(highlight.has_nested_quantifiers('(a|aa)+$'))
+        self.assertTrue(highlight.has_nested_quantifiers('x((a|b))*'))
+        self.assertFalse(highlight.has_nested_quantifiers('(foo|bar)?baz'))
+
+    def test_count_unbounded_wildcards(self):
+        count = highlight.count_unbounded_wildcards
+        self.assertEqual(count('.*.*.*.*='), 4)
+        self.assertEqual(count(r'a.+b\S*[^,]{2,}'), 3)
+        self.assertEqual(count(r'\.*[.]+.?.{1,3}\w+'), 0)
+
+
+class TestHighlighter(TestCase):
+
+    def test_literal(self):
+        highlighter = highlight.Highlighter('aa', ignore_case=True)
+        self.assertEqual(highlighter.spans('AAaaa b aA'), [(0, 2), (2, 4), (8, 10)])
+        self.assertEqual(highlighter.highlight('x aA y', '<%s>'), 'x <aA> y')
+
+    def test_regexp(self):
+        highlighter = get_python_highlighter('fo+|x*')
+        self.assertEqual(highlighter.spans('a foo fo'), [(2, 5), (6, 8)])
+        self.assertEqual(highlighter.highlight('a foo fo', '<%s>'), 'a <foo> <fo>')
+
+    def test_go_syntax(self):
+        highlighter = get_python_highlighter(r'[[:upper:]]+\z')
+        self.assertEqual(highlighter.spans('abc DEF'), [(4, 7)])
+
+    def test_invalid(self):
+        # Python does not know Unicode classes.
+        highlighter = get_python_highlighter(r'\pL+')
+        self.assertEqual(highlighter.highlight('abc', '<%s>'), 'abc')
+
+    def test_pathological(self):
+        # Each of these would take minutes (or more) with Python
+        # regular expressions: they are not highlighted.
+        for pattern, line in (
+                ('(a+)+b', 'a' * 100),
+                ('(a|aa)+$', 'a' * 34 + '! aa'),
+                ('(a|a)*c', 'a' * 28),
+                ('(a|aa)*c', 'a' * 60),
+                ('.*.*.*.*=', 'x' * 1990),
+                ('.*.*.*.*=x', 'x' * 1500),
+        ):
+            highlighter = get_python_highlighter(pattern)
+            start = time.time()
+            self.assertEqual(highlighter.highlight(line, '<%s>'), line)
+            self.assertLess(time.time() - start, 1, pattern)
+
+    def test_single_wildcard(self):
+        highlighter = get_python_highlighter('.*=')
+        start = time.time()
+        self.assertEqual(highlighter.spans('x' * 1990), [])
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(highlighter.spans('a = 1'), [(0, 3)])
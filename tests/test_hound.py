@@ -1,5 +1,9 @@
+import io
 import re
+import shutil
+import tempfile
 from unittest import TestCase
+from unittest import mock
 
 from pyhound import hound
 
@@ -66,6 +70,10 @@ class TestGetLinesWithContext(TestCase):
              (5, hound.LINE_KIND_CONTEXT, "Line 5")]
         )
 
+    def test_no_lines_from_hound(self):
+        res = list(hound.get_lines_with_context("line", 3, None, None, requested_context=3))
+        self.assertEqual(res, [(3, hound.LINE_KIND_MATCH, "line")])
+
     def test_context_basics(self):
         res = list(
             hound.get_lines_with_context(
@@ -138,6 +146,20 @@ class TestGetLinesWithContext(TestCase):
         )
 
 
+class TestGetContextSize(TestCase):
+
+    def _get_context_size(self, **kwargs):
+        return hound.Client('http://hound', 'foo', **kwargs).get_context_size()
+
+    def test_context_size(self):
+        self.assertEqual(self._get_context_size(), 0)
+        self.assertEqual(self._get_context_size(before_context=3, after_context=1), 3)
+        self.assertEqual(self._get_context_size(after_context=2), 2)
+        self.assertEqual(self._get_context_size(context=1), 0)
+        self.assertEqual(self._get_context_size(context=5), 4)
+        self.assertEqual(self._get_context_size(context=50), hound.MAX_CONTEXT)
+
+
 class TestMergeLines(TestCase):
     """Test ``merge_lines()``."""
 
@@ -163,6 +185,24 @@ class TestMergeLines(TestCase):
              ('', '', 4, hound.LINE_KIND_MATCH, "The second match")]
         )
 
+    def test_streaming(self):
+        consumed = []
+
+        def get_lines():
+            for line_number, line_kind in ((1, 1), (2, 2), (3, 2), (2, 2), (3, 1), (4, 2), (9, 2), (10, 1)):
+                consumed.append(line_number)
+                yield ('', '', line_number, line_kind, "Line %d" % line_number)
+
+        merged = hound.merge_lines(get_lines(), max_before=1)
+        self.assertEqual(next(merged)[2:4], (1, hound.LINE_KIND_MATCH))
+        # Lines are yielded before everything has been consumed.
+        self.assertEqual(consumed, [1, 2, 3, 2, 3])
+        self.assertEqual(
+            [line[2:4] for line in merged],
+            [(2, hound.LINE_KIND_CONTEXT), (3, hound.LINE_KIND_MATCH), (4, hound.LINE_KIND_CONTEXT),
+             (9, hound.LINE_KIND_CONTEXT), (10, hound.LINE_KIND_MATCH)]
+        )
+
 
 class TestColorizeMatch(TestCase):
     """Test ``colorize_match()``."""
@@ -196,3 +236,289 @@ class TestColorizeMatch(TestCase):
         pattern = re.compile("jón", re.IGNORECASE)
         colorized = hound.colorize_match(line, pattern, '[%s]')
         self.assertEqual(colorized, "I am [Jón].")
+
+
+class FakeShardClient(hound.Client):
+    """A client that searches a fake index instead of calling Hound.
+
+    Hound refuses to return more than ``limit`` files at once.
+    """
+
+    def __init__(self, index, limit, **kwargs):
+        super().__init__('http://localhost:6080', 'pattern', **kwargs)
+        self.index = index
+        self.limit = limit
+        self.revisions = {}
+        self.payloads = []
+
+    def get_all_repos(self):
+        return sorted(self.index)
+
+    def _search(self, payload):
+        self.payloads.append(payload)
+        if payload['repos'] == '*':
+            repos = self.get_all_repos()
+        else:
+            repos = payload['repos'].split(',')
+        results = {}
+        n_files = 0
+        for repo in repos:
+            filenames = self.index[repo]
+            if payload['files']:
+                filenames = [f for f in filenames if re.search(payload['files'], f)]
+            if payload['rng']:
+                offset, limit = (int(v) for v in payload['rng'].split(':'))
+                selected = filenames[offset:offset + limit]
+            else:
+                selected = filenames
+            n_files += len(selected)
+            if selected:
+                results[repo] = {
+                    'Revision': self.revisions.get(repo, 'rev1'),
+                    'FilesWithMatch': len(filenames),
+                    'Matches': [{'Filename': filename, 'Matches': []} for filename in selected],
+                }
+        if n_files > self.limit:
+            raise hound.HoundServerError('too many results')
+        return results
+
+
+class TestSearchShards(TestCase):
+    """Test how ``Client`` splits searches that return too many results."""
+
+    index = {
+        'repo1': ['file%d' % i for i in range(7)],
+        'repo2': [],
+        'repo3': ['file%d' % i for i in range(3)],
+    }
+
+    def _get_files(self, results):
+        return [
+            (repo, match['Filename'])
+            for repo, result in results.items()
+            for match in result['Matches']
+        ]
+
+    def test_single_request(self):
+        client = FakeShardClient(self.index, limit=10)
+        results = client.fetch_search_results()
+        self.assertEqual(len(self._get_files(results)), 10)
+
+    def test_too_many_results(self):
+        expected = [('repo1', 'file%d' % i) for i in range(7)] + [('repo3', 'file%d' % i) for i in range(3)]
+        for limit in (1, 2, 5):
+            client = FakeShardClient(self.index, limit=limit)
+            results = client.fetch_search_results()
+            self.assertEqual(self._get_files(results), expected)
+
+    def test_streamed_too_many_results(self):
+        client = FakeShardClient(self.index, limit=5)
+        client._iter_streamed_search = lambda payload: iter(hound.iter_result_files(client._search(payload)))
+        files = [(repo, filename) for repo, filename, _ in client.iter_search_files()]
+        self.assertEqual(
+            files,
+            [('repo1', 'file%d' % i) for i in range(7)] + [('repo3', 'file%d' % i) for i in range(3)]
+        )
+        # The whole search is only sent once.
+        self.assertEqual([p['repos'] for p in client.payloads].count('*'), 1)
+
+    def test_page_size(self):
+        client = FakeShardClient(self.index, limit=10, page_size=2, repos='repo3,repo1')
+        results = client.fetch_search_results()
+        self.assertEqual(
+            self._get_files(results),
+            [('repo1', 'file%d' % i) for i in range(7)] + [('repo3', 'file%d' % i) for i in range(3)]
+        )
+
+    def test_other_errors_are_not_hidden(self):
+        def _search(payload):
+            raise hound.HoundServerError('boom')
+
+        client = FakeShardClient(self.index, limit=10)
+        client._search = _search
+        with self.assertRaises(hound.HoundServerError):
+            client.fetch_search_results()
+
+
+class TestOutputModes(TestCase):
+    """Test ``-l``, ``-c`` and ``-m``."""
+
+    def _run(self, **kwargs):
+        def match(line_number):
+            return {'Line': 'line', 'LineNumber': line_number, 'Before': None, 'After': None}
+
+        read = []
+
+        def iter_search_files():
+            for repo, filename, n_matches in (('repo1', 'a.py', 2), ('repo1', 'b.py', 3), ('repo2', 'c.py', 1)):
+                read.append(filename)
+                yield repo, filename, [match(i) for i in range(1, n_matches + 1)]
+
+        client = hound.Client('http://localhost:6080', 'pattern', show_line_number=True, **kwargs)
+        client.iter_search_files = iter_search_files
+        stdout = io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+        with mock.patch('sys.stdout', stdout):
+            client.run()
+        return stdout.buffer.getvalue().decode('utf-8'), read
+
+    def test_files_with_matches(self):
+        output, _ = self._run(files_with_matches=True)
+        self.assertEqual(output, 'repo1:a.py\nrepo1:b.py\nrepo2:c.py\n')
+
+    def test_count(self):
+        output, _ = self._run(count=True)
+        self.assertEqual(output, 'repo1:a.py:2\nrepo1:b.py:3\nrepo2:c.py:1\n')
+
+    def test_max_count(self):
+        output, read = self._run(max_count=3)
+        self.assertEqual(output, 'repo1:a.py:1:line\nrepo1:a.py:2:line\nrepo1:b.py:1:line\n')
+        # We stop reading results as soon as we have enough matches.
+        self.assertEqual(read, ['a.py', 'b.py'])
+        output, _ = self._run(max_count=4, count=True)
+        self.assertEqual(output, 'repo1:a.py:2\nrepo1:b.py:2\n')
+
+    def test_stats_hook(self):
+        reported = []
+        output, _ = self._run(stats_hook=reported.append)
+        self.assertEqual(len(reported), 1)
+        self.assertEqual(reported[0].as_dict()['lines'], len(output.splitlines()))
+
+
+class TestSearch(TestCase):
+    """Test ``Client.search()``."""
+
+    def test_search(self):
+        def iter_search_files():
+            yield 'repo1', 'a.py', [
+                {'Line': 'match 2', 'LineNumber': 2, 'Before': ['line 1'], 'After': ['match 3']},
+                {'Line': 'match 3', 'LineNumber': 3, 'Before': ['match 2'], 'After': None},
+            ]
+            yield 'repo2', 'b.py', [{'Line': 'x' * 100, 'LineNumber': 1, 'Before': None, 'After': None}]
+            yield 'repo2', 'c.py', [{'Line': 'match', 'LineNumber': 7, 'Before': None, 'After': None}]
+
+        client = hound.Client('http://localhost:6080', 'match', before_context=1, line_max_length=50)
+        client.iter_search_files = iter_search_files
+        with mock.patch('sys.stdout', io.StringIO()) as stdout:
+            results = list(client.search())
+        self.assertEqual(stdout.getvalue(), '')
+        # Lines of b.py are too long.
+        self.assertEqual([(r.repo, r.filename) for r in results], [('repo1', 'a.py'), ('repo2', 'c.py')])
+        self.assertEqual(list(results[0].line_numbers), [1, 2, 3])
+        self.assertEqual(results[0].match_count, 2)
+        self.assertEqual(
+            [(line.line_number, line.is_match, line.line) for line in results[0]],
+            [(1, False, 'line 1'), (2, True, 'match 2'), (3, True, 'match 3')]
+        )
+
+    def test_max_count(self):
+        def iter_search_files():
+            for filename in ('a.py', 'b.py', 'c.py'):
+                yield 'repo', filename, [
+                    {'Line': 'match', 'LineNumber': i, 'Before': None, 'After': None} for i in (1, 2)
+                ]
+
+        client = hound.Client('http://localhost:6080', 'match', max_count=3)
+        client.iter_search_files = iter_search_files
+        results = list(client.search())
+        self.assertEqual([(r.filename, r.match_count) for r in results], [('a.py', 2), ('b.py', 1)])
+
+
+class TestIterRepoResults(TestCase):
+    """Test ``Client.iter_repo_results()``."""
+
+    index = TestSearchShards.index
+
+    def test_repository_order(self):
+        client = FakeShardClient(self.index, limit=2, fan_out=True, repos='repo3,repo2,repo1')
+        results = list(client.iter_repo_results())
+        self.assertEqual([repo for repo, _ in results], ['repo1', 'repo3'])
+        self.assertEqual(len(results[0][1]['Matches']), 7)
+
+    def test_completion_order(self):
+        client = FakeShardClient(self.index, limit=2, fan_out=True, output_order=hound.OUTPUT_ORDER_COMPLETION)
+        results = dict(client.iter_repo_results())
+        self.assertEqual(sorted(results), ['repo1', 'repo3'])
+        self.assertEqual(len(results['repo1']['Matches']), 7)
+
+
+class TestResultCache(TestCase):
+    """Test searches with the local cache of results."""
+
+    index = TestSearchShards.index
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def _search(self, **kwargs):
+        client = FakeShardClient(self.index, limit=100, cache=True, cache_dir=self.cache_dir, **kwargs)
+        results = client.fetch_search_results()
+        return results, client.payloads
+
+    def test_unchanged_repositories_are_not_searched_again(self):
+        expected, payloads = self._search()
+        self.assertEqual(len(payloads), 1)
+        results, payloads = self._search()
+        self.assertEqual(results, expected)
+        # A probe, restricted to a single file per repository, and a
+        # search in the repository that had no match.
+        self.assertEqual(len(payloads), 2)
+        self.assertEqual(payloads[0]['repos'], 'repo1,repo3')
+        self.assertEqual(payloads[0]['files'], '^(?:file0)$')
+        self.assertEqual(payloads[1]['repos'], 'repo2')
+
+    def test_changed_repositories_are_searched_again(self):
+        expected, _ = self._search()
+        client = FakeShardClient(self.index, limit=100, cache=True, cache_dir=self.cache_dir)
+        client.revisions = {'repo1': 'rev2'}
+        client.get_all_repos = lambda: ['repo1', 'repo2', 'repo3']
+        results = client.fetch_search_results()
+        self.assertEqual(list(results), ['repo1', 'repo3'])
+        self.assertEqual(results['repo1']['Revision'], 'rev2')
+        self.assertEqual(results['repo3'], expected['repo3'])
+        self.assertEqual([p['repos'] for p in client.payloads], ['repo1,repo3', 'repo1,repo2'])
+
+    def test_requested_repositories(self):
+        self._search()
+        results, payloads = self._search(repos='repo3')
+        self.assertEqual(list(results), ['repo3'])
+        self.assertEqual([p['repos'] for p in payloads], ['repo3'])
+
+
+class TestGetRepoList(TestCase):
+    """Test ``Client.get_repo_list()``."""
+
+    index = {
+        'billing-api': [],
+        'billing-front': [],
+        'catalog': [],
+        'search': [],
+    }
+
+    def _get_repo_list(self, repos, exclude_repos=None):
+        client = FakeShardClient(self.index, limit=100)
+        return client.get_repo_list(repos, exclude_repos)
+
+    def test_names(self):
+        self.assertEqual(self._get_repo_list('*'), '*')
+        self.assertEqual(self._get_repo_list('search,catalog'), 'search,catalog')
+        self.assertEqual(self._get_repo_list('search,catalog', 'catalog'), 'search')
+        self.assertEqual(self._get_repo_list('*', 'catalog,search'), 'billing-api,billing-front')
+
+    def test_patterns(self):
+        self.assertEqual(self._get_repo_list('billing-*'), 'billing-api,billing-front')
+        self.assertEqual(self._get_repo_list('re:^b,search'), 'billing-api,billing-front,search')
+        self.assertEqual(self._get_repo_list('*', 're:front$,cat*'), 'billing-api,search')
+        # Glob patterns must match the whole name.
+        self.assertEqual(self._get_repo_list('*', 'front'), 'billing-api,billing-front,catalog,search')
+
+    def test_no_repository(self):
+        with self.assertRaises(hound.HoundError):
+            self._get_repo_list('unknown-*')
+
+    def test_invalid_pattern(self):
+        with self.assertRaises(hound.HoundError) as context:
+            self._get_repo_list('re:billing-(')
+        self.assertTrue(str(context.exception).startswith("Invalid repository pattern: re:billing-("))
@@ -0,0 +1,101 @@
+import io
+import json
+from unittest import TestCase
+
+from pyhound import jsonstream
+
+
+class TrickleFile:
+    """A file-like object that returns a single byte at a time."""
+
+    def __init__(self, data):
+        self.fp = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self.fp.read(1)
+
+
+class ChunkFile:
+    """A file-like object that returns 1000 bytes at a time."""
+
+    def __init__(self, data):
+        self.fp = io.BytesIO(data)
+
+    def read(self, size=-1):
+        return self.fp.read(1000)
+
+
+RESPONSE = {
+    'Results': {
+        'repo1': {
+            'Matches': [
+                {
+                    'Filename': 'a/file.py',
+                    'Matches': [
+                        {'Line': 'The "match" {with} [brackets] \\ and Jón', 'LineNumber': 3,
+                         'Before': ['Line 1', 'Line 2'], 'After': None},
+                    ],
+                },
+                {
+                    'Filename': 'b/file.py',
+                    'Matches': [],
+                },
+            ],
+            'FilesWithMatch': 2,
+            'Revision': 'abc',
+        },
+        'repo2': {
+            'Matches': None,
+            'FilesWithMatch': 0,
+        },
+    },
+    'Stats': {'FilesOpened': 12, 'Duration': 3},
+}
+
+
+class TestIterSearchResponse(TestCase):
+    """Test ``iter_search_response()``."""
+
+    def _decode(self, fp):
+        meta = {}
+        files = list(jsonstream.iter_search_response(fp, meta))
+        return files, meta
+
+    def test_basics(self):
+        for fp in (io.BytesIO(json.dumps(RESPONSE).encode('utf-8')),
+                   TrickleFile(json.dumps(RESPONSE, indent=2, ensure_ascii=False).encode('utf-8'))):
+            files, meta = self._decode(fp)
+            self.assertEqual(
+                files,
+                [('repo1', 'a/file.py', RESPONSE['Results']['repo1']['Matches'][0]['Matches']),
+                 ('repo1', 'b/file.py', [])]
+            )
+            self.assertEqual(meta['Stats'], RESPONSE['Stats'])
+            self.assertEqual(meta['Results']['repo1'], {'FilesWithMatch': 2, 'Revision': 'abc'})
+            self.assertEqual(meta['Results']['repo2'], {'FilesWithMatch': 0})
+
+    def test_large_file(self):
+        matches = [
+            {'Line': 'line \\ "%d" ' % i + 'x' * 100, 'LineNumber': i, 'Before': None, 'After': None}
+            for i in range(20000)
+        ]
+        response = {'Results': {'repo': {'Matches': [{'Filename': 'big.json', 'Matches': matches}]}}}
+        # The matches of the file are read in thousands of chunks.
+        files, _ = self._decode(ChunkFile(json.dumps(response).encode('utf-8')))
+        self.assertEqual(files, [('repo', 'big.json', matches)])
+
+    def test_error(self):
+        files, meta = self._decode(io.BytesIO(b'{"Error": "too many results"}'))
+        self.assertEqual(files, [])
+        self.assertEqual(meta['Error'], "too many results")
+
+    def test_invalid_json(self):
+        meta = {}
+        with self.assertRaises(ValueError):
+            list(jsonstream.iter_search_response(io.BytesIO(b'<html>Bad gateway</html>'), meta))
+        self.assertEqual(meta['Excerpt'], '<html>Bad gateway</html>')
+
+    def test_truncated_json(self):
+        data = json.dumps(RESPONSE).encode('utf-8')[:-20]
+        with self.assertRaises(ValueError):
+            list(jsonstream.iter_search_response(io.BytesIO(data), {}))
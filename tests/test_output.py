@@ -0,0 +1,76 @@
+import io
+from unittest import TestCase
+
+from pyhound import output
+from pyhound.highlight import Highlighter
+
+
+LINES = [
+    ('repo', 'a%s.py', 9, output.LINE_KIND_CONTEXT, 'before'),
+    ('repo', 'a%s.py', 10, output.LINE_KIND_MATCH, 'foo = 1'),
+    ('repo', 'b.py', 3, output.LINE_KIND_MATCH, 'x = foo(foo)'),
+]
+
+
+class TestLineFormatter(TestCase):
+
+    def test_plain(self):
+        formatter = output.LineFormatter(Highlighter('foo'), show_line_number=True, prefix='q\t')
+        self.assertEqual(
+            list(formatter.format_lines(LINES)),
+            [
+                'q\trepo:a%s.py-9-before\n',
+                'q\trepo:a%s.py:10:foo = 1\n',
+                'q\trepo:b.py:3:x = foo(foo)\n',
+            ]
+        )
+
+    def test_color(self):
+        formatter = output.LineFormatter(Highlighter('foo'), color=True)
+        formatted = list(formatter.format_lines(LINES[2:]))
+        self.assertEqual(
+            formatted,
+            [
+                output.COLOR_REPO % 'repo' + ':' + output.COLOR_FILENAME % 'b.py' +
+                output.COLOR_DELIMITER % ':' +
+                'x = %s(%s)\n' % (output.COLOR_MATCH % 'foo', output.COLOR_MATCH % 'foo'),
+            ]
+        )
+
+    def test_group_separator(self):
+        formatter = output.LineFormatter(group_separator=True)
+        lines = LINES + [('repo', 'b.py', 4, output.LINE_KIND_CONTEXT, 'y')]
+        self.assertEqual(
+            ''.join(formatter.format_lines(lines)),
+            'repo:a%s.py-before\n'
+            'repo:a%s.py:foo = 1\n'
+            '--\n'
+            'repo:b.py:x = foo(foo)\n'
+            'repo:b.py-y\n'
+        )
+        # Groups are also separated between calls.
+        self.assertEqual(
+            list(formatter.format_lines(LINES[:1])),
+            ['--\n', 'repo:a%s.py-before\n']
+        )
+
+
+class TestOutputWriter(TestCase):
+
+    def test_write(self):
+        stream = io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+        writer = output.OutputWriter(stream, buffer_size=10)
+        writer.write('héhé\n')
+        self.assertEqual(stream.buffer.getvalue(), b'')
+        writer.writelines(['0123456789\n', 'end\n'])
+        self.assertEqual(stream.buffer.getvalue(), 'héhé\n0123456789\n'.encode('utf-8'))
+        writer.flush()
+        self.assertEqual(stream.buffer.getvalue(), 'héhé\n0123456789\nend\n'.encode('utf-8'))
+
+    def test_text_stream(self):
+        stream = io.StringIO()
+        stream.write('first\n')
+        writer = output.OutputWriter(stream)
+        writer.write('second\n')
+        writer.flush()
+        self.assertEqual(stream.getvalue(), 'first\nsecond\n')
@@ -0,0 +1,32 @@
+from unittest import TestCase
+
+from pyhound import results
+from pyhound.output import LINE_KIND_CONTEXT
+from pyhound.output import LINE_KIND_MATCH
+
+
+class TestFileResult(TestCase):
+    """Test ``FileResult``."""
+
+    def test_lines(self):
+        result = results.FileResult('repo', 'dir/file.py')
+        result.add_line(1, LINE_KIND_CONTEXT, 'before')
+        result.add_line(2, LINE_KIND_MATCH, 'match')
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result.match_count, 1)
+        self.assertEqual(
+            list(result),
+            [('repo', 'dir/file.py', 1, LINE_KIND_CONTEXT, 'before'),
+             ('repo', 'dir/file.py', 2, LINE_KIND_MATCH, 'match')]
+        )
+        self.assertTrue(list(result)[1].is_match)
+
+    def test_names_are_interned(self):
+        first = results.FileResult(''.join(['re', 'po']), ''.join(['file', '.py']))
+        second = results.FileResult(''.join(['rep', 'o']), ''.join(['fil', 'e.py']))
+        self.assertIs(first.repo, second.repo)
+        self.assertIs(first.filename, second.filename)
+
+    def test_no_instance_dict(self):
+        with self.assertRaises(AttributeError):
+            results.FileResult('repo', 'file.py').extra = 1
@@ -0,0 +1,119 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+from pyhound import hound
+from pyhound import server
+
+
+class FakeClient:
+    """A client that returns a single file, once allowed to."""
+
+    pattern = 'match'
+    ignore_case = False
+
+    def __init__(self, go):
+        self.go = go
+        self.aborted = False
+
+    def abort(self):
+        # Like reading a response that is aborted.
+        self.aborted = True
+        self.go.set()
+
+    def iter_search_files(self):
+        self.go.wait(5)
+        if self.aborted:
+            raise hound.HoundError("Could not read response from Hound server: The transfer has been aborted.")
+        yield 'repo', 'file.py', [{'Line': 'The match', 'LineNumber': 3, 'Before': [], 'After': []}]
+
+    def get_file_lines(self, files):
+        for repo, filename, matches in files:
+            for match in matches:
+                yield repo, filename, match['LineNumber'], hound.LINE_KIND_MATCH, match['Line']
+
+
+class FakeSearchServer:
+
+    def __init__(self):
+        self.go = {}
+
+    def get_client(self, request):
+        return FakeClient(self.go.setdefault(request['id'], threading.Event()))
+
+
+class TestSession(TestCase):
+    """Test ``Session``."""
+
+    def setUp(self):
+        self.output = io.StringIO()
+        self.search_server = FakeSearchServer()
+        self.session = server.Session(self.search_server, self.output)
+
+    def _get_responses(self):
+        return [json.loads(line) for line in self.output.getvalue().splitlines()]
+
+    def test_search(self):
+        self.search_server.go[1] = threading.Event()
+        self.search_server.go[1].set()
+        self.session.handle('{"id": 1, "pattern": "match"}')
+        self.session.wait()
+        self.assertEqual(
+            self._get_responses(),
+            [{'id': 1, 'repo': 'repo', 'filename': 'file.py', 'line_number': 3,
+              'match': True, 'line': 'The match', 'spans': [[4, 9]]},
+             {'id': 1, 'done': True}]
+        )
+
+    def test_new_search_cancels_search_in_progress(self):
+        self.search_server.go[1] = threading.Event()
+        self.search_server.go[2] = threading.Event()
+        self.session.handle('{"id": 1, "pattern": "match"}')
+        self.session.handle('{"id": 2, "pattern": "match"}')
+        self.search_server.go[1].set()
+        self.search_server.go[2].set()
+        self.session.wait()
+        responses = self._get_responses()
+        self.assertEqual([r for r in responses if r['id'] == 1], [{'id': 1, 'cancelled': True}])
+        responses = [r for r in responses if r['id'] == 2]
+        self.assertEqual(len(responses), 2)
+        self.assertEqual(responses[-1], {'id': 2, 'done': True})
+
+    def test_cancel_aborts_response(self):
+        self.session.handle('{"id": 1, "pattern": "match"}')
+        self.session.handle('{"cancel": 1}')
+        # The search stops without waiting for Hound.
+        self.session.threads[0].join(1)
+        self.assertFalse(self.session.threads[0].is_alive())
+        self.assertEqual(self._get_responses(), [{'id': 1, 'cancelled': True}])
+
+    def test_invalid_request(self):
+        self.session.handle('{"id": 1}')
+        self.session.handle('not json')
+        self.assertEqual(
+            self._get_responses(),
+            [{'error': 'Invalid request: {"id": 1}'}, {'error': 'Invalid request: not json'}]
+        )
+
+
+class TestServe(TestCase):
+    """Test ``serve()``."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_other_files_are_not_removed(self):
+        path = os.path.join(self.directory, 'notes.txt')
+        with open(path, 'w') as fp:
+            fp.write("Do not remove me.\n")
+        with self.assertRaises(SystemExit) as context:
+            server.serve(socket_path=path, endpoint='http://localhost:6080')
+        self.assertEqual(str(context.exception), "%s exists and is not a socket." % path)
+        self.assertTrue(os.path.exists(path))
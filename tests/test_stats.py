@@ -0,0 +1,78 @@
+import json
+from unittest import TestCase
+from unittest import mock
+
+from pyhound import stats
+
+
+class FakeClock:
+    """A clock that only advances when we sleep."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def perf_counter(self):
+        return self.now
+
+    def sleep(self, duration):
+        self.now += duration
+
+
+class TestSearchStats(TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('time.perf_counter', self.clock.perf_counter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_nested_phases(self):
+        search_stats = stats.SearchStats('foo')
+        with search_stats.phase(stats.PHASE_DECODE):
+            self.clock.sleep(0.01)
+            with search_stats.phase(stats.PHASE_DOWNLOAD):
+                self.clock.sleep(0.02)
+            with search_stats.phase(stats.PHASE_IDLE):
+                self.clock.sleep(0.02)
+        self.assertAlmostEqual(search_stats.durations[stats.PHASE_DOWNLOAD], 0.02)
+        self.assertAlmostEqual(search_stats.durations[stats.PHASE_DECODE], 0.01)
+        self.assertNotIn(stats.PHASE_IDLE, search_stats.durations)
+
+    def test_iter_timed(self):
+        search_stats = stats.SearchStats('foo')
+
+        def produce():
+            for i in range(3):
+                self.clock.sleep(0.01)
+                yield i
+
+        consumed = []
+        for item in search_stats.iter_timed(stats.PHASE_CONTEXT, produce()):
+            consumed.append(item)
+            # The time spent by the consumer is not counted.
+            self.clock.sleep(0.02)
+        self.assertEqual(consumed, [0, 1, 2])
+        self.assertEqual(search_stats.counts[stats.PHASE_CONTEXT], 3)
+        self.assertAlmostEqual(search_stats.durations[stats.PHASE_CONTEXT], 0.03)
+
+    def test_report(self):
+        search_stats = stats.SearchStats('foo')
+        search_stats.add_request()
+        search_stats.add_bytes(2048)
+        search_stats.add_server_stats({'FilesOpened': 12, 'Duration': 30})
+        search_stats.add_server_stats({'FilesOpened': 3, 'Duration': 5})
+        search_stats.add_server_stats(None)
+        search_stats.stop()
+        report = search_stats.as_dict()
+        json.dumps(report)
+        self.assertEqual(report['pattern'], 'foo')
+        self.assertEqual(report['requests'], 1)
+        self.assertEqual(report['bytes_received'], 2048)
+        self.assertEqual(report['server'], {'files_opened': 15, 'duration': 35.0})
+        self.assertEqual(sorted(report['phases']), sorted(stats.PHASES))
+        self.assertIsNotNone(report['total'])
+        text = search_stats.format()
+        self.assertIn("1 (2.0 KB received)", text)
+        search_stats.add_retry()
+        self.assertIn("1 (2.0 KB received, 1 retried)", search_stats.format())
+        self.assertIn("15 files opened in 35.0 ms", text)
@@ -0,0 +1,115 @@
+import io
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest import mock
+
+from pyhound import hound
+from pyhound import store
+
+
+def _match(line_number, line, before=None, after=None):
+    return {'LineNumber': line_number, 'Line': line, 'Before': before, 'After': after}
+
+
+FILES = [
+    ('billing', 'src/invoice.py', [
+        _match(3, 'import old_client', ['"""Invoices."""', ''], ['', '    old_client.connect()']),
+        _match(5, '    old_client.connect()', ['import old_client', ''], ['    return 1']),
+    ]),
+    ('billing', 'tests/test_invoice.py', [_match(1, 'from old_client import mock', None, ['x' * 200])]),
+    ('shop', 'shop/cart.py', [_match(10, 'old_client.get("cart")', ['# cart'], None)]),
+]
+
+
+def _run(client):
+    stdout = io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+    with mock.patch('sys.stdout', stdout):
+        client.run()
+    return stdout.buffer.getvalue().decode('utf-8')
+
+
+class TestStore(TestCase):
+    """Test ``SavingClient`` and ``StoreClient``."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'results.db')
+        client = store.SavingClient('http://localhost:6080', 'old_client', store_path=self.path)
+        client.iter_search_files = lambda: iter(FILES)
+        self.output = _run(client)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _search(self, pattern=None, **options):
+        return _run(store.StoreClient(self.path, pattern, **options)).splitlines()
+
+    def test_save(self):
+        # The search is printed as usual.
+        self.assertEqual(self.output.count('\n'), 4)
+        self.assertEqual(os.listdir(self.tmp_dir), ['results.db'])
+        client = store.SavingClient('http://localhost:6080', 'old_client', store_path=self.path)
+        self.assertEqual(client.get_context_size(), hound.MAX_CONTEXT)
+
+    def test_all_saved_matches(self):
+        self.assertEqual(self._search(), self.output.splitlines())
+        self.assertEqual(len(list(store.StoreClient(self.path).search())), 3)
+
+    def test_sub_pattern(self):
+        self.assertEqual(self._search(r'\.connect'), ['billing:src/invoice.py:    old_client.connect()'])
+        self.assertEqual(self._search('CART'), [])
+        self.assertEqual(self._search('CART', ignore_case=True), ['shop:shop/cart.py:old_client.get("cart")'])
+
+    def test_repos_and_path(self):
+        self.assertEqual(self._search(repos='sh*'), ['shop:shop/cart.py:old_client.get("cart")'])
+        self.assertEqual(
+            self._search(exclude_repos='shop', path_pattern='^tests/', files_with_matches=True),
+            ['billing:tests/test_invoice.py'],
+        )
+
+    def test_context(self):
+        self.assertEqual(
+            self._search('connect', before_context=2, show_line_number=True),
+            # The first match has been filtered out, but it is still
+            # a line of context.
+            ['billing:src/invoice.py-3-import old_client',
+             'billing:src/invoice.py-4-',
+             'billing:src/invoice.py:5:    old_client.connect()'],
+        )
+        # Long lines of context are not shown.
+        self.assertEqual(
+            self._search('mock', after_context=1, line_max_length=100),
+            ['billing:tests/test_invoice.py:from old_client import mock'],
+        )
+
+    def test_invalid_regexp(self):
+        with self.assertRaises(SystemExit) as context:
+            self._search('old(')
+        self.assertIn("Invalid regular expression", str(context.exception))
+
+    def test_other_files_are_not_replaced(self):
+        path = os.path.join(self.tmp_dir, 'notes.txt')
+        with open(path, 'w') as fp:
+            fp.write("Do not remove me.\n")
+        client = store.SavingClient('http://localhost:6080', 'old_client', store_path=path)
+        client.iter_search_files = lambda: iter(FILES)
+        with self.assertRaises(SystemExit):
+            _run(client)
+        with open(path) as fp:
+            self.assertEqual(fp.read(), "Do not remove me.\n")
+        with self.assertRaises(store.StoreError):
+            store.StoreClient(path)
+
+    def test_failed_search_keeps_store(self):
+        def iter_search_files():
+            yield FILES[0]
+            raise hound.HoundError("Could not connect to Hound server: timeout.")
+
+        client = store.SavingClient('http://localhost:6080', 'other', store_path=self.path)
+        client.iter_search_files = iter_search_files
+        with self.assertRaises(SystemExit):
+            _run(client)
+        self.assertEqual(os.listdir(self.tmp_dir), ['results.db'])
+        self.assertEqual(len(self._search()), 4)
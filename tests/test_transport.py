@@ -0,0 +1,147 @@
+import gzip
+import http.server
+import socket
+import socketserver
+import threading
+import time
+from unittest import TestCase
+
+from pyhound import transport
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Answer with the path and the port of the client.
+
+    The first request of ``/unavailable`` gets a 503 error, and the
+    first request of ``/slow`` is answered after 1 second. The body of
+    ``/partial`` is sent in two parts, 2 seconds apart.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        with self.server.lock:
+            first = self.path not in self.server.paths
+            self.server.paths.append(self.path)
+        if first and self.path == '/unavailable':
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if first and self.path == '/slow':
+            time.sleep(1)
+        if self.path == '/partial':
+            self.send_response(200)
+            self.send_header('Content-Length', '8')
+            self.end_headers()
+            self.wfile.write(b'1234')
+            self.wfile.flush()
+            time.sleep(2)
+            self.wfile.write(b'5678')
+            return
+        body = ('%s %s' % (self.path, self.client_address[1])).encode('utf-8')
+        self.send_response(200)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.lock = threading.Lock()
+        self.paths = []
+
+
+class TestTransport(TestCase):
+    """Test ``Transport``."""
+
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.transport = transport.Transport(timeout=5)
+
+    def tearDown(self):
+        self.transport.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_compressed_response(self):
+        response = self.transport.get(self.url + '/api/v1/search?q=foo')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertTrue(response.read().startswith(b'/api/v1/search?q=foo '))
+
+    def test_abort(self):
+        response = self.transport.get(self.url + '/partial')
+        self.assertEqual(response.read1(), b'1234')
+        timer = threading.Timer(0.1, response.abort)
+        timer.start()
+        start = time.time()
+        with self.assertRaises(OSError):
+            response.read1()
+        # We did not wait for the rest of the body.
+        self.assertLess(time.time() - start, 1)
+        timer.join()
+
+    def test_connection_is_reused(self):
+        ports = set()
+        for _ in range(3):
+            response = self.transport.get(self.url + '/')
+            ports.add(response.read().split()[1])
+        self.assertEqual(len(ports), 1)
+
+    def test_connection_is_not_reused_if_response_is_not_read(self):
+        ports = set()
+        for _ in range(2):
+            response = self.transport.get(self.url + '/')
+            response.close()
+            ports.add(self.transport.get(self.url + '/').read().split()[1])
+        self.assertEqual(len(ports), 2)
+
+    def test_read_timeout(self):
+        self.transport.timeout = 0.2
+        with self.assertRaises(socket.timeout):
+            self.transport.get(self.url + '/slow')
+
+    def test_retry_unavailable_server(self):
+        self.transport.retries = 1
+        self.transport.backoff = 0.01
+        response = self.transport.get(self.url + '/unavailable')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(self.server.paths, ['/unavailable'] * 2)
+
+    def test_retry_connection_error(self):
+        # Find a port where nobody listens.
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        self.transport.retries = 2
+        self.transport.backoff = 0.01
+        attempts = []
+        self.transport._connect = lambda connection, timeout: attempts.append(1) or connection.connect()
+        with self.assertRaises(ConnectionRefusedError):
+            self.transport.get('http://127.0.0.1:%d/' % port)
+        self.assertEqual(len(attempts), 3)
+
+    def test_hedged_request(self):
+        self.transport.hedge_after = 0.1
+        start = time.monotonic()
+        response = self.transport.get(self.url + '/slow')
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertTrue(response.read().startswith(b'/slow '))
+        self.assertEqual(self.server.paths, ['/slow', '/slow'])
+
+    def test_backoff_delay(self):
+        for attempt in range(1, 10):
+            delay = transport.get_backoff_delay(attempt, backoff=0.5)
+            self.assertTrue(0 <= delay <= min(transport.MAX_BACKOFF, 0.5 * 2 ** (attempt - 1)))
@@ -0,0 +1,127 @@
+import io
+import re
+from unittest import TestCase
+from unittest import mock
+
+from pyhound import hound
+from pyhound import watch
+
+
+class FakeHound:
+    """Answer searches from ``repos``, a dictionary of repositories,
+    each with a revision and a dictionary of files (lists of lines).
+    """
+
+    def __init__(self, repos):
+        self.repos = repos
+        self.queries = []
+
+    def search(self, payload):
+        self.queries.append(payload)
+        repos = sorted(self.repos) if payload['repos'] == '*' else payload['repos'].split(',')
+        files = re.compile(payload['files'])
+        pattern = re.compile(payload['q'])
+        results = {}
+        for repo in repos:
+            file_matches = [
+                {'Filename': filename, 'Matches': [
+                    {'Line': line, 'LineNumber': i, 'Before': [], 'After': []}
+                    for i, line in enumerate(lines, 1)
+                    if pattern.search(line)
+                ]}
+                for filename, lines in sorted(self.repos[repo]['files'].items())
+                if files.search(filename)
+            ]
+            file_matches = [file_match for file_match in file_matches if file_match['Matches']]
+            if payload['rng'] == '0:1':
+                file_matches = file_matches[:1]
+            if file_matches:
+                results[repo] = {'Matches': file_matches, 'Revision': self.repos[repo]['revision']}
+        return results
+
+
+class TestWatcher(TestCase):
+    """Test ``Watcher``."""
+
+    def setUp(self):
+        self.hound = FakeHound({
+            'billing': {'revision': 'b1', 'files': {
+                'invoice.py': ['import old_client', '', 'old_client.connect()'],
+                'README': ['Billing', '=======', ''],
+            }},
+            'shop': {'revision': 's1', 'files': {'cart.py': ['import new_client']}},
+        })
+        client = hound.Client('http://localhost:6080', 'old_client', show_line_number=True, catalogue_ttl=0)
+        client._search = self.hound.search
+        client.get_all_repos = lambda: sorted(self.hound.repos)
+        self.watcher = watch.Watcher(client, 60)
+
+    def _run_cycle(self):
+        self.hound.queries = []
+        stdout = io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+        with mock.patch('sys.stdout', stdout):
+            self.watcher.run_cycle()
+        return stdout.buffer.getvalue().decode('utf-8').splitlines()
+
+    def test_first_cycle(self):
+        self.assertEqual(
+            self._run_cycle(),
+            ['+billing:invoice.py:1:import old_client', '+billing:invoice.py:3:old_client.connect()'],
+        )
+        # Probes are found with a single request, and the pattern is
+        # searched in all repositories at once.
+        self.assertEqual([query['repos'] for query in self.hound.queries], ['billing,shop', '*'])
+        self.assertEqual(
+            self.watcher.probes,
+            {'billing': ('README', 'Billing'), 'shop': ('cart.py', 'import new_client')},
+        )
+
+    def test_nothing_changed(self):
+        self._run_cycle()
+        self.assertEqual(self._run_cycle(), [])
+        # Only probes have been searched.
+        self.assertEqual(len(self.hound.queries), 1)
+        self.assertEqual(self.hound.queries[0]['files'], r'^(?:README|cart\.py)$')
+
+    def test_changed_repository(self):
+        self._run_cycle()
+        self.hound.repos['shop'] = {'revision': 's2', 'files': {'cart.py': ['import new_client', 'old_client.get()']}}
+        self.hound.repos['billing']['files']['invoice.py'] = ['', 'import old_client', '']
+        self.assertEqual(self._run_cycle(), ['+shop:cart.py:2:old_client.get()'])
+        self.assertEqual([query['repos'] for query in self.hound.queries], ['billing,shop', 'shop'])
+
+        self.hound.repos['billing']['revision'] = 'b2'
+        # Lines that have only moved are not reported.
+        self.assertEqual(self._run_cycle(), ['-billing:invoice.py:3:old_client.connect()'])
+
+    def test_lost_probe(self):
+        self._run_cycle()
+        self.hound.repos['billing'] = {'revision': 'b2', 'files': {'invoice.py': ['import old_client']}}
+        self.assertEqual(self._run_cycle(), ['-billing:invoice.py:3:old_client.connect()'])
+        self.assertEqual(self.watcher.probes['billing'], ('invoice.py', 'import old_client'))
+
+    def test_removed_repository(self):
+        self._run_cycle()
+        del self.hound.repos['billing']
+        self.assertEqual(
+            self._run_cycle(),
+            ['-billing:invoice.py:1:import old_client', '-billing:invoice.py:3:old_client.connect()'],
+        )
+        self.assertEqual(self.watcher.fingerprints, {})
+
+    def test_failed_cycle_is_done_again(self):
+        self._run_cycle()
+        self.hound.repos['shop'] = {'revision': 's2', 'files': {'cart.py': ['old_client.get()']}}
+        search = self.hound.search
+
+        def fail(payload):
+            if payload['q'] == 'old_client':
+                raise hound.HoundError("Could not connect to Hound server: timeout.")
+            return search(payload)
+
+        self.watcher.client._search = fail
+        with mock.patch('sys.stderr', io.StringIO()) as stderr, mock.patch('time.sleep'):
+            self.watcher.run(cycles=2)
+        self.assertEqual(stderr.getvalue().count("pyhound: warning: Could not connect"), 2)
+        self.watcher.client._search = search
+        self.assertEqual(self._run_cycle(), ['+shop:cart.py:1:old_client.get()'])